@@ -0,0 +1,167 @@
+import json
+import random
+import sqlite3
+import hashlib
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+VOCABULARY = [f"word{i}" for i in range(500)]
+CATEGORIES = ["Politics", "Religion", "Race", "Economy", "Health", "Sports"]
+
+
+def fake_vector(text, dim):
+    """
+    Deterministic embedding: the normalized sum of one random vector per word, so texts sharing
+    words are close to each other, like real embeddings of related summaries.
+
+    :param text: Text to embed.
+    :param dim: Vector dimension.
+    :return: float32 NumPy vector.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in str(text).split():
+        seed = int.from_bytes(hashlib.md5(word.encode("utf-8")).digest()[:4], "little")
+        vector += np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class FakeEmbeddingServer:
+    def __init__(self, dim, latency_ms=0.0):
+        """
+        Local HTTP stand-in for the embedding service, speaking the same GET and batch POST protocol.
+
+        :param dim: Vector dimension.
+        :param latency_ms: Artificial service time added to every call.
+        """
+        self.dim = dim
+        self.latency = latency_ms / 1000
+        self.calls = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                params = parse_qs(urlparse(self.path).query)
+                self._reply([fake_vector(params["promt"][0], server.dim).tolist()], single=True)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                self._reply([fake_vector(text, server.dim).tolist() for text in body["promts"]])
+
+            def _reply(self, vectors, single=False):
+                server.calls += 1
+                if server.latency:
+                    threading.Event().wait(server.latency)
+                body = json.dumps(vectors[0] if single else vectors).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-embedding", daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class SQLiteDatabase:
+    def __init__(self):
+        """
+        In-memory SQLite stand-in for the MySQL Database pool, running the same queries.
+        """
+        # Return TIMESTAMP columns as datetime, like the MySQL driver
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        self._conn.row_factory = lambda cursor, row: {col[0]: value for col, value in zip(cursor.description, row)}
+        self._lock = threading.Lock()
+
+    def execute(self, query, params=()):
+        with self._lock:
+            self._conn.execute(query, params)
+
+    def executemany(self, query, rows):
+        with self._lock:
+            self._conn.executemany(query, rows)
+            self._conn.commit()
+
+    def fetch_all(self, query, params=None):
+        with self._lock:
+            return self._conn.execute(query.replace("%s", "?"), tuple(params or ())).fetchall()
+
+    def stream_batches(self, query, params=None, batch_size=500):
+        rows = self.fetch_all(query, params)
+        for i in range(0, len(rows), batch_size):
+            yield rows[i:i + batch_size]
+
+    def close(self):
+        self._conn.close()
+
+
+class AsyncSQLiteDatabase:
+    def __init__(self, db):
+        """
+        Async facade over SQLiteDatabase, standing in for AsyncDatabase.
+
+        :param db: SQLiteDatabase holding the tables.
+        """
+        self.db = db
+
+    async def fetch_all(self, query, params=None):
+        return self.db.fetch_all(query, params)
+
+    async def close(self):
+        pass
+
+
+def populate(db, rows, seed=0):
+    """
+    Create the content, topic, bias and category tables and fill them with synthetic rows.
+
+    :param db: SQLiteDatabase to fill.
+    :param rows: Number of videos.
+    :param seed: Random seed.
+    :return: List of video_ids.
+    """
+    rng = random.Random(seed)
+    db.execute("""CREATE TABLE content (id INTEGER PRIMARY KEY, video_id TEXT, video_summary TEXT,
+                  video_posted_timestamp TIMESTAMP, video_source TEXT, sub_category TEXT, risk_status TEXT,
+                  video_screenshot_url TEXT, user_handle TEXT, topic_category TEXT, relates_to TEXT,
+                  purpose TEXT, execution_method TEXT)""")
+    db.execute("""CREATE TABLE topic (id INTEGER PRIMARY KEY, user_handle TEXT, video_id TEXT, category_id INTEGER,
+                  relates_to TEXT, purpose TEXT, execution_method TEXT)""")
+    db.execute("CREATE TABLE bias (video_id TEXT, creator_photo_link TEXT)")
+    db.execute("CREATE TABLE category (id INTEGER PRIMARY KEY, category_name TEXT)")
+    db.executemany("INSERT INTO category VALUES (?, ?)", list(enumerate(CATEGORIES, start=1)))
+
+    content, topics, bias = [], [], []
+    for i in range(1, rows + 1):
+        video_id = str(7000000 + i)
+        category_id = rng.randint(1, len(CATEGORIES))
+        themes = [" ".join(rng.sample(VOCABULARY, 2)) for _ in range(3)]
+        summary = " ".join(rng.sample(VOCABULARY, 30))
+        content.append((i, video_id, summary, "2024-01-01 00:00:00", "tiktok", "news", "low",
+                        f"https://example.com/{video_id}.jpg", f"user{i % 100}", CATEGORIES[category_id - 1], *themes))
+        topics.append((i, f"user{i % 100}", video_id, category_id, *themes))
+        bias.append((video_id, f"https://example.com/{video_id}.png"))
+    db.executemany("INSERT INTO content VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", content)
+    db.executemany("INSERT INTO topic VALUES (?, ?, ?, ?, ?, ?, ?)", topics)
+    db.executemany("INSERT INTO bias VALUES (?, ?)", bias)
+    return [row[1] for row in content]
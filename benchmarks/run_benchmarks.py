@@ -0,0 +1,252 @@
+"""
+Throughput, latency and recall benchmarks of the ingestion and similarity paths.
+
+Everything runs locally: an in-memory Qdrant (or ``--qdrant-url``), a fake embedding server over
+HTTP and an in-memory SQLite database standing in for MySQL. Results are printed as JSON, or
+written to ``--output``, so runs can be compared over time::
+
+    python benchmarks/run_benchmarks.py --rows 5000 --queries 500 --output bench.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+from dataclasses import replace
+
+import numpy as np
+
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_path)
+os.environ.setdefault('COLLECTION_BOOTSTRAP', 'false')
+
+from fastapi.testclient import TestClient
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.http.models import PointStruct, SearchParams, NamedVector
+
+from benchmarks.fakes import FakeEmbeddingServer, SQLiteDatabase, AsyncSQLiteDatabase, populate
+from src.collection_manager import CollectionManager
+from src.embedding_cache import EmbeddingCache
+from src.embedding_client import EmbeddingClient, AsyncEmbeddingClient
+from src.mega_similarity import MegaSimilarityAgent
+from src.metadata import MetadataAgent
+from src.db import placeholders
+from src.queries import content_rows_query, profile_rows_query
+from src.settings import Settings
+from src.sparse_encoder import DENSE_VECTOR
+
+
+def latency_stats(samples):
+    """
+    Summarize latency samples.
+
+    :param samples: Durations in seconds.
+    :return: Dictionary with count, mean and p50/p95/p99 in milliseconds, and requests per second.
+    """
+    ms = np.array(samples) * 1000
+    return {
+        "count": len(samples),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "qps": float(len(samples) / sum(samples)),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def bench_ingest(agent, settings, video_ids, stream=False):
+    """
+    Measure ``MetadataAgent.process`` (or ``process_stream``) over every synthetic video.
+
+    :return: Dictionary of rows, seconds and rows per second per mode.
+    """
+    process = agent.process_stream if stream else agent.process
+    id_placeholders = placeholders(video_ids)
+    results = {}
+    for mode, query in (
+        ("content", content_rows_query(settings, f"video_id IN ({id_placeholders})")),
+        ("profile", profile_rows_query(settings, f"a.video_id IN ({id_placeholders})")),
+    ):
+        seconds, _ = timed(process, query, mode, params=video_ids)
+        results[mode] = {"rows": len(video_ids), "seconds": seconds, "rows_per_sec": len(video_ids) / seconds}
+    return results
+
+
+def bench_query(agent, settings, texts, top_k):
+    samples = []
+    for text in texts:
+        seconds, _ = timed(agent.query, text, settings.content_collection_name, threshold=0.0, top_k=top_k)
+        samples.append(seconds)
+    return latency_stats(samples)
+
+
+def bench_query_content(agent, settings, db, video_ids, top_k, search_type):
+    """
+    Measure ``/query_content`` end to end through the FastAPI app, with the benchmark components injected.
+    """
+    import main
+    bench_settings = replace(settings, top_k=top_k, threshold=0.0)
+    main.app.dependency_overrides[main.get_settings] = lambda: bench_settings
+    main.app.dependency_overrides[main.get_mega_similarity_agent] = lambda: agent
+    main.app.dependency_overrides[main.get_async_database] = lambda: AsyncSQLiteDatabase(db)
+    samples = []
+    try:
+        with TestClient(main.app) as client:
+            for video_id in video_ids:
+                payload = {"video_id": int(video_id), "user_handle": "bench", "searchType": search_type}
+                seconds, response = timed(client.post, "/query_content", json=payload)
+                response.raise_for_status()
+                samples.append(seconds)
+    finally:
+        main.app.dependency_overrides.clear()
+    return latency_stats(samples)
+
+
+def bench_recall(qdrant_client, collection_name, vectors, top_k, using=None):
+    """
+    Compare approximate search results with exact search.
+
+    In-memory Qdrant always searches exactly, so recall is only informative with ``--qdrant-url``.
+
+    :param using: Name of the dense vector in hybrid collections.
+    :return: Dictionary with k and mean recall@k.
+    """
+    recalls = []
+    for vector in vectors:
+        vector = NamedVector(name=using, vector=vector) if using else vector
+        approximate = qdrant_client.search(collection_name, query_vector=vector, limit=top_k)
+        exact = qdrant_client.search(collection_name, query_vector=vector, limit=top_k,
+                                     search_params=SearchParams(exact=True))
+        expected = {point.id for point in exact}
+        if expected:
+            recalls.append(len(expected & {point.id for point in approximate}) / len(expected))
+    return {"k": top_k, "recall_at_k": float(np.mean(recalls)) if recalls else None}
+
+
+def copy_collection(source, target, collection_name, manager):
+    """
+    Copy every point of a collection into another client, to serve the async search paths in-memory.
+    """
+    async def run():
+        if not await target.collection_exists(collection_name):
+            await target.create_collection(collection_name, vectors_config=manager.vectors_config(),
+                                           sparse_vectors_config=manager.sparse_vectors_config())
+        offset = None
+        while True:
+            points, offset = source.scroll(collection_name, limit=1000, offset=offset, with_vectors=True)
+            if points:
+                await target.upsert(collection_name, points=[
+                    PointStruct(id=point.id, vector=point.vector, payload=point.payload) for point in points
+                ])
+            if offset is None:
+                break
+
+    asyncio.run(run())
+
+
+def run(rows=2000, queries=200, dim=384, top_k=5, qdrant_url=None, embedding_latency_ms=0.0, stream=False, seed=0):
+    """
+    Run every benchmark on a fresh synthetic data set.
+
+    :return: JSON-serializable results.
+    """
+    rng = random.Random(seed)
+    server = FakeEmbeddingServer(dim, embedding_latency_ms).start()
+    db = SQLiteDatabase()
+    video_ids = populate(db, rows, seed)
+
+    suffix = f"{int(time.time())}"
+    settings = replace(
+        Settings.from_env(),
+        content_collection_name=f"bench_content_{suffix}",
+        profile_collection_name=f"bench_profile_{suffix}",
+        database="main", database_mkt="main",
+        content_table="content", topic_table="topic", bias_table="bias", category_table="category",
+    )
+    qdrant_client = QdrantClient(url=qdrant_url) if qdrant_url else QdrantClient(":memory:")
+    async_qdrant_client = AsyncQdrantClient(url=qdrant_url) if qdrant_url else AsyncQdrantClient(":memory:")
+    manager = CollectionManager(qdrant_client, settings, vector_size=dim)
+    manager.ensure_collections()
+
+    embedding_client = EmbeddingClient(url=f"{server.url}/embedPromt", batch_url=f"{server.url}/embedBatch",
+                                       model_name="bench", response_format="json")
+    async_embedding_client = AsyncEmbeddingClient(url=f"{server.url}/embedPromt", batch_url=f"{server.url}/embedBatch",
+                                                  model_name="bench", response_format="json")
+    metadata_agent = MetadataAgent(embedding_client=embedding_client, db=db, settings=settings,
+                                   qdrant_client=qdrant_client)
+    similarity_agent = MegaSimilarityAgent(
+        embedding_client=embedding_client, async_embedding_client=async_embedding_client,
+        async_qdrant_client=async_qdrant_client, settings=settings, qdrant_client=qdrant_client,
+        embedding_cache=EmbeddingCache(maxsize=0),
+    )
+
+    try:
+        results = {
+            "config": {
+                "rows": rows, "queries": queries, "dim": dim, "top_k": top_k, "stream": stream,
+                "qdrant": qdrant_url or ":memory:", "embedding_latency_ms": embedding_latency_ms,
+                "hybrid": manager.hybrid, "python": platform.python_version(),
+            },
+        }
+        results["ingest"] = bench_ingest(metadata_agent, settings, video_ids, stream)
+        embedding_calls = server.calls
+
+        sampled = [row for row in db.fetch_all("SELECT video_id, video_summary FROM content")]
+        sampled = rng.sample(sampled, min(queries, len(sampled)))
+        results["query"] = bench_query(similarity_agent, settings, [row["video_summary"] for row in sampled], top_k)
+
+        if not qdrant_url:
+            copy_collection(qdrant_client, async_qdrant_client, settings.content_collection_name, manager)
+        sampled_ids = [row["video_id"] for row in sampled]
+        results["query_content"] = {
+            "stored_vector": bench_query_content(similarity_agent, settings, db, sampled_ids, top_k, "video"),
+        }
+
+        vectors = [embedding_client.embed(row["video_summary"]) for row in sampled]
+        results["recall"] = bench_recall(qdrant_client, settings.content_collection_name, vectors, top_k,
+                                         using=DENSE_VECTOR if manager.hybrid else None)
+        results["embedding_calls"] = {"ingest": embedding_calls, "total": server.calls}
+        return results
+    finally:
+        if qdrant_url:
+            for mode in ("content", "profile"):
+                qdrant_client.delete_collection(settings.collection_name(mode))
+        embedding_client.close()
+        server.close()
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000, help="Synthetic videos to ingest")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per latency benchmark")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--qdrant-url", help="Benchmark a Qdrant server instead of the in-memory one")
+    parser.add_argument("--embedding-latency-ms", type=float, default=0.0, help="Simulated embedding service time")
+    parser.add_argument("--stream", action="store_true", help="Ingest with process_stream")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    results = run(args.rows, args.queries, args.dim, args.top_k, args.qdrant_url, args.embedding_latency_ms,
+                  args.stream, args.seed)
+    body = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(body)
+    else:
+        print(body)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,28 @@
-from fastapi import FastAPI, Response,HTTPException
+from fastapi import FastAPI, Response,HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import uvicorn
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+from qdrant_client import QdrantClient, AsyncQdrantClient
 from src.metadata import MetadataAgent
 from src.mega_similarity import MegaSimilarityAgent
-import os
+from src.db import Database, placeholders
+from src.async_db import AsyncDatabase
+from src.embedding_client import create_embedding_client, create_async_embedding_client
+from src.embedding_cache import EmbeddingCache
+from src.settings import Settings
+from src.sync_worker import SyncWorker
+from src.jobs import JobManager
+from src.collection_manager import CollectionManager
+from src.queries import content_rows_query, profile_rows_query
+from src.hydration import PayloadHydrator
+from src.metrics import REQUEST_SECONDS, DEGRADED_RESPONSES, latest
+from src.resilience import DependencyUnavailable, StaleResultCache, get_stale_result_cache
+import math
+import time
 import logging
 from enum import Enum
 
@@ -20,14 +36,27 @@ class requestType(str, Enum):
 
 class IDRequest(BaseModel):
     video_ids: List[int]
+    stream: bool = False
+    background: bool = False
     
+class SearchParamsRequest(BaseModel):
+    hnsw_ef: Optional[int] = None
+    exact: Optional[bool] = None
+    rescore: Optional[bool] = None
+    oversampling: Optional[float] = None
+    indexed_only: Optional[bool] = None
+
 class ContentSimilarityRequest(BaseModel):
     video_id: int
     user_handle: str
     searchType:requestType
+    search_params: Optional[SearchParamsRequest] = None
     
 class ProfileSimilarityRequest(BaseModel):
     user_handle: str
+
+class BatchSimilarityRequest(BaseModel):
+    queries: List[ContentSimilarityRequest]
      
 
 logging.basicConfig(
@@ -36,7 +65,97 @@ logging.basicConfig(
         datefmt="%Y-%m-%d %H:%M:%S",
 )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the application-scoped settings, clients and agents once, and release them on shutdown."""
+    settings = Settings.from_env()
+    qdrant_client = QdrantClient(**settings.qdrant_client_kwargs())
+    async_qdrant_client = AsyncQdrantClient(**settings.qdrant_client_kwargs())
+    if settings.collection_bootstrap:
+        bootstrap_collections(qdrant_client, settings)
+    embedding_client = create_embedding_client()
+    async_embedding_client = create_async_embedding_client(embedding_client)
+    db = Database()
+    async_db = AsyncDatabase()
+
+    app.state.settings = settings
+    app.state.async_db = async_db
+    app.state.job_manager = JobManager()
+    app.state.metadata_agent = MetadataAgent(
+        embedding_client=embedding_client,
+        db=db,
+        settings=settings,
+        qdrant_client=qdrant_client,
+    )
+    app.state.mega_similarity_agent = MegaSimilarityAgent(
+        embedding_client=embedding_client,
+        async_embedding_client=async_embedding_client,
+        async_qdrant_client=async_qdrant_client,
+        settings=settings,
+        qdrant_client=qdrant_client,
+        embedding_cache=EmbeddingCache(),
+        # Compact points only hold filter fields, matches are completed from MySQL
+        hydrator=PayloadHydrator(settings, db=db, async_db=async_db) if settings.compact_payload else None,
+    )
+    sync_worker = None
+    if settings.sync_enabled:
+        # Keep the collections fresh from MySQL without explicit /save_collection calls
+        sync_worker = SyncWorker(app.state.metadata_agent, settings)
+        sync_worker.start()
+    logging.info("Limpopo clients and agents initialised")
+
+    yield
+
+    if sync_worker is not None:
+        sync_worker.stop()
+    app.state.job_manager.close()
+
+    logging.info({'Embedding cache': app.state.mega_similarity_agent.embedding_cache.stats()})
+    await async_embedding_client.close()
+    await async_qdrant_client.close()
+    await async_db.close()
+    embedding_client.close()
+    qdrant_client.close()
+    db.close()
+    if app.state.metadata_agent.embedding_memo is not None:
+        app.state.metadata_agent.embedding_memo.close()
+    logging.info("Limpopo clients and agents closed")
+
+
+def bootstrap_collections(qdrant_client, settings):
+    """Create or validate the collections and their payload indexes before serving.
+
+    A configuration mismatch stops the startup, while an unreachable Qdrant is only logged so the
+    service can still come up and retry on its own calls.
+    """
+    try:
+        CollectionManager(qdrant_client, settings).ensure_collections()
+    except ValueError:
+        raise
+    except Exception as e:
+        logging.warning(f"Collection bootstrap skipped: {str(e)}")
+
+
+# Dependencies
+
+def get_settings() -> Settings:
+    return app.state.settings
+
+def get_metadata_agent() -> MetadataAgent:
+    return app.state.metadata_agent
+
+def get_mega_similarity_agent() -> MegaSimilarityAgent:
+    return app.state.mega_similarity_agent
+
+def get_async_database() -> AsyncDatabase:
+    return app.state.async_db
+
+def get_job_manager() -> JobManager:
+    return app.state.job_manager
+
+
 app = FastAPI(
+    lifespan=lifespan,
     debug=False,
     title="Limpopo",
     summary="To find similar content and profiles",
@@ -55,6 +174,26 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def observe_latency(request, call_next):
+    """Record the latency of every request, labelled by route template so IDs do not explode the series."""
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    REQUEST_SECONDS.labels(method=request.method, path=path, status=response.status_code).observe(
+        time.perf_counter() - start
+    )
+    return response
+
+
+@app.get("/metrics")
+def metrics() -> Response:
+    """Expose the Prometheus metrics: per-stage latency histograms, request latency and ingestion counters."""
+    body, content_type = latest()
+    return Response(content=body, media_type=content_type)
+
+
 @app.get("/")
 def root(response: Response) -> dict[str, str]:
     """The function sets response headers for cache control and CORS, and returns a message indicating that
@@ -76,39 +215,47 @@ def root(response: Response) -> dict[str, str]:
 
     return {"Limpopo": "Limpopo is Ready!"}
 
+def save_video_ids(video_ids, metadata_agent, settings, stream=False):
+    """Fetch, embed and upsert the content and profile rows of the given videos.
+
+    :return: Tuple of (content rows found, profile rows found).
+    """
+    id_placeholders = placeholders(video_ids)  # One %s per ID, values are bound by the driver
+
+    content_query = content_rows_query(settings, f"video_id IN ({id_placeholders})")
+    profile_query = profile_rows_query(settings, f"a.video_id IN ({id_placeholders})")
+    # Large backfills stream rows through overlapping fetch/embed/upsert stages
+    process = metadata_agent.process_stream if stream else metadata_agent.process
+
+    if not settings.ingest.save_parallel_modes:
+        content_data = process(content_query, mode='content', params=video_ids)
+        profile_data = process(profile_query, mode='profile', params=video_ids)
+        return content_data, profile_data
+
+    # Content and profile use different queries, texts and collections, so both pipelines run side by
+    # side, each bounded by its own UPSERT_PARALLEL pool. Both finish before the first error is raised.
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="save") as executor:
+        content_future = executor.submit(process, content_query, mode='content', params=video_ids)
+        profile_future = executor.submit(process, profile_query, mode='profile', params=video_ids)
+    return content_future.result(), profile_future.result()
+
+
 @app.post("/save_collection")
-def save_collection(request: IDRequest):
+def save_collection(request: IDRequest,
+                    response: Response,
+                    metadata_agent: MetadataAgent = Depends(get_metadata_agent),
+                    settings: Settings = Depends(get_settings),
+                    job_manager: JobManager = Depends(get_job_manager)):
     try:
-        metadata_agent = MetadataAgent()
-        id_str = ",".join(map(str, request.video_ids))  # Convert list of IDs to a comma-separated string
-        
-        #Content Query
-        content_query = f"""
-            SELECT id, video_id,video_summary, video_posted_timestamp, video_source, sub_category, risk_status,video_screenshot_url as picture 
-            FROM {os.getenv('DATABASE')}.{os.getenv('CONTENT_TABLE')} 
-            WHERE video_id IN ({id_str})
-        """
-        #Profile Query
-        profile_query = f"""
-            SELECT a.id, user_handle,a.video_id,
-					IFNULL(c.category_name, '') AS topic_category,
-                   IFNULL(a.relates_to, '') AS relates_to,
-                   IFNULL(a.purpose, '') AS purpose,
-                   IFNULL(a.execution_method, '') AS execution_method ,
-                   b.creator_photo_link as picture
-            FROM {os.getenv('DATABASE')}.{os.getenv('TOPIC_TABLE') } as a 
-            join {os.getenv('DATABASE_MKT')}.{os.getenv('BIAS_TABLE') } as b 
-            join {os.getenv('DATABASE_MKT')}.{os.getenv('CATEGORY_TABLE') } as c 
-            on a.video_id=b.video_id
-            and a.category_id=c.id
-            WHERE a.video_id IN ({id_str})   
-            """ 
-        print(profile_query)
-        # Process content data    
-        content_data = metadata_agent.process(content_query, mode='content')
-        
-        # Process profile data    
-        profile_data = metadata_agent.process(profile_query,mode='profile')
+        if request.background:
+            # Return a job id right away, progress is polled on /save_collection/jobs/{job_id}
+            response.status_code = 202
+            return job_manager.submit(
+                request.video_ids,
+                lambda video_ids: save_video_ids(video_ids, metadata_agent, settings, request.stream),
+            )
+
+        content_data, profile_data = save_video_ids(request.video_ids, metadata_agent, settings, request.stream)
     
         response_message = {
             "content": "Content Data processed successfully" if content_data else "No content data found",
@@ -122,35 +269,84 @@ def save_collection(request: IDRequest):
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
+@app.get("/save_collection/jobs/{job_id}")
+def save_collection_job(job_id: str, job_manager: JobManager = Depends(get_job_manager)):
+    status = job_manager.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    return status
+
+
+
+def degraded_response(error, stale_results, key, response):
+    """Serve the last good response of a query while a dependency is unavailable, or fail fast with a 503.
+
+    :param error: DependencyUnavailable raised by a guarded call.
+    :param stale_results: StaleResultCache holding the last good responses.
+    :param key: Key of the query in ``stale_results``.
+    :param response: Response whose headers flag a stale body.
+    :return: The stale response body.
+    """
+    stale = stale_results.get(key)
+    if stale is not None:
+        DEGRADED_RESPONSES.labels(kind="stale_result").inc()
+        response.headers["Warning"] = '110 - "Response is Stale"'
+        return stale
+    DEGRADED_RESPONSES.labels(kind="unavailable").inc()
+    raise HTTPException(status_code=503, detail=str(error),
+                        headers={"Retry-After": str(max(1, math.ceil(error.retry_after or 0)))})
+
 
 @app.post('/query_content')
-def query_content(request: ContentSimilarityRequest):
+async def query_content(request: ContentSimilarityRequest,
+                        response: Response,
+                        mega_similarity_agent: MegaSimilarityAgent = Depends(get_mega_similarity_agent),
+                        async_db: AsyncDatabase = Depends(get_async_database),
+                        settings: Settings = Depends(get_settings),
+                        stale_results: StaleResultCache = Depends(get_stale_result_cache)):
+    stale_key = StaleResultCache.key("query_content", request.model_dump(mode="json"))
     try:
-        metadata_agent = MetadataAgent()
-        mega_similarity_agent = MegaSimilarityAgent()
-        threshold = float(os.getenv('Threshold'))
-        top_k =int(os.getenv('Top_k'))
+        threshold = settings.threshold
+        top_k = settings.top_k
+        search_params = request.search_params.model_dump() if request.search_params else None
+
+        if request.searchType==requestType.video and settings.reuse_stored_vectors:
+            # Search with the vector stored at ingestion, skipping MySQL and the embedding call
+            results = await mega_similarity_agent.aquery_by_video_id(
+                video_id=request.video_id,
+                collection_name=settings.content_collection_name,
+                threshold=threshold,
+                top_k=top_k,
+                search_params=search_params,
+            )
+            if results is not None:
+                stale_results.set(stale_key, {"matches": results})
+                return {"matches": results}
+
         content_query=""
+        params=()
         if(request.searchType==requestType.video):
             # SQL query to fetch video_summary for the given video_id
             content_query = f"""
             SELECT video_summary 
-            FROM {os.getenv("DATABASE")}.{os.getenv('CONTENT_TABLE')}
-            WHERE video_id = {request.video_id}
+            FROM {settings.database}.{settings.content_table}
+            WHERE video_id = %s
             """
+            params = (request.video_id,)
         elif(request.searchType==requestType.profile):
              content_query = f"""
             SELECT IFNULL(topic_category, '') AS topic_category, 
                    IFNULL(relates_to, '') AS relates_to, 
                    IFNULL(purpose, '') AS purpose, 
                    IFNULL(execution_method, '') AS execution_method
-            FROM {os.getenv('DATABASE')}.{os.getenv('CONTENT_TABLE')} 
-            WHERE user_handle = '{request.user_handle}'
+            FROM {settings.database}.{settings.content_table} 
+            WHERE user_handle = %s
             order by id desc limit 1 
             """
+             params = (request.user_handle,)
 
         # Fetch video_summary
-        content_data = metadata_agent.fetch_data(content_query)
+        content_data = await async_db.fetch_all(content_query, params)
         if not content_data:
             if(request.searchType==requestType.video):
                 raise HTTPException(status_code=404, detail=f"Video ID {request.video_id} not found in the content table.")
@@ -173,27 +369,142 @@ def query_content(request: ContentSimilarityRequest):
             ]).strip()
             logging.info({'Themes': themes})         
         # Perform similarity query
-        results = mega_similarity_agent.query(
+        results = await mega_similarity_agent.aquery(
                 query_text=video_summary if request.searchType==requestType.video else themes,
-                collection_name=os.getenv("CONTENT_COLLECTION_NAME") if request.searchType=="video" else os.getenv("PROFILE_COLLECTION_NAME"),
+                collection_name=settings.content_collection_name if request.searchType=="video" else settings.profile_collection_name,
                 threshold=threshold,
                 top_k=top_k,
                 input_video_id=request.video_id,
                 user_handle=request.user_handle, 
+                search_params=search_params,
             )          
 
+        stale_results.set(stale_key, {"matches": results})
         return {"matches": results}
 
+    except DependencyUnavailable as e:
+        return degraded_response(e, stale_results, stale_key, response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Content similarity query error: {str(e)}")
     
+@app.post('/query_content/batch')
+async def query_content_batch(request: BatchSimilarityRequest,
+                              response: Response,
+                              mega_similarity_agent: MegaSimilarityAgent = Depends(get_mega_similarity_agent),
+                              async_db: AsyncDatabase = Depends(get_async_database),
+                              settings: Settings = Depends(get_settings),
+                              stale_results: StaleResultCache = Depends(get_stale_result_cache)):
+    """Score many videos or handles at once: one SQL query per search type, one embedding batch and
+    one search_batch call per collection, with results returned in input order."""
+    # Largest accepted batch (BATCH_MAX_QUERIES), every query may cost an embedding call
+    if len(request.queries) > settings.batch_max_queries:
+        raise HTTPException(status_code=422,
+                            detail=f"At most {settings.batch_max_queries} queries are accepted per batch.")
+    stale_key = StaleResultCache.key("query_content_batch", request.model_dump(mode="json"))
+    try:
+        queries = request.queries
+        vectors = [None] * len(queries)
+        texts = [None] * len(queries)
+        video_indexes = [i for i, query in enumerate(queries) if query.searchType == requestType.video]
+        profile_indexes = [i for i, query in enumerate(queries) if query.searchType == requestType.profile]
+
+        if video_indexes and settings.reuse_stored_vectors:
+            stored = await mega_similarity_agent.astored_vectors(
+                settings.content_collection_name, [queries[i].video_id for i in video_indexes]
+            )
+            for i in video_indexes:
+                vectors[i] = stored.get(str(queries[i].video_id))
+
+        missing_video_ids = list({queries[i].video_id for i in video_indexes if vectors[i] is None})
+        if missing_video_ids:
+            content_query = f"""
+            SELECT video_id, video_summary 
+            FROM {settings.database}.{settings.content_table}
+            WHERE video_id IN ({placeholders(missing_video_ids)})
+            """
+            rows = await async_db.fetch_all(content_query, missing_video_ids) or []
+            summaries = {str(row["video_id"]): row["video_summary"] for row in rows}
+            for i in video_indexes:
+                if vectors[i] is None:
+                    texts[i] = summaries.get(str(queries[i].video_id))
+
+        user_handles = list({queries[i].user_handle for i in profile_indexes})
+        if user_handles:
+            # Latest row per user_handle, as in the single query
+            profile_query = f"""
+            SELECT user_handle,
+                   IFNULL(topic_category, '') AS topic_category, 
+                   IFNULL(relates_to, '') AS relates_to, 
+                   IFNULL(purpose, '') AS purpose, 
+                   IFNULL(execution_method, '') AS execution_method
+            FROM {settings.database}.{settings.content_table} 
+            WHERE id IN (
+                SELECT MAX(id) FROM {settings.database}.{settings.content_table}
+                WHERE user_handle IN ({placeholders(user_handles)})
+                GROUP BY user_handle
+            )
+            """
+            rows = await async_db.fetch_all(profile_query, user_handles) or []
+            themes = {
+                row["user_handle"]: " ".join([
+                    row["topic_category"],
+                    row["relates_to"],
+                    row["purpose"],
+                    row["execution_method"]
+                ]).strip()
+                for row in rows
+            }
+            for i in profile_indexes:
+                texts[i] = themes.get(queries[i].user_handle)
+
+        # Embed every text that has no stored vector in one batch
+        to_embed = [i for i, text in enumerate(texts) if vectors[i] is None and text is not None]
+        embeddings = await mega_similarity_agent.agenerate_embeddings([texts[i] for i in to_embed])
+        for i, embedding in zip(to_embed, embeddings):
+            if embedding is not None:
+                # Pair with the sparse keyword vector of the text in hybrid mode
+                vectors[i] = mega_similarity_agent.query_vector(embedding, texts[i])
+
+        results = [None] * len(queries)
+        for collection_name, indexes in (
+            (settings.content_collection_name, video_indexes),
+            (settings.profile_collection_name, profile_indexes),
+        ):
+            found = [i for i in indexes if vectors[i] is not None]
+            matches = await mega_similarity_agent.asearch_batch(
+                collection_name,
+                [(vectors[i], queries[i].video_id, queries[i].user_handle) for i in found],
+                threshold=settings.threshold,
+                top_k=settings.top_k,
+                search_params=[queries[i].search_params.model_dump() if queries[i].search_params else None for i in found],
+            )
+            for i, match in zip(found, matches):
+                results[i] = {**queries[i].model_dump(), "matches": match}
+
+        for i, query in enumerate(queries):
+            if results[i] is None:
+                if query.searchType == requestType.video:
+                    detail = f"Video ID {query.video_id} not found in the content table."
+                else:
+                    detail = f"User Name {query.user_handle} not found in the profile table."
+                results[i] = {**query.model_dump(), "matches": [], "error": detail}
+
+        stale_results.set(stale_key, {"results": results})
+        return {"results": results}
+
+    except DependencyUnavailable as e:
+        return degraded_response(e, stale_results, stale_key, response)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch similarity query error: {str(e)}")
+    
 #@app.post('/query_profile')
-def __query_profile(request: ProfileSimilarityRequest):
+def __query_profile(request: ProfileSimilarityRequest,
+                    metadata_agent: MetadataAgent = Depends(get_metadata_agent),
+                    mega_similarity_agent: MegaSimilarityAgent = Depends(get_mega_similarity_agent),
+                    settings: Settings = Depends(get_settings)):
     try:
-        metadata_agent = MetadataAgent()
-        mega_similarity_agent = MegaSimilarityAgent()
-        threshold = float(os.getenv('Threshold'))
-        top_k =int(os.getenv('Top_k'))
+        threshold = settings.threshold
+        top_k = settings.top_k
         
         # SQL query to fetch theme_main, theme_1, theme_2, theme_3, theme_4 for the given user_handle
         profile_query = f"""
@@ -201,12 +512,12 @@ def __query_profile(request: ProfileSimilarityRequest):
                    IFNULL(relates_to, '') AS relates_to, 
                    IFNULL(purpose, '') AS purpose, 
                    IFNULL(execution_method, '') AS execution_method
-            FROM {os.getenv('DATABASE')}.{os.getenv('CONTENT_TABLE')} 
-            WHERE user_handle = '{request.user_handle}'
+            FROM {settings.database}.{settings.content_table} 
+            WHERE user_handle = %s
             order by id desc limit 1 
             """
         # Fetch profile data
-        profile_data = metadata_agent.fetch_data(profile_query)
+        profile_data = metadata_agent.fetch_data(profile_query, (request.user_handle,))
         if not profile_data:
             raise HTTPException(status_code=404, detail=f"User Name {request.user_handle} not found in the profile table.")
         
@@ -223,7 +534,7 @@ def __query_profile(request: ProfileSimilarityRequest):
         # Perform similarity query
         results = mega_similarity_agent.query(
             query_text=themes,
-            collection_name=os.getenv("PROFILE_COLLECTION_NAME"),
+            collection_name=settings.profile_collection_name,
             threshold=threshold,
             top_k=top_k,
             user_handle=request.user_handle
@@ -0,0 +1,80 @@
+import os
+import asyncio
+import logging
+
+import aiomysql
+from dotenv import load_dotenv
+
+from src.metrics import stage
+
+load_dotenv()
+
+
+class AsyncDatabase:
+    def __init__(self, minsize=None, maxsize=None, recycle=None, **connect_kwargs):
+        """
+        Initialize an asyncio pool of MySQL connections for the async request path.
+
+        The pool is created on first use inside the running event loop. aiomysql has no
+        server-side prepared statements, parameters are escaped client-side.
+
+        :param minsize: Connections kept open (``ASYNC_DB_POOL_MIN``).
+        :param maxsize: Maximum number of open connections (``DB_POOL_SIZE``).
+        :param recycle: Maximum connection age in seconds (``DB_POOL_RECYCLE``).
+        :param connect_kwargs: Overrides for ``aiomysql.create_pool``.
+        """
+        self.minsize = int(minsize or os.getenv('ASYNC_DB_POOL_MIN', 1))
+        self.maxsize = int(maxsize or os.getenv('DB_POOL_SIZE', 5))
+        self.recycle = int(float(recycle or os.getenv('DB_POOL_RECYCLE', 3600)))
+        self.connect_kwargs = {
+            "host": os.getenv("HOST"),
+            "user": os.getenv("USERDB"),
+            "password": os.getenv("PASSWORD"),
+            "db": os.getenv("DATABASE"),
+            **connect_kwargs,
+        }
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+
+    async def _get_pool(self):
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    self._pool = await aiomysql.create_pool(
+                        minsize=self.minsize,
+                        maxsize=self.maxsize,
+                        pool_recycle=self.recycle,
+                        autocommit=True,
+                        **self.connect_kwargs,
+                    )
+        return self._pool
+
+    async def fetch_all(self, query, params=None):
+        """
+        Execute a parameterized query and fetch every row.
+
+        :param query: SQL query with ``%s`` placeholders.
+        :param params: Sequence of values bound to the placeholders.
+        :return: List of rows as dictionaries, or None when no rows match.
+        """
+        pool = await self._get_pool()
+        with stage("db"):
+            async with pool.acquire() as conn:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    await cursor.execute(query, params)
+                    data = await cursor.fetchall()
+
+        if not data:
+            logging.info("No records found for the given query.")
+            return None
+        return list(data)
+
+    async def close(self):
+        """
+        Close the pool and wait for its connections to be released.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+
@@ -0,0 +1,198 @@
+import os
+import logging
+
+from dotenv import load_dotenv
+from qdrant_client.http.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Disabled,
+    Distance,
+    HnswConfigDiff,
+    Modifier,
+    PayloadSchemaType,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SparseVectorParams,
+    VectorParams,
+)
+
+from src.sparse_encoder import DENSE_VECTOR, SPARSE_VECTOR
+
+load_dotenv()
+
+# Payload fields used in filters, per mode
+INDEXED_FIELDS = {
+    "content": ("video_id",),
+    "profile": ("video_id", "topic_category", "user_handle"),
+}
+
+
+class CollectionManager:
+    def __init__(self, qdrant_client, settings, vector_size=None, distance=None, hnsw_m=None, hnsw_ef_construct=None,
+                 quantization=None, quantization_always_ram=None, on_disk=None, hybrid=None, apply_config=None):
+        """
+        Create or validate the content and profile collections.
+
+        :param qdrant_client: QdrantClient used for the collection calls.
+        :param settings: Parsed Settings holding the collection names.
+        :param vector_size: Dimension of the embedding model (``VECTOR_SIZE``).
+        :param distance: Qdrant distance name (``VECTOR_DISTANCE``).
+        :param hnsw_m: Edges per node of the HNSW graph (``HNSW_M``).
+        :param hnsw_ef_construct: Neighbours considered while building the graph (``HNSW_EF_CONSTRUCT``).
+        :param quantization: ``none``, ``scalar`` or ``binary`` (``QUANTIZATION``).
+        :param quantization_always_ram: Keep quantized vectors in RAM (``QUANTIZATION_ALWAYS_RAM``).
+        :param on_disk: Store original vectors on disk (``VECTORS_ON_DISK``), defaults to true when quantized.
+        :param hybrid: Use a named dense vector plus a sparse one with IDF, defaults to ``settings.hybrid_search``.
+        :param apply_config: Update the HNSW and quantization settings of existing collections to the configured
+            ones, defaults to ``settings.collection_apply_config`` (``COLLECTION_APPLY_CONFIG``).
+        """
+        self.qdrant_client = qdrant_client
+        self.settings = settings
+        self.vector_size = int(vector_size or os.getenv('VECTOR_SIZE', 768))
+        self.distance = Distance(distance or os.getenv('VECTOR_DISTANCE', 'Cosine'))
+        self.hnsw_m = int(hnsw_m or os.getenv('HNSW_M', 16))
+        self.hnsw_ef_construct = int(hnsw_ef_construct or os.getenv('HNSW_EF_CONSTRUCT', 100))
+        self.quantization = (quantization or os.getenv('QUANTIZATION', 'none')).lower()
+        if self.quantization not in ("none", "scalar", "binary"):
+            raise ValueError(f"Unsupported QUANTIZATION: {self.quantization}")
+        self.quantization_always_ram = (
+            quantization_always_ram if quantization_always_ram is not None
+            else os.getenv('QUANTIZATION_ALWAYS_RAM', 'true').lower() == 'true'
+        )
+        default_on_disk = 'true' if self.quantization != "none" else 'false'
+        self.on_disk = on_disk if on_disk is not None else os.getenv('VECTORS_ON_DISK', default_on_disk).lower() == 'true'
+        self.hybrid = hybrid if hybrid is not None else settings.hybrid_search
+        self.apply_config = apply_config if apply_config is not None else settings.collection_apply_config
+
+    def vector_params(self):
+        return VectorParams(size=self.vector_size, distance=self.distance, on_disk=self.on_disk)
+
+    def vectors_config(self):
+        """
+        Dense vector configuration, named ``dense`` in hybrid collections.
+
+        :return: VectorParams, or a dictionary of named VectorParams.
+        """
+        if self.hybrid:
+            return {DENSE_VECTOR: self.vector_params()}
+        return self.vector_params()
+
+    def sparse_vectors_config(self):
+        """
+        Sparse vector configuration of hybrid collections, weighted by IDF on the Qdrant side.
+
+        :return: Dictionary of named SparseVectorParams, or None.
+        """
+        if self.hybrid:
+            return {SPARSE_VECTOR: SparseVectorParams(modifier=Modifier.IDF)}
+        return None
+
+    def hnsw_config(self):
+        return HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct)
+
+    def quantization_config(self):
+        """
+        Build the configured quantization.
+
+        :return: ScalarQuantization, BinaryQuantization or None.
+        """
+        if self.quantization == "scalar":
+            return ScalarQuantization(scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8, quantile=0.99, always_ram=self.quantization_always_ram
+            ))
+        if self.quantization == "binary":
+            return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=self.quantization_always_ram))
+        return None
+
+    def ensure_collections(self):
+        """
+        Create or validate the collections of both modes.
+        """
+        for mode in INDEXED_FIELDS:
+            collection_name = self.settings.collection_name(mode)
+            if collection_name:
+                self.ensure_collection(collection_name, INDEXED_FIELDS[mode])
+
+    def ensure_collection(self, collection_name, indexed_fields=()):
+        """
+        Create a collection with the configured parameters, or check an existing one.
+
+        An existing collection must match the vector layout (single or hybrid), size and distance.
+        Differing HNSW or quantization settings are only logged: applying them may rebuild the index,
+        which every replica would do at once on startup, so it takes ``apply_config``. Missing
+        keyword payload indexes are created.
+
+        :param collection_name: Name of the Qdrant collection.
+        :param indexed_fields: Payload fields to index as keywords.
+        """
+        if not self.qdrant_client.collection_exists(collection_name):
+            logging.info(f"Creating collection {collection_name} (size={self.vector_size}, quantization={self.quantization})")
+            self.qdrant_client.create_collection(
+                collection_name=collection_name,
+                vectors_config=self.vectors_config(),
+                sparse_vectors_config=self.sparse_vectors_config(),
+                hnsw_config=self.hnsw_config(),
+                quantization_config=self.quantization_config(),
+            )
+            payload_schema = {}
+        else:
+            info = self.qdrant_client.get_collection(collection_name)
+            self._validate(collection_name, info)
+            payload_schema = info.payload_schema or {}
+
+        for field_name in indexed_fields:
+            if field_name in payload_schema:
+                continue
+            logging.info(f"Creating keyword payload index on {field_name} for {collection_name}")
+            self.qdrant_client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=PayloadSchemaType.KEYWORD,
+            )
+
+    def _validate(self, collection_name, info):
+        """
+        Check an existing collection against the configuration.
+
+        :param collection_name: Name of the Qdrant collection.
+        :param info: CollectionInfo returned by ``get_collection``.
+        """
+        vectors = info.config.params.vectors
+        if isinstance(vectors, dict) != self.hybrid:
+            raise ValueError(
+                f"Collection {collection_name} {'has' if isinstance(vectors, dict) else 'lacks'} named vectors, "
+                f"recreate it or set HYBRID_SEARCH={'true' if isinstance(vectors, dict) else 'false'}"
+            )
+        if self.hybrid:
+            if DENSE_VECTOR not in vectors or SPARSE_VECTOR not in (info.config.params.sparse_vectors or {}):
+                raise ValueError(
+                    f"Collection {collection_name} needs a '{DENSE_VECTOR}' vector and a '{SPARSE_VECTOR}' sparse vector"
+                )
+            vectors = vectors[DENSE_VECTOR]
+        if vectors.size != self.vector_size or vectors.distance != self.distance:
+            raise ValueError(
+                f"Collection {collection_name} has vectors of size {vectors.size} ({vectors.distance}), "
+                f"expected {self.vector_size} ({self.distance})"
+            )
+
+        hnsw = info.config.hnsw_config
+        hnsw_changed = (hnsw.m, hnsw.ef_construct) != (self.hnsw_m, self.hnsw_ef_construct)
+        quantization = self.quantization_config()
+        quantization_changed = type(info.config.quantization_config) is not type(quantization)
+        if not (hnsw_changed or quantization_changed):
+            return
+        if not self.apply_config:
+            logging.warning(
+                f"Collection {collection_name} has hnsw m={hnsw.m} ef_construct={hnsw.ef_construct} and "
+                f"quantization {type(info.config.quantization_config).__name__}, configured m={self.hnsw_m} "
+                f"ef_construct={self.hnsw_ef_construct} and quantization {self.quantization}; "
+                f"set COLLECTION_APPLY_CONFIG=true to update it"
+            )
+            return
+        logging.info(f"Updating HNSW/quantization settings of {collection_name}")
+        self.qdrant_client.update_collection(
+            collection_name=collection_name,
+            hnsw_config=self.hnsw_config() if hnsw_changed else None,
+            quantization_config=(quantization or Disabled.DISABLED) if quantization_changed else None,
+        )
@@ -0,0 +1,273 @@
+import os
+import time
+import queue
+import weakref
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import mysql.connector
+from dotenv import load_dotenv
+
+from src.metrics import stage
+
+load_dotenv()
+
+
+class Database:
+    def __init__(self, pool_size=None, recycle=None, health_check_interval=None, acquire_timeout=None,
+                 statement_cache_size=None, **connect_kwargs):
+        """
+        Initialize a process-wide pool of MySQL connections.
+
+        Connections are created lazily up to ``pool_size`` and reused across requests. A connection
+        older than ``recycle`` seconds is replaced, and one idle for longer than
+        ``health_check_interval`` seconds is pinged before being handed out.
+
+        ``fetch_all`` runs server-side prepared statements, kept per connection so a repeated query
+        is only parsed once. ``stream_batches`` still uses the text protocol, as prepared cursors
+        buffer the whole result.
+
+        :param pool_size: Maximum number of open connections (``DB_POOL_SIZE``).
+        :param recycle: Maximum connection age in seconds (``DB_POOL_RECYCLE``).
+        :param health_check_interval: Idle seconds after which a connection is pinged (``DB_POOL_HEALTH_CHECK``).
+        :param acquire_timeout: Seconds to wait for a free connection (``DB_POOL_TIMEOUT``).
+        :param statement_cache_size: Prepared statements kept per connection (``DB_STATEMENT_CACHE_SIZE``, 0 disables them).
+        :param connect_kwargs: Overrides for ``mysql.connector.connect``.
+        """
+        self.pool_size = int(pool_size or os.getenv('DB_POOL_SIZE', 5))
+        self.recycle = float(recycle or os.getenv('DB_POOL_RECYCLE', 3600))
+        self.health_check_interval = float(health_check_interval or os.getenv('DB_POOL_HEALTH_CHECK', 30))
+        self.acquire_timeout = float(acquire_timeout or os.getenv('DB_POOL_TIMEOUT', 10))
+        self.statement_cache_size = int(
+            statement_cache_size if statement_cache_size is not None else os.getenv('DB_STATEMENT_CACHE_SIZE', 64)
+        )
+        self.connect_kwargs = {
+            "host": os.getenv("HOST"),
+            "user": os.getenv("USERDB"),
+            "password": os.getenv("PASSWORD"),
+            "database": os.getenv("DATABASE"),
+            **connect_kwargs,
+        }
+        # Idle connections as (connection, created_at, last_used_at), most recently used first
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        # Prepared cursors of each connection by query text, dropped with their connection
+        self._statements = weakref.WeakKeyDictionary()
+        self._statements_lock = threading.Lock()
+
+    def _connect(self):
+        """
+        Open a new MySQL connection.
+
+        :return: Tuple of (connection, created_at).
+        """
+        conn = mysql.connector.connect(**self.connect_kwargs)
+        return conn, time.monotonic()
+
+    def _checkout(self):
+        """
+        Take a healthy idle connection from the pool, or open a new one.
+
+        :return: Tuple of (connection, created_at).
+        """
+        while True:
+            try:
+                conn, created_at, last_used_at = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+
+            now = time.monotonic()
+            if now - created_at > self.recycle:
+                logging.info("Recycling stale MySQL connection")
+                self._close(conn)
+                continue
+            if now - last_used_at > self.health_check_interval:
+                try:
+                    conn.ping(reconnect=False)
+                except Exception as e:
+                    logging.warning(f"Discarding unhealthy MySQL connection: {str(e)}")
+                    self._close(conn)
+                    continue
+            return conn, created_at
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a pooled connection for the duration of a ``with`` block.
+
+        The connection is returned to the pool on success and discarded if the block raised or,
+        for generators, was closed before finishing.
+        """
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise TimeoutError(f"No MySQL connection available within {self.acquire_timeout} seconds")
+        conn = None
+        try:
+            conn, created_at = self._checkout()
+            yield conn
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put((conn, created_at, time.monotonic()))
+        except BaseException:
+            if conn is not None:
+                self._close(conn)
+            raise
+        finally:
+            self._slots.release()
+
+    def fetch_all(self, query, params=None):
+        """
+        Execute a parameterized query and fetch every row.
+
+        :param query: SQL query with ``%s`` placeholders.
+        :param params: Sequence of values bound to the placeholders.
+        :return: List of rows as dictionaries, or None when no rows match.
+        """
+        with stage("db"), self.connection() as conn:
+            if self.statement_cache_size > 0:
+                # A failing statement discards the connection, and its cursors with it
+                cursor, statement = self._prepared_cursor(conn, query)
+                cursor.execute(statement, params)
+                columns = [desc[0] for desc in cursor.description]  # Get column names
+                data = cursor.fetchall()
+            else:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(query, params)
+                    columns = [desc[0] for desc in cursor.description]  # Get column names
+                    data = cursor.fetchall()
+                finally:
+                    cursor.close()
+
+        if not data:
+            logging.info("No records found for the given query.")
+            return None
+
+        # Convert tuples to dictionaries
+        return [dict(zip(columns, row)) for row in data]
+
+    def _prepared_cursor(self, conn, query):
+        """
+        Return the prepared cursor of a query on a connection, preparing it on first use.
+
+        The least recently used statements are closed beyond ``statement_cache_size``.
+
+        The cursor only reuses its statement when executed with the very string object it was
+        prepared with, so that cached object is returned to be passed to ``execute``: callers
+        build equal but new query strings on every call.
+
+        :param conn: Connection checked out by the caller.
+        :param query: SQL query with ``%s`` placeholders.
+        :return: Tuple of (prepared cursor, query string to execute on it).
+        """
+        with self._statements_lock:
+            statements = self._statements.setdefault(conn, OrderedDict())
+        entry = statements.get(query)
+        if entry is not None:
+            statements.move_to_end(query)
+            return entry
+        entry = statements[query] = (conn.cursor(prepared=True), query)
+        while len(statements) > self.statement_cache_size:
+            _, (evicted, _) = statements.popitem(last=False)
+            self._close(evicted)
+        return entry
+
+    def stream_batches(self, query, params=None, batch_size=500):
+        """
+        Execute a parameterized query on an unbuffered cursor and yield rows in batches.
+
+        Rows are read from the server as they are consumed, so memory stays bounded by
+        ``batch_size`` regardless of the size of the result. The pooled connection is held until
+        the generator is exhausted or closed.
+
+        :param query: SQL query with ``%s`` placeholders.
+        :param params: Sequence of values bound to the placeholders.
+        :param batch_size: Number of rows per yielded batch.
+        :return: Generator of lists of rows as dictionaries.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor(buffered=False)
+            try:
+                cursor.execute(query, params)
+                columns = [desc[0] for desc in cursor.description]  # Get column names
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield [dict(zip(columns, row)) for row in rows]
+            finally:
+                # Closing early may leave unread rows; the connection is discarded in that case
+                self._close(cursor)
+
+    def acquire_lock(self, name):
+        """
+        Take a MySQL named lock without waiting, on a dedicated connection outside the pool.
+
+        MySQL holds the lock for as long as that connection stays open, and releases it when the
+        connection closes, including when the process holding it dies.
+
+        :param name: Lock name, shared by every process competing for it.
+        :return: The connection holding the lock, or None when another session holds it.
+        """
+        conn, _ = self._connect()
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT GET_LOCK(%s, 0)", (name,))
+                (acquired,) = cursor.fetchone()
+            finally:
+                cursor.close()
+        except Exception:
+            self._close(conn)
+            raise
+        if acquired != 1:
+            self._close(conn)
+            return None
+        return conn
+
+    def close(self):
+        """
+        Close every idle connection.
+        """
+        while True:
+            try:
+                conn, _, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(conn)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def placeholders(values):
+    """
+    Build the placeholder list for an ``IN (...)`` clause.
+
+    :param values: Values that will be bound to the clause.
+    :return: String such as ``%s,%s,%s``.
+    """
+    return ",".join(["%s"] * len(values))
+
+
+_database = None
+_database_lock = threading.Lock()
+
+
+def get_database():
+    """
+    Return the process-wide Database pool, creating it on first use.
+
+    :return: Shared Database instance.
+    """
+    global _database
+    if _database is None:
+        with _database_lock:
+            if _database is None:
+                _database = Database()
+    return _database
@@ -0,0 +1,175 @@
+import os
+import time
+import queue
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+def coalesce_settings(max_batch_size=None, max_wait_ms=None):
+    """
+    Resolve the request coalescing settings.
+
+    :param max_batch_size: Maximum number of texts per coalesced call (``EMBEDDING_COALESCE_MAX_BATCH``,
+        defaults to ``EMBEDDING_BATCH_SIZE``).
+    :param max_wait_ms: Time a request waits for others to join its call (``EMBEDDING_COALESCE_WINDOW_MS``,
+        0 disables coalescing).
+    :return: Tuple of (max_batch_size, max_wait_ms).
+    """
+    max_batch_size = int(max_batch_size or os.getenv('EMBEDDING_COALESCE_MAX_BATCH')
+                         or os.getenv('EMBEDDING_BATCH_SIZE', 32))
+    max_wait_ms = float(max_wait_ms if max_wait_ms is not None else os.getenv('EMBEDDING_COALESCE_WINDOW_MS', 0))
+    return max_batch_size, max_wait_ms
+
+
+class EmbeddingBatcher:
+    def __init__(self, embed_batch, max_batch_size, max_wait_ms, name="embedding-batcher"):
+        """
+        Merge concurrent embedding requests into shared batch calls.
+
+        A worker thread waits up to ``max_wait_ms`` after the first pending request for more
+        requests to arrive, embeds up to ``max_batch_size`` texts in one call, and resolves every
+        caller's future with its own slice of the result.
+
+        :param embed_batch: Callable embedding a list of texts into a sequence of vectors.
+        :param max_batch_size: Number of texts after which a batch is sent without waiting further.
+        :param max_wait_ms: Maximum time a request waits for others to join its batch.
+        :param name: Name of the worker thread.
+        """
+        self.embed_batch = embed_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.requests = 0
+        self._requests = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, texts):
+        """
+        Queue texts for the next batch.
+
+        :param texts: List of texts to embed.
+        :return: Future resolved with the vectors of ``texts``.
+        """
+        future = Future()
+        self._requests.put((list(texts), future))
+        return future
+
+    def close(self):
+        """
+        Stop the worker once the queued requests are served.
+        """
+        self._requests.put(None)
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return
+            batch = [request]
+            size = len(request[0])
+            deadline = time.monotonic() + self.max_wait
+            closing = False
+            while size < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is None:
+                    closing = True
+                    break
+                batch.append(request)
+                size += len(request[0])
+
+            self._embed(batch)
+            if closing:
+                return
+
+    def _embed(self, batch):
+        self.batches += 1
+        self.requests += len(batch)
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        try:
+            vectors = self.embed_batch(texts)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        start = 0
+        for request_texts, future in batch:
+            future.set_result(vectors[start:start + len(request_texts)])
+            start += len(request_texts)
+
+
+class AsyncEmbeddingBatcher:
+    def __init__(self, embed_batch, max_batch_size, max_wait_ms):
+        """
+        Asyncio counterpart of EmbeddingBatcher, coalescing requests made on the event loop.
+
+        The first pending request arms a timer of ``max_wait_ms``; the batch is sent when the
+        timer fires or as soon as it holds ``max_batch_size`` texts.
+
+        :param embed_batch: Coroutine function embedding a list of texts into a sequence of vectors.
+        :param max_batch_size: Number of texts after which a batch is sent without waiting further.
+        :param max_wait_ms: Maximum time a request waits for others to join its batch.
+        """
+        self.embed_batch = embed_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.requests = 0
+        self._pending = []
+        self._size = 0
+        self._timer = None
+        self._tasks = set()
+
+    async def submit(self, texts):
+        """
+        Embed texts together with the other requests of the current window.
+
+        :param texts: List of texts to embed.
+        :return: Vectors of ``texts``.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((list(texts), future))
+        self._size += len(texts)
+        if self._size >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._size = self._pending, [], 0
+        if batch:
+            task = asyncio.ensure_future(self._embed(batch))
+            # Keep a reference until done, the loop only holds weak ones
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _embed(self, batch):
+        self.batches += 1
+        self.requests += len(batch)
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        try:
+            vectors = await self.embed_batch(texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        start = 0
+        for request_texts, future in batch:
+            if not future.done():
+                future.set_result(vectors[start:start + len(request_texts)])
+            start += len(request_texts)
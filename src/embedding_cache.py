@@ -0,0 +1,268 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from src.metrics import EMBEDDING_CACHE
+
+try:
+    import redis
+    import redis.asyncio as aioredis
+except ImportError:  # Optional dependency, only needed for the shared backend
+    redis = None
+    aioredis = None
+
+
+class RedisEmbeddingBackend:
+    def __init__(self, url, ttl, timeout=None):
+        """
+        Shared embedding cache stored in Redis, so every replica benefits from each other's misses.
+
+        ``get``/``set`` block and are used from worker threads; the event loop goes through
+        ``aget_many``/``aset_many``, which use an asyncio client and one round trip per batch.
+
+        :param url: Redis URL (``EMBEDDING_CACHE_REDIS_URL``).
+        :param ttl: Expiry of cached vectors in seconds.
+        :param timeout: Socket timeout in seconds (``EMBEDDING_CACHE_REDIS_TIMEOUT``).
+        """
+        if redis is None:
+            raise ImportError("The redis package is required for EMBEDDING_CACHE_REDIS_URL")
+        self.ttl = ttl
+        timeout = float(timeout or os.getenv('EMBEDDING_CACHE_REDIS_TIMEOUT', 0.05))
+        self.client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self.async_client = aioredis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+
+    def get(self, key):
+        return self._decode(self.client.get(key))
+
+    def set(self, key, vector):
+        self.client.set(key, self._encode(vector), ex=int(self.ttl))
+
+    async def aget_many(self, keys):
+        """
+        Fetch many vectors with a single MGET.
+
+        :param keys: Cache keys.
+        :return: List of vectors or None, in the same order as ``keys``.
+        """
+        return [self._decode(value) for value in await self.async_client.mget(keys)]
+
+    async def aset_many(self, items):
+        """
+        Store many vectors in one pipelined round trip.
+
+        :param items: List of (key, vector) tuples.
+        """
+        async with self.async_client.pipeline(transaction=False) as pipe:
+            for key, vector in items:
+                pipe.set(key, self._encode(vector), ex=int(self.ttl))
+            await pipe.execute()
+
+    @staticmethod
+    def _encode(vector):
+        return np.asarray(vector, dtype="<f4").tobytes()
+
+    @staticmethod
+    def _decode(value):
+        return np.frombuffer(value, dtype="<f4") if value is not None else None
+
+
+class EmbeddingCache:
+    def __init__(self, maxsize=None, ttl=None, backend=None):
+        """
+        Bounded in-process cache of query embeddings with LRU eviction and TTL.
+
+        Entries are keyed by (model name, normalized text). An optional shared backend is
+        consulted on local misses; backend errors are logged and treated as misses.
+
+        :param maxsize: Maximum number of cached vectors (``EMBEDDING_CACHE_SIZE``, 0 disables the cache).
+        :param ttl: Seconds a vector stays valid (``EMBEDDING_CACHE_TTL``).
+        :param backend: Shared backend, defaults to Redis when ``EMBEDDING_CACHE_REDIS_URL`` is set.
+        """
+        self.maxsize = int(maxsize if maxsize is not None else os.getenv('EMBEDDING_CACHE_SIZE', 10000))
+        self.ttl = float(ttl or os.getenv('EMBEDDING_CACHE_TTL', 3600))
+        redis_url = os.getenv('EMBEDDING_CACHE_REDIS_URL')
+        self.backend = backend or (RedisEmbeddingBackend(redis_url, self.ttl) if redis_url else None)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.backend_hits = 0
+
+    @staticmethod
+    def key(model_name, text):
+        """
+        Build the cache key of a text, ignoring differences in surrounding and repeated whitespace.
+
+        :param model_name: Name of the embedding model.
+        :param text: Text to embed.
+        :return: Cache key.
+        """
+        normalized = " ".join(str(text).split())
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        return f"embedding:{model_name}:{digest}"
+
+    def get(self, model_name, text):
+        """
+        Return the cached vector of a text, or None on a miss.
+
+        :param model_name: Name of the embedding model.
+        :param text: Text to embed.
+        :return: Embedding vector or None.
+        """
+        if self.maxsize <= 0:
+            return None
+        key = self.key(model_name, text)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                EMBEDDING_CACHE.labels(result="hit").inc()
+                return entry[0]
+
+        vector = self._backend_get(key)
+        self._record_backend_lookup(key, vector)
+        return vector
+
+    async def aget_many(self, model_name, texts):
+        """
+        Return the cached vectors of many texts, without blocking the event loop.
+
+        Local misses are looked up in the shared backend with one asynchronous round trip.
+
+        :param model_name: Name of the embedding model.
+        :param texts: Texts to embed.
+        :return: List of embedding vectors or None, in the same order as ``texts``.
+        """
+        if self.maxsize <= 0:
+            return [None] * len(texts)
+        keys = [self.key(model_name, text) for text in texts]
+        vectors = [None] * len(keys)
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for index, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    EMBEDDING_CACHE.labels(result="hit").inc()
+                    vectors[index] = entry[0]
+                else:
+                    missing.append(index)
+        if missing:
+            found = await self._abackend_get_many([keys[index] for index in missing])
+            for index, vector in zip(missing, found):
+                self._record_backend_lookup(keys[index], vector)
+                vectors[index] = vector
+        return vectors
+
+    async def aset_many(self, model_name, items):
+        """
+        Asynchronous variant of ``set`` for many texts at once.
+
+        :param model_name: Name of the embedding model.
+        :param items: List of (text, vector) tuples.
+        """
+        if self.maxsize <= 0 or not items:
+            return
+        keyed = [(self.key(model_name, text), vector) for text, vector in items]
+        for key, vector in keyed:
+            self._store(key, vector)
+        if self.backend is not None:
+            try:
+                await self.backend.aset_many(keyed)
+            except Exception as e:
+                logging.warning(f"Embedding cache backend set failed: {str(e)}")
+
+    def get_stale(self, model_name, text):
+        """
+        Return the local vector of a text even after it expired, as a fallback while the embedding
+        service is unavailable. Expired entries stay until they are evicted or replaced.
+
+        :param model_name: Name of the embedding model.
+        :param text: Text to embed.
+        :return: Embedding vector or None.
+        """
+        with self._lock:
+            entry = self._entries.get(self.key(model_name, text))
+        return entry[0] if entry is not None else None
+
+    def set(self, model_name, text, vector):
+        """
+        Cache the vector of a text locally and in the shared backend.
+
+        :param model_name: Name of the embedding model.
+        :param text: Embedded text.
+        :param vector: Embedding vector.
+        """
+        if self.maxsize <= 0:
+            return
+        key = self.key(model_name, text)
+        self._store(key, vector)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, vector)
+            except Exception as e:
+                logging.warning(f"Embedding cache backend set failed: {str(e)}")
+
+    def _store(self, key, vector):
+        with self._lock:
+            self._entries[key] = (vector, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _backend_get(self, key):
+        if self.backend is None:
+            return None
+        try:
+            return self.backend.get(key)
+        except Exception as e:
+            logging.warning(f"Embedding cache backend get failed: {str(e)}")
+            return None
+
+    async def _abackend_get_many(self, keys):
+        if self.backend is None:
+            return [None] * len(keys)
+        try:
+            return await self.backend.aget_many(keys)
+        except Exception as e:
+            logging.warning(f"Embedding cache backend get failed: {str(e)}")
+            return [None] * len(keys)
+
+    def _record_backend_lookup(self, key, vector):
+        """
+        Count a lookup that missed the local cache, keeping a vector found in the backend locally.
+        """
+        with self._lock:
+            if vector is None:
+                self.misses += 1
+                EMBEDDING_CACHE.labels(result="miss").inc()
+                return
+            self.hits += 1
+            self.backend_hits += 1
+            EMBEDDING_CACHE.labels(result="backend_hit").inc()
+        self._store(key, vector)
+
+    def stats(self):
+        """
+        Report cache effectiveness.
+
+        :return: Dictionary with hits, misses, backend hits, size and hit rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "backend_hits": self.backend_hits,
+                "size": len(self._entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
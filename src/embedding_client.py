@@ -0,0 +1,393 @@
+import ast
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import numpy as np
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.embedding_batcher import EmbeddingBatcher, AsyncEmbeddingBatcher, coalesce_settings
+from src.metrics import count_embedding_call
+
+try:
+    import orjson as _json
+except ImportError:  # orjson is only a faster drop-in for json.loads
+    import json as _json
+
+load_dotenv()
+
+# Response formats of the embedding service, with the Accept header requesting them
+RESPONSE_FORMATS = {
+    "literal": None,
+    "json": "application/json",
+    "f32": "application/octet-stream",
+}
+
+
+class EmbeddingClient:
+    def __init__(self, url=None, model_name=None, batch_url=None, batch_size=None,
+                 concurrency=None, max_retries=None, backoff_factor=None, timeout=None, response_format=None,
+                 coalesce_max_batch=None, coalesce_window_ms=None):
+        """
+        Initialize the EmbeddingClient class.
+
+        Single texts embedded concurrently can be coalesced into shared batch calls, which mainly
+        pays off together with a batch endpoint.
+
+        :param url: Endpoint embedding a single text (``EMBEDDING_MODEL_URL``).
+        :param model_name: Model name sent to the embedding service (``EMBEDDING_MODEL_NAME``).
+        :param batch_url: Optional endpoint embedding a list of texts in one call (``EMBEDDING_BATCH_URL``).
+        :param batch_size: Maximum number of texts sent per batch call (``EMBEDDING_BATCH_SIZE``).
+        :param concurrency: Number of in-flight requests and pooled connections (``EMBEDDING_CONCURRENCY``).
+        :param max_retries: Retries on connection errors and 429/5xx responses (``EMBEDDING_MAX_RETRIES``).
+        :param backoff_factor: Exponential backoff factor between retries (``EMBEDDING_BACKOFF_FACTOR``).
+        :param timeout: Per-request timeout in seconds (``EMBEDDING_TIMEOUT``).
+        :param response_format: ``literal``, ``json`` or ``f32`` (``EMBEDDING_RESPONSE_FORMAT``), see ``decode_vector``.
+        :param coalesce_max_batch: Maximum texts per coalesced call (``EMBEDDING_COALESCE_MAX_BATCH``).
+        :param coalesce_window_ms: Time a single text waits for others (``EMBEDDING_COALESCE_WINDOW_MS``, 0 disables).
+        """
+        self.url = url or os.getenv('EMBEDDING_MODEL_URL')
+        self.model_name = model_name or os.getenv('EMBEDDING_MODEL_NAME')
+        self.response_format = response_format_setting(response_format)
+        self.batch_url = batch_url or os.getenv('EMBEDDING_BATCH_URL')
+        self.batch_size = int(batch_size or os.getenv('EMBEDDING_BATCH_SIZE', 32))
+        self.concurrency = int(concurrency or os.getenv('EMBEDDING_CONCURRENCY', 8))
+        self.max_retries = int(max_retries if max_retries is not None else os.getenv('EMBEDDING_MAX_RETRIES', 3))
+        self.backoff_factor = float(backoff_factor if backoff_factor is not None else os.getenv('EMBEDDING_BACKOFF_FACTOR', 0.5))
+        self.timeout = float(timeout or os.getenv('EMBEDDING_TIMEOUT', 30))
+        self.session = self._build_session()
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embedding")
+        coalesce_max_batch, coalesce_window_ms = coalesce_settings(coalesce_max_batch, coalesce_window_ms)
+        self._batcher = EmbeddingBatcher(
+            self.embed_batch, coalesce_max_batch, coalesce_window_ms
+        ) if coalesce_window_ms > 0 else None
+
+    def _build_session(self):
+        """
+        Build a keep-alive session whose connection pool matches the configured concurrency.
+
+        :return: A configured ``requests.Session``.
+        """
+        retry = Retry(
+            total=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"GET", "POST"}),
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        if RESPONSE_FORMATS[self.response_format]:
+            session.headers["Accept"] = RESPONSE_FORMATS[self.response_format]
+        return session
+
+    def embed(self, text):
+        """
+        Generate embedding for a single text.
+
+        :param text: Text to embed.
+        :return: List representing the embedding vector.
+        """
+        if self._batcher is not None:
+            return self._batcher.submit([text]).result()[0]
+        return self._embed_one(text)
+
+    def _embed_one(self, text):
+        count_embedding_call("single")
+        response = self.session.get(
+            self.url,
+            params={"promt": text, "model_name": self.model_name},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return decode_vector(response.content, self.response_format)
+
+    def embed_batch(self, texts):
+        """
+        Generate embeddings for many texts.
+
+        Texts are split into chunks of ``batch_size``. When a batch endpoint is configured each
+        chunk is a single call, otherwise the texts of a chunk are embedded concurrently over the
+        pooled session.
+
+        :param texts: List of texts to embed.
+        :return: List of embedding vectors, in the same order as ``texts``.
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+
+        chunks = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if self.batch_url:
+            results = self._executor.map(self._embed_chunk, chunks)
+            return [vector for chunk in results for vector in chunk]
+
+        return list(self._executor.map(self._embed_one, texts))
+
+    def _embed_chunk(self, chunk):
+        """
+        Embed one chunk of texts with a single call to the batch endpoint.
+
+        :param chunk: List of texts, at most ``batch_size`` long.
+        :return: List of embedding vectors.
+        """
+        count_embedding_call("batch", len(chunk))
+        response = self.session.post(
+            self.batch_url,
+            json={"promts": chunk, "model_name": self.model_name},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        vectors = decode_vectors(response.content, len(chunk), self.response_format)
+        if len(vectors) != len(chunk):
+            raise ValueError(f"Embedding service returned {len(vectors)} vectors for {len(chunk)} texts")
+        logging.info(f"Embedded batch of {len(chunk)} texts")
+        return vectors
+
+    def close(self):
+        """
+        Release pooled connections and worker threads.
+        """
+        if self._batcher is not None:
+            self._batcher.close()
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+class AsyncEmbeddingClient:
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, url=None, model_name=None, concurrency=None, max_retries=None, backoff_factor=None, timeout=None,
+                 response_format=None, batch_url=None, batch_size=None, coalesce_max_batch=None, coalesce_window_ms=None):
+        """
+        Initialize the AsyncEmbeddingClient class, the asyncio counterpart of EmbeddingClient.
+
+        It reads the same settings and keeps a pooled keep-alive ``httpx.AsyncClient``.
+
+        :param url: Endpoint embedding a single text (``EMBEDDING_MODEL_URL``).
+        :param model_name: Model name sent to the embedding service (``EMBEDDING_MODEL_NAME``).
+        :param concurrency: Maximum number of in-flight requests and pooled connections (``EMBEDDING_CONCURRENCY``).
+        :param max_retries: Retries on transport errors and 429/5xx responses (``EMBEDDING_MAX_RETRIES``).
+        :param backoff_factor: Exponential backoff factor between retries (``EMBEDDING_BACKOFF_FACTOR``).
+        :param timeout: Per-request timeout in seconds (``EMBEDDING_TIMEOUT``).
+        :param response_format: ``literal``, ``json`` or ``f32`` (``EMBEDDING_RESPONSE_FORMAT``), see ``decode_vector``.
+        :param batch_url: Optional endpoint embedding a list of texts in one call (``EMBEDDING_BATCH_URL``).
+        :param batch_size: Maximum number of texts sent per batch call (``EMBEDDING_BATCH_SIZE``).
+        :param coalesce_max_batch: Maximum texts per coalesced call (``EMBEDDING_COALESCE_MAX_BATCH``).
+        :param coalesce_window_ms: Time a single text waits for others (``EMBEDDING_COALESCE_WINDOW_MS``, 0 disables).
+        """
+        self.url = url or os.getenv('EMBEDDING_MODEL_URL')
+        self.model_name = model_name or os.getenv('EMBEDDING_MODEL_NAME')
+        self.response_format = response_format_setting(response_format)
+        self.batch_url = batch_url or os.getenv('EMBEDDING_BATCH_URL')
+        self.batch_size = int(batch_size or os.getenv('EMBEDDING_BATCH_SIZE', 32))
+        self.concurrency = int(concurrency or os.getenv('EMBEDDING_CONCURRENCY', 8))
+        self.max_retries = int(max_retries if max_retries is not None else os.getenv('EMBEDDING_MAX_RETRIES', 3))
+        self.backoff_factor = float(backoff_factor if backoff_factor is not None else os.getenv('EMBEDDING_BACKOFF_FACTOR', 0.5))
+        self.timeout = float(timeout or os.getenv('EMBEDDING_TIMEOUT', 30))
+        accept = RESPONSE_FORMATS[self.response_format]
+        self.client = httpx.AsyncClient(
+            headers={"Accept": accept} if accept else None,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+        )
+        # Requests beyond the pool would only wait for a connection and time out there
+        self._in_flight = asyncio.Semaphore(self.concurrency)
+        coalesce_max_batch, coalesce_window_ms = coalesce_settings(coalesce_max_batch, coalesce_window_ms)
+        self._batcher = AsyncEmbeddingBatcher(
+            self.embed_batch, coalesce_max_batch, coalesce_window_ms
+        ) if coalesce_window_ms > 0 else None
+
+    async def embed(self, text):
+        """
+        Generate embedding for a single text.
+
+        :param text: Text to embed.
+        :return: List representing the embedding vector.
+        """
+        if self._batcher is not None:
+            return (await self._batcher.submit([text]))[0]
+        return await self._embed_one(text)
+
+    async def _embed_one(self, text):
+        async with self._in_flight:
+            count_embedding_call("single")
+            response = await self._request("GET", self.url, params={"promt": text, "model_name": self.model_name})
+        return decode_vector(response.content, self.response_format)
+
+    async def embed_batch(self, texts):
+        """
+        Generate embeddings for many texts.
+
+        With a batch endpoint each chunk of ``batch_size`` texts is a single call, otherwise the
+        texts are embedded concurrently over the pooled client, ``concurrency`` calls at a time.
+
+        :param texts: List of texts to embed.
+        :return: List of embedding vectors, in the same order as ``texts``.
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        if self.batch_url:
+            chunks = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+            results = await asyncio.gather(*(self._embed_chunk(chunk) for chunk in chunks))
+            return [vector for chunk in results for vector in chunk]
+        return list(await asyncio.gather(*(self._embed_one(text) for text in texts)))
+
+    async def _embed_chunk(self, chunk):
+        async with self._in_flight:
+            count_embedding_call("batch", len(chunk))
+            response = await self._request("POST", self.batch_url, json={"promts": chunk, "model_name": self.model_name})
+        vectors = decode_vectors(response.content, len(chunk), self.response_format)
+        if len(vectors) != len(chunk):
+            raise ValueError(f"Embedding service returned {len(vectors)} vectors for {len(chunk)} texts")
+        return vectors
+
+    async def _request(self, method, url, **kwargs):
+        """
+        Send a request, retrying transport errors and 429/5xx responses with exponential backoff.
+
+        :return: The successful ``httpx.Response``.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.client.request(method, url, **kwargs)
+                if response.status_code not in self.RETRY_STATUSES or attempt == self.max_retries:
+                    response.raise_for_status()
+                    return response
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+
+    async def close(self):
+        """
+        Release pooled connections.
+        """
+        await self.client.aclose()
+
+
+def response_format_setting(response_format=None):
+    """
+    Resolve and validate the configured response format.
+
+    :param response_format: Explicit format, defaults to ``EMBEDDING_RESPONSE_FORMAT``.
+    :return: One of the keys of ``RESPONSE_FORMATS``.
+    """
+    response_format = (response_format or os.getenv('EMBEDDING_RESPONSE_FORMAT', 'literal')).lower()
+    if response_format not in RESPONSE_FORMATS:
+        raise ValueError(f"Unsupported EMBEDDING_RESPONSE_FORMAT: {response_format}")
+    return response_format
+
+
+def decode_vector(content, response_format="literal"):
+    """
+    Decode an embedding returned by the embedding service.
+
+    ``literal`` is the legacy Python-literal body. ``json`` is parsed with orjson when available,
+    and ``f32`` is raw little-endian float32 bytes viewed as a NumPy array without copying.
+    Qdrant accepts the NumPy arrays as they are, so they are never turned back into lists here.
+
+    :param content: Raw response body.
+    :param response_format: One of the keys of ``RESPONSE_FORMATS``.
+    :return: Embedding vector, a list for ``literal`` and a float32 NumPy array otherwise.
+    """
+    if response_format == "f32":
+        return np.frombuffer(content, dtype="<f4")
+    if response_format == "json":
+        return np.asarray(_json.loads(content), dtype=np.float32)
+    return ast.literal_eval(content.decode("utf-8"))
+
+
+def decode_vectors(content, count, response_format="literal"):
+    """
+    Decode the embeddings of a batch call, the same way ``decode_vector`` decodes a single one.
+
+    :param content: Raw response body.
+    :param count: Number of texts in the batch, used to shape ``f32`` bodies.
+    :param response_format: One of the keys of ``RESPONSE_FORMATS``.
+    :return: Sequence of embedding vectors, a 2-D float32 NumPy array unless ``literal``.
+    """
+    if response_format == "f32":
+        return np.frombuffer(content, dtype="<f4").reshape(count, -1)
+    if response_format == "json":
+        return np.asarray(_json.loads(content), dtype=np.float32)
+    return ast.literal_eval(content.decode("utf-8"))
+
+
+def embedding_backend_setting():
+    """
+    Resolve the configured embedding backend.
+
+    :return: ``remote`` for the HTTP embedding service or ``local`` for the in-process model.
+    """
+    backend = os.getenv('EMBEDDING_BACKEND', 'remote').lower()
+    if backend not in ("remote", "local"):
+        raise ValueError(f"Unsupported EMBEDDING_BACKEND: {backend}")
+    return backend
+
+
+def create_embedding_client():
+    """
+    Create the sync embedding backend selected by ``EMBEDDING_BACKEND``.
+
+    :return: EmbeddingClient or LocalEmbeddingBackend.
+    """
+    if embedding_backend_setting() == "local":
+        # Imported lazily so remote deployments never load torch
+        from src.local_embedding import LocalEmbeddingBackend
+        return LocalEmbeddingBackend()
+    return EmbeddingClient()
+
+
+def create_async_embedding_client(embedding_client=None):
+    """
+    Create the async embedding backend selected by ``EMBEDDING_BACKEND``.
+
+    :param embedding_client: Sync backend to share with, so a local model is loaded only once.
+    :return: AsyncEmbeddingClient or AsyncLocalEmbeddingBackend.
+    """
+    if embedding_backend_setting() == "local":
+        from src.local_embedding import AsyncLocalEmbeddingBackend, LocalEmbeddingBackend
+        if not isinstance(embedding_client, LocalEmbeddingBackend):
+            embedding_client = get_embedding_client()
+        return AsyncLocalEmbeddingBackend(embedding_client)
+    return AsyncEmbeddingClient()
+
+
+_client = None
+_client_lock = threading.Lock()
+_async_client = None
+
+
+def get_embedding_client():
+    """
+    Return the process-wide sync embedding backend, creating it on first use.
+
+    :return: Shared EmbeddingClient or LocalEmbeddingBackend instance.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_embedding_client()
+    return _client
+
+
+def get_async_embedding_client():
+    """
+    Return the process-wide async embedding backend, creating it on first use.
+
+    :return: Shared AsyncEmbeddingClient or AsyncLocalEmbeddingBackend instance.
+    """
+    global _async_client
+    if _async_client is None:
+        _async_client = create_async_embedding_client()
+    return _async_client
@@ -0,0 +1,62 @@
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+
+class EmbeddingMemo:
+    def __init__(self, path=None):
+        """
+        Persistent memo of ingested embeddings, keyed by the hash of model name and text.
+
+        Vectors are stored as float32 blobs in a local SQLite file, so re-ingesting an unchanged
+        text never calls the embedding service again, across restarts and collections.
+
+        :param path: SQLite file (``EMBEDDING_MEMO_PATH``).
+        """
+        self.path = path or os.getenv('EMBEDDING_MEMO_PATH')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embedding_memo (hash TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+
+    def get_many(self, hashes):
+        """
+        Look up the vectors of many text hashes in one query.
+
+        :param hashes: List of text hashes.
+        :return: Dictionary mapping the found hashes to float32 NumPy vectors.
+        """
+        hashes = list(set(hashes))
+        if not hashes:
+            return {}
+        # SQLite limits the number of bound variables per statement
+        found = {}
+        with self._lock:
+            for i in range(0, len(hashes), 500):
+                chunk = hashes[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embedding_memo WHERE hash IN ({', '.join('?' for _ in chunk)})", chunk
+                ).fetchall()
+                found.update((key, np.frombuffer(vector, dtype="<f4")) for key, vector in rows)
+        return found
+
+    def set_many(self, items):
+        """
+        Store many vectors in one transaction.
+
+        :param items: Iterable of (text hash, vector) pairs.
+        """
+        rows = [(key, np.asarray(vector, dtype="<f4").tobytes()) for key, vector in items]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embedding_memo (hash, vector) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
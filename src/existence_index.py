@@ -0,0 +1,103 @@
+import os
+import threading
+from collections import OrderedDict
+
+from qdrant_client.http.models import Filter, FieldCondition, MatchAny
+
+# Keys known to exist per collection, shared by every agent of the process
+_known_keys = {}
+_lock = threading.Lock()
+
+
+class ProfileExistenceIndex:
+    def __init__(self, qdrant_client, collection_name, max_keys=None, page_size=None):
+        """
+        Answer "does a (video_id, topic_category) point already exist?" without vector searches.
+
+        Lookups go through a process-wide cache of known keys first, and the remaining video_ids
+        are resolved with a single paginated, payload-filtered scroll, served by the keyword indexes
+        CollectionManager creates on ``video_id`` and ``topic_category``.
+
+        :param qdrant_client: QdrantClient used for the scroll.
+        :param collection_name: Name of the profile collection.
+        :param max_keys: Maximum number of cached keys (``PROFILE_KEY_CACHE_SIZE``).
+        :param page_size: Points fetched per scroll page (``PROFILE_SCROLL_PAGE_SIZE``).
+        """
+        self.qdrant_client = qdrant_client
+        self.collection_name = collection_name
+        self.max_keys = int(max_keys or os.getenv('PROFILE_KEY_CACHE_SIZE', 100000))
+        self.page_size = int(page_size or os.getenv('PROFILE_SCROLL_PAGE_SIZE', 256))
+
+    @staticmethod
+    def key(row):
+        """
+        Build the deduplication key of a profile row or payload.
+
+        :param row: Row dictionary or point payload.
+        :return: Tuple of (video_id, topic_category).
+        """
+        return (str(row['video_id']), row.get('topic_category', ''))
+
+    def existing_keys(self, rows):
+        """
+        Return the keys of ``rows`` that already exist in the collection.
+
+        :param rows: List of profile row dictionaries.
+        :return: Set of (video_id, topic_category) tuples.
+        """
+        keys = {self.key(row) for row in rows}
+        with _lock:
+            cached = _known_keys.setdefault(self.collection_name, OrderedDict())
+            found = {key for key in keys if key in cached}
+
+        pending_video_ids = {row['video_id'] for row in rows if self.key(row) not in found}
+        if not pending_video_ids:
+            return found
+
+        stored = self._scroll_keys(pending_video_ids)
+        self.add(stored)
+        return found | (stored & keys)
+
+    def _scroll_keys(self, video_ids):
+        """
+        Fetch the keys of every point for the given video_ids with one paginated scroll.
+
+        :param video_ids: Collection of video_ids to look up.
+        :return: Set of (video_id, topic_category) tuples stored in Qdrant.
+        """
+        query_filter = Filter(
+            must=[
+                FieldCondition(
+                    key="video_id",
+                    match=MatchAny(any=list(video_ids))
+                )
+            ]
+        )
+        stored = set()
+        offset = None
+        while True:
+            points, offset = self.qdrant_client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=query_filter,
+                limit=self.page_size,
+                offset=offset,
+                with_payload=["video_id", "topic_category"],
+                with_vectors=False,
+            )
+            stored.update(self.key(point.payload) for point in points)
+            if offset is None:
+                return stored
+
+    def add(self, keys):
+        """
+        Remember keys as existing, evicting the oldest ones beyond ``max_keys``.
+
+        :param keys: Iterable of (video_id, topic_category) tuples.
+        """
+        with _lock:
+            cached = _known_keys.setdefault(self.collection_name, OrderedDict())
+            for key in keys:
+                cached[key] = True
+                cached.move_to_end(key)
+            while len(cached) > self.max_keys:
+                cached.popitem(last=False)
@@ -0,0 +1,126 @@
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from src.collection_manager import INDEXED_FIELDS
+from src.db import placeholders
+from src.queries import content_rows_query, profile_rows_query
+
+load_dotenv()
+
+# Change-detection hashes stored with each point, internal to ingestion
+HASH_FIELDS = ("text_hash", "row_hash")
+
+# Payload kept in Qdrant in compact mode: the row id, the filtered fields and the change-detection hashes
+COMPACT_FIELDS = {mode: ("id",) + fields + HASH_FIELDS for mode, fields in INDEXED_FIELDS.items()}
+
+
+def compact_payload(payload, mode):
+    """
+    Strip a payload down to the fields stored in compact mode.
+
+    :param payload: Full payload built from the MySQL row.
+    :param mode: Determines the type of data (content or profile).
+    :return: Compact payload.
+    """
+    return {k: payload[k] for k in COMPACT_FIELDS[mode] if k in payload}
+
+
+class PayloadHydrator:
+    def __init__(self, settings, db=None, async_db=None, ttl=None, maxsize=None):
+        """
+        Load the full rows of search hits from MySQL when Qdrant only holds compact payloads.
+
+        Rows missing from the TTL cache are fetched with one ``IN (...)`` query per call, using
+        the same queries as ingestion so hydrated matches look like full payloads.
+
+        :param settings: Parsed Settings holding the database and table names.
+        :param db: Database used by ``hydrate``.
+        :param async_db: AsyncDatabase used by ``ahydrate``.
+        :param ttl: Seconds a row stays cached (``HYDRATION_CACHE_TTL``).
+        :param maxsize: Maximum number of cached rows (``HYDRATION_CACHE_SIZE``, 0 disables the cache).
+        """
+        self.settings = settings
+        self.db = db
+        self.async_db = async_db
+        self.ttl = float(ttl or os.getenv('HYDRATION_CACHE_TTL', 30))
+        self.maxsize = int(maxsize if maxsize is not None else os.getenv('HYDRATION_CACHE_SIZE', 10000))
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hydrate(self, mode, ids):
+        """
+        Fetch the rows of the given point ids.
+
+        :param mode: Determines the type of data (content or profile).
+        :param ids: Point ids, which are the MySQL row ids.
+        :return: Dictionary of id to row, for the rows that still exist.
+        """
+        rows, missing = self._cached(mode, ids)
+        if missing:
+            query, params = self._query(mode, missing)
+            rows.update(self._store(mode, self.db.fetch_all(query, params) or []))
+        return rows
+
+    async def ahydrate(self, mode, ids):
+        """
+        Asynchronous variant of ``hydrate``.
+
+        :param mode: Determines the type of data (content or profile).
+        :param ids: Point ids, which are the MySQL row ids.
+        :return: Dictionary of id to row, for the rows that still exist.
+        """
+        rows, missing = self._cached(mode, ids)
+        if missing:
+            query, params = self._query(mode, missing)
+            rows.update(self._store(mode, await self.async_db.fetch_all(query, params) or []))
+        return rows
+
+    def _cached(self, mode, ids):
+        """
+        Split ids into cached rows and ids to fetch.
+
+        :return: Tuple of (dictionary of id to cached row, list of missing ids).
+        """
+        rows, missing = {}, []
+        now = time.monotonic()
+        with self._lock:
+            for row_id in dict.fromkeys(ids):
+                entry = self._rows.get((mode, row_id))
+                if entry is not None and entry[1] > now:
+                    self._rows.move_to_end((mode, row_id))
+                    rows[row_id] = entry[0]
+                else:
+                    missing.append(row_id)
+        return rows, missing
+
+    def _query(self, mode, ids):
+        if mode == 'content':
+            return content_rows_query(self.settings, f"id IN ({placeholders(ids)})"), ids
+        return profile_rows_query(self.settings, f"a.id IN ({placeholders(ids)})"), ids
+
+    def _store(self, mode, rows):
+        """
+        Format and cache fetched rows.
+
+        :return: Dictionary of id to row.
+        """
+        fetched = {}
+        for row in rows:
+            row = {k: v.strftime("%Y-%m-%d %H:%M:%S") if isinstance(v, datetime) else v for k, v in row.items()}
+            fetched[row['id']] = row
+        if self.maxsize > 0:
+            expires = time.monotonic() + self.ttl
+            with self._lock:
+                for row_id, row in fetched.items():
+                    self._rows[(mode, row_id)] = (row, expires)
+                    self._rows.move_to_end((mode, row_id))
+                while len(self._rows) > self.maxsize:
+                    self._rows.popitem(last=False)
+        logging.info(f"Hydrated {len(fetched)} {mode} rows from MySQL")
+        return fetched
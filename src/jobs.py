@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+try:
+    import redis
+except ImportError:  # Optional dependency, only needed for the shared job store
+    redis = None
+
+load_dotenv()
+
+
+class RedisJobStore:
+    def __init__(self, url, ttl=None, timeout=None):
+        """
+        Job statuses stored in Redis, so a job can be polled on any replica.
+
+        :param url: Redis URL (``JOB_STORE_REDIS_URL``).
+        :param ttl: Seconds a status is kept after its last update (``JOB_STORE_TTL``).
+        :param timeout: Socket timeout in seconds (``JOB_STORE_REDIS_TIMEOUT``).
+        """
+        if redis is None:
+            raise ImportError("The redis package is required for JOB_STORE_REDIS_URL")
+        self.ttl = int(ttl or os.getenv('JOB_STORE_TTL', 86400))
+        timeout = float(timeout or os.getenv('JOB_STORE_REDIS_TIMEOUT', 1))
+        self.client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+
+    def save(self, job):
+        self.client.set(f"job:{job['job_id']}", json.dumps(job, default=str), ex=self.ttl)
+
+    def get(self, job_id):
+        value = self.client.get(f"job:{job_id}")
+        return json.loads(value) if value is not None else None
+
+
+class JobManager:
+    def __init__(self, concurrency=None, batch_size=None, row_retries=None, history_size=None, store=None):
+        """
+        Run ingestion jobs in the background on a bounded worker pool.
+
+        A job splits its IDs into batches. When a batch fails, each of its IDs is retried on its own,
+        so one bad row only fails itself instead of the whole job.
+
+        Jobs run in the process that accepted them. Their status is kept in memory, so with several
+        replicas behind a load balancer a poll can land on a replica that does not know the job,
+        unless a shared store is configured with ``JOB_STORE_REDIS_URL``. Jobs still queued when
+        the process shuts down are not run, and are reported as ``cancelled``.
+
+        :param concurrency: Number of jobs running at once (``JOB_CONCURRENCY``), the others wait in line.
+        :param batch_size: IDs processed per batch (``JOB_BATCH_SIZE``).
+        :param row_retries: Attempts per ID after its batch failed (``JOB_ROW_RETRIES``).
+        :param history_size: Number of jobs whose status is kept (``JOB_HISTORY_SIZE``).
+        :param store: Shared status store, defaults to Redis when ``JOB_STORE_REDIS_URL`` is set.
+        """
+        self.concurrency = int(concurrency or os.getenv('JOB_CONCURRENCY', 2))
+        self.batch_size = int(batch_size or os.getenv('JOB_BATCH_SIZE', 100))
+        self.row_retries = int(row_retries if row_retries is not None else os.getenv('JOB_ROW_RETRIES', 2))
+        self.history_size = int(history_size or os.getenv('JOB_HISTORY_SIZE', 1000))
+        redis_url = os.getenv('JOB_STORE_REDIS_URL')
+        self.store = store or (RedisJobStore(redis_url) if redis_url else None)
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, ids, work):
+        """
+        Queue a job and return immediately.
+
+        :param ids: IDs to process.
+        :param work: Callable processing a list of IDs, raising on failure.
+        :return: Status dictionary of the new job.
+        """
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "total": len(ids),
+            "processed": 0,
+            "failed": 0,
+            "failures": {},
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            while len(self._jobs) > self.history_size:
+                self._jobs.popitem(last=False)
+        self._save(job)
+        self._executor.submit(self._run, job, list(ids), work)
+        logging.info(f"Queued job {job_id} with {len(ids)} IDs")
+        return self.status(job_id)
+
+    def status(self, job_id):
+        """
+        Report the progress of a job.
+
+        :param job_id: Job id returned by ``submit``.
+        :return: Status dictionary with counts and throughput in IDs per second, or None if unknown.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            status = {**job, "failures": dict(job["failures"])} if job is not None else None
+        if status is None:
+            # Jobs accepted by another replica
+            status = self._load(job_id)
+            if status is None:
+                return None
+        started_at = status["started_at"]
+        elapsed = ((status["finished_at"] or time.time()) - started_at) if started_at else 0
+        status["elapsed"] = elapsed
+        status["throughput"] = status["processed"] / elapsed if elapsed else 0.0
+        return status
+
+    def _run(self, job, ids, work):
+        with self._lock:
+            if job["status"] == "cancelled":
+                return
+        self._update(job, status="running", started_at=time.time())
+        for i in range(0, len(ids), self.batch_size):
+            batch = ids[i:i + self.batch_size]
+            try:
+                work(batch)
+                self._update(job, processed=job["processed"] + len(batch))
+            except Exception as e:
+                logging.warning(f"Job {job['job_id']} batch failed, retrying its IDs one by one: {str(e)}")
+                for row_id in batch:
+                    self._run_row(job, row_id, work)
+
+        status = "failed" if job["failed"] == job["total"] and job["total"] else "completed"
+        self._update(job, status=status, finished_at=time.time())
+        logging.info(f"Job {job['job_id']} {status}: {job['processed']} processed, {job['failed']} failed")
+
+    def _run_row(self, job, row_id, work):
+        error = None
+        for _ in range(max(self.row_retries, 1)):
+            try:
+                work([row_id])
+                self._update(job, processed=job["processed"] + 1)
+                return
+            except Exception as e:
+                error = e
+        with self._lock:
+            job["failed"] += 1
+            job["failures"][row_id] = str(error)
+        self._save(job)
+
+    def _update(self, job, **fields):
+        with self._lock:
+            job.update(fields)
+        self._save(job)
+
+    def _save(self, job):
+        if self.store is None:
+            return
+        with self._lock:
+            snapshot = {**job, "failures": dict(job["failures"])}
+        try:
+            self.store.save(snapshot)
+        except Exception as e:
+            logging.warning(f"Job store save failed for job {job['job_id']}: {str(e)}")
+
+    def _load(self, job_id):
+        if self.store is None:
+            return None
+        try:
+            return self.store.get(job_id)
+        except Exception as e:
+            logging.warning(f"Job store get failed for job {job_id}: {str(e)}")
+            return None
+
+    def close(self):
+        """
+        Stop accepting jobs and drop the queued ones, marking them cancelled, without waiting for running ones.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            queued = [job for job in self._jobs.values() if job["status"] == "queued"]
+            for job in queued:
+                job.update(status="cancelled", finished_at=time.time())
+        for job in queued:
+            self._save(job)
+        if queued:
+            logging.warning(f"Cancelled {len(queued)} queued jobs on shutdown")
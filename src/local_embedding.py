@@ -0,0 +1,128 @@
+import os
+import asyncio
+import logging
+
+import torch
+import sentence_transformers
+from sentence_transformers import SentenceTransformer
+
+from src.embedding_batcher import EmbeddingBatcher
+from src.metrics import count_embedding_call
+
+
+def supports_onnx_backend():
+    """
+    Whether the installed sentence-transformers can load ONNX exports (3.2 and later).
+
+    :return: True when ``SentenceTransformer(backend="onnx")`` is available.
+    """
+    major, minor = (int(part) for part in sentence_transformers.__version__.split(".")[:2])
+    return (major, minor) >= (3, 2)
+
+
+class LocalEmbeddingBackend:
+    def __init__(self, model_name=None, prefix=None, threads=None, batch_size=None, max_wait_ms=None, onnx=None,
+                 onnx_file=None):
+        """
+        In-process CPU embedding backend built on SentenceTransformer.
+
+        The nomic models expect a task prefix such as ``"search_query: "`` before every text; it
+        is configured explicitly, as the remote service's model tags (``nomic-embed-text:latest``)
+        carry no task.
+
+        :param model_name: SentenceTransformer model id (``EMBEDDING_MODEL_NAME``).
+        :param prefix: Text prepended to every input, empty by default (``LOCAL_EMBEDDING_PREFIX``).
+        :param threads: Torch intra-op threads for this process (``LOCAL_EMBEDDING_THREADS``).
+        :param batch_size: Maximum number of texts per encode call (``EMBEDDING_BATCH_SIZE``).
+        :param max_wait_ms: Time a request waits for concurrent ones to join its batch (``LOCAL_EMBEDDING_MAX_WAIT_MS``).
+        :param onnx: Load the ONNX export instead of the torch weights (``LOCAL_EMBEDDING_ONNX``).
+        :param onnx_file: ONNX file inside the model repository, e.g. a quantized one (``LOCAL_EMBEDDING_ONNX_FILE``).
+        """
+        model_id = self.model_name = model_name or os.getenv('EMBEDDING_MODEL_NAME')
+        self.prefix = prefix if prefix is not None else os.getenv('LOCAL_EMBEDDING_PREFIX', '')
+        if self.prefix:
+            # Prefixed texts give different vectors, keep them apart in caches
+            self.model_name = f"{self.model_name}:prefix:{self.prefix}"
+        self.batch_size = int(batch_size or os.getenv('EMBEDDING_BATCH_SIZE', 32))
+        threads = int(threads or os.getenv('LOCAL_EMBEDDING_THREADS', 0))
+        if threads:
+            torch.set_num_threads(threads)
+
+        onnx = onnx if onnx is not None else os.getenv('LOCAL_EMBEDDING_ONNX', 'false').lower() == 'true'
+        # backend/model_kwargs only exist from sentence-transformers 3.2, the torch path does without them
+        backend_kwargs = {}
+        if onnx:
+            if not supports_onnx_backend():
+                raise ImportError(
+                    f"LOCAL_EMBEDDING_ONNX requires sentence-transformers>=3.2, found {sentence_transformers.__version__}"
+                )
+            onnx_file = onnx_file or os.getenv('LOCAL_EMBEDDING_ONNX_FILE')
+            backend_kwargs = {"backend": "onnx", "model_kwargs": {"file_name": onnx_file} if onnx_file else None}
+            # Quantized weights give different vectors, keep them apart in caches
+            self.model_name = f"{self.model_name}:onnx:{onnx_file or 'model'}"
+
+        logging.info(f"Loading local embedding model {model_id} (onnx={onnx})")
+        self.model = SentenceTransformer(
+            model_id,
+            trust_remote_code=True,
+            device="cpu",
+            **backend_kwargs,
+        )
+        self._batcher = EmbeddingBatcher(
+            self._encode,
+            max_batch_size=self.batch_size,
+            max_wait_ms=float(max_wait_ms or os.getenv('LOCAL_EMBEDDING_MAX_WAIT_MS', 5)),
+            name="local-embedding",
+        )
+
+    def _encode(self, texts):
+        count_embedding_call("local", len(texts))
+        return self.model.encode([f"{self.prefix}{text}" for text in texts], batch_size=self.batch_size)
+
+    def embed(self, text):
+        """
+        Generate embedding for a single text.
+
+        :param text: Text to embed.
+        :return: float32 NumPy embedding vector.
+        """
+        return self.embed_batch([text])[0]
+
+    def embed_batch(self, texts):
+        """
+        Generate embeddings for many texts, sharing model calls with concurrent requests.
+
+        :param texts: List of texts to embed.
+        :return: 2-D float32 NumPy array, one row per text.
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        return self._batcher.submit(texts).result()
+
+    def close(self):
+        self._batcher.close()
+
+
+class AsyncLocalEmbeddingBackend:
+    def __init__(self, backend):
+        """
+        Asyncio facade over a LocalEmbeddingBackend, so the event loop never runs the model.
+
+        :param backend: LocalEmbeddingBackend shared with the sync path.
+        """
+        self.backend = backend
+        self.model_name = backend.model_name
+
+    async def embed(self, text):
+        vectors = await asyncio.wrap_future(self.backend._batcher.submit([text]))
+        return vectors[0]
+
+    async def embed_batch(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+        return await asyncio.wrap_future(self.backend._batcher.submit(texts))
+
+    async def close(self):
+        pass
@@ -1,38 +1,134 @@
-from qdrant_client import QdrantClient
-from sentence_transformers import SentenceTransformer
-import os
-import ast
-import requests
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from src.embedding_client import get_embedding_client, get_async_embedding_client
+from src.embedding_cache import EmbeddingCache
+from src.settings import Settings
+from src.metrics import stage, DEGRADED_RESPONSES
+from src.resilience import DependencyGuard
+from src.hydration import HASH_FIELDS
+from src.sparse_encoder import SparseEncoder, DENSE_VECTOR, SPARSE_VECTOR
+from qdrant_client.http.models import (Filter, FieldCondition, MatchValue, MatchAny, SearchRequest, SearchParams,
+                                       QuantizationSearchParams, QueryRequest)
 import logging
 
-# model = SentenceTransformer("nomic-ai/nomic-embed-text-v1", trust_remote_code=True)
+# Rank offset of Reciprocal Rank Fusion, the usual 60 keeps one top rank from dominating the sum
+RRF_K = 60
+
+
+_async_qdrant_client = None
+
+
+def get_async_qdrant_client():
+    """
+    Return the process-wide AsyncQdrantClient, creating it on first use.
+
+    :return: Shared AsyncQdrantClient instance.
+    """
+    global _async_qdrant_client
+    if _async_qdrant_client is None:
+        _async_qdrant_client = AsyncQdrantClient(**Settings.from_env().qdrant_client_kwargs())
+    return _async_qdrant_client
 
 
 class MegaSimilarityAgent:
-    def __init__(self):
-        self.qdrant_client = QdrantClient(url=os.getenv('QDRANT_HOST'), api_key=os.getenv('QDRANT_API_KEY'))
-        self.embedding_url = os.getenv('EMBEDDING_MODEL_URL')
-        self.embedding_model_name = os.getenv('EMBEDDING_MODEL_NAME')
+    def __init__(self, embedding_client=None, async_embedding_client=None, async_qdrant_client=None,
+                 settings=None, qdrant_client=None, embedding_cache=None, hydrator=None, embedding_guard=None,
+                 qdrant_guard=None):
+        """
+        Initialize the MegaSimilarityAgent class.
+
+        With ``HYBRID_SEARCH`` every search, by text or by stored vector, single or batched, is
+        fused with a sparse keyword query, each side fetching ``HYBRID_PREFETCH_FACTOR`` times
+        ``top_k`` candidates. See ``_fuse`` for the scores returned.
+
+        :param embedding_client: EmbeddingClient to use, defaults to the process-wide client.
+        :param async_embedding_client: AsyncEmbeddingClient to use, defaults to the process-wide client.
+        :param async_qdrant_client: AsyncQdrantClient to use, defaults to the process-wide client.
+        :param settings: Parsed Settings, read from the environment when omitted.
+        :param qdrant_client: QdrantClient to use, created from ``settings`` when omitted.
+        :param embedding_cache: EmbeddingCache for query texts, a new one is created when omitted.
+        :param hydrator: PayloadHydrator loading the full rows of hits when points hold compact payloads.
+        :param embedding_guard: DependencyGuard around embedding calls, configured by ``EMBEDDING_*`` when omitted.
+        :param qdrant_guard: DependencyGuard around Qdrant calls, configured by ``QDRANT_*`` when omitted.
+        """
+        self.settings = settings or Settings.from_env()
+        self.qdrant_client = qdrant_client or QdrantClient(**self.settings.qdrant_client_kwargs())
+        self.embedding_client = embedding_client or get_embedding_client()
+        self.embedding_cache = embedding_cache if embedding_cache is not None else EmbeddingCache()
+        self._async_embedding_client = async_embedding_client
+        self._async_qdrant_client = async_qdrant_client
+        self.hydrator = hydrator
+        self.embedding_guard = embedding_guard or DependencyGuard("EMBEDDING")
+        self.qdrant_guard = qdrant_guard or DependencyGuard("QDRANT")
+        self.sparse_encoder = SparseEncoder() if self.settings.hybrid_search else None
+        self.hybrid_prefetch = self.settings.hybrid_prefetch_factor
+
+    @property
+    def async_embedding_client(self):
+        if self._async_embedding_client is None:
+            self._async_embedding_client = get_async_embedding_client()
+        return self._async_embedding_client
+
+    @property
+    def async_qdrant_client(self):
+        if self._async_qdrant_client is None:
+            self._async_qdrant_client = get_async_qdrant_client()
+        return self._async_qdrant_client
 
     def generate_embedding(self, text):
         """
         Generate embedding for a given text using the embedding model.
 
+        When the embedding call fails, an expired cached vector of the same text is used instead.
+
         :param text: Text to embed.
         :return: List representing the embedding vector.
         """
-        
-        # embed_text = [f'search_query: {text}']
-        # embedded_text = model.encode(embed_text)
-        
-        # embedded_text = embedded_text.flatten()
+        model_name = self.embedding_client.model_name
+        embedding = self.embedding_cache.get(model_name, text)
+        if embedding is None:
+            try:
+                with stage("embed"):
+                    embedding = self.embedding_guard.call_sync(self.embedding_client.embed, text)
+            except Exception as e:
+                return self._stale_embedding(model_name, text, e)
+            self.embedding_cache.set(model_name, text, embedding)
+        return embedding
 
-        embed_text = requests.get(self.embedding_url, params={"promt": text, "model_name":self.embedding_model_name})
-        embedded_text = ast.literal_eval(embed_text.content.decode("utf-8"))
-        
-        return embedded_text
+    async def agenerate_embedding(self, text):
+        """
+        Asynchronous variant of ``generate_embedding``, sharing the same embedding cache.
+
+        :param text: Text to embed.
+        :return: List representing the embedding vector.
+        """
+        model_name = self.async_embedding_client.model_name
+        embedding, = await self.embedding_cache.aget_many(model_name, [text])
+        if embedding is None:
+            try:
+                with stage("embed"):
+                    embedding = await self.embedding_guard.call(self.async_embedding_client.embed, text)
+            except Exception as e:
+                return self._stale_embedding(model_name, text, e)
+            await self.embedding_cache.aset_many(model_name, [(text, embedding)])
+        return embedding
+
+    def _stale_embedding(self, model_name, text, error):
+        """
+        Fall back to an expired cached vector after a failed embedding call.
+
+        :param model_name: Name of the embedding model.
+        :param text: Text that could not be embedded.
+        :param error: Exception raised by the embedding call, re-raised when nothing is cached.
+        :return: Embedding vector.
+        """
+        embedding = self.embedding_cache.get_stale(model_name, text)
+        if embedding is None:
+            raise error
+        logging.warning(f"Embedding call failed, serving an expired cached vector: {str(error)}")
+        DEGRADED_RESPONSES.labels(kind="stale_embedding").inc()
+        return embedding
     
-    def query(self, query_text, collection_name, threshold, top_k, input_video_id=None, user_handle=None):
+    def query(self, query_text, collection_name, threshold, top_k, input_video_id=None, user_handle=None, search_params=None):
         """
         Perform a similarity search on the specified collection.
 
@@ -40,6 +136,7 @@ class MegaSimilarityAgent:
         :param collection_name: The name of the collection to search in.
         :param threshold: Minimum similarity score for results.
         :param top_k: Number of top results to retrieve.
+        :param search_params: Optional per-request SearchTuning overrides, see ``_search_params``.
         :return: List of matching payloads.
         """
         try:
@@ -47,36 +144,474 @@ class MegaSimilarityAgent:
             embedding = self.generate_embedding(query_text)
             
             # Perform search in Qdrant
-            search_results = self.qdrant_client.search(
+            with stage("search"):
+                if self.sparse_encoder is not None:
+                    responses = self.qdrant_guard.call_sync(
+                        self.qdrant_client.query_batch_points,
+                        collection_name=collection_name,
+                        requests=self._hybrid_requests(self.query_vector(embedding, query_text), collection_name,
+                                                       threshold, top_k, input_video_id, user_handle, search_params),
+                    )
+                    matches = self._fuse(collection_name, top_k, *[response.points for response in responses])
+                else:
+                    search_results = self.qdrant_guard.call_sync(
+                        self.qdrant_client.search,
+                        query_vector=embedding,
+                        **self._search_kwargs(collection_name, threshold, top_k, input_video_id, user_handle, search_params)
+                    )
+                    matches = self._matches(collection_name, search_results)
+            
+            return self._hydrate(collection_name, matches)
+        
+        
+        except Exception as e:
+            logging.error(f"Error during similarity search: {str(e)}")
+            raise
+
+    async def aquery(self, query_text, collection_name, threshold, top_k, input_video_id=None, user_handle=None,
+                     search_params=None):
+        """
+        Asynchronous variant of ``query`` using the async embedding and Qdrant clients.
+
+        :param query_text: The query text for which to find similar vectors.
+        :param collection_name: The name of the collection to search in.
+        :param threshold: Minimum similarity score for results.
+        :param top_k: Number of top results to retrieve.
+        :param search_params: Optional per-request SearchTuning overrides.
+        :return: List of matching payloads.
+        """
+        try:
+            # Generate query embedding
+            embedding = await self.agenerate_embedding(query_text)
+
+            return await self._asearch(self.query_vector(embedding, query_text), collection_name, threshold, top_k,
+                                       input_video_id, user_handle, search_params)
+
+        except Exception as e:
+            logging.error(f"Error during similarity search: {str(e)}")
+            raise
+
+    async def aquery_by_video_id(self, video_id, collection_name, threshold, top_k, search_params=None):
+        """
+        Search with the vector already stored for a video instead of re-embedding its summary.
+
+        :param video_id: Video whose stored point is used as the query.
+        :param collection_name: The name of the collection to search in.
+        :param threshold: Minimum similarity score for results.
+        :param top_k: Number of top results to retrieve.
+        :param search_params: Optional per-request SearchTuning overrides.
+        :return: List of matching payloads, or None when the video has no stored point.
+        """
+        try:
+            embedding = await self.astored_vector(collection_name, video_id)
+            if embedding is None:
+                logging.info(f"No stored vector for video_id: {video_id}, falling back to embedding")
+                return None
+
+            return await self._asearch(embedding, collection_name, threshold, top_k, input_video_id=video_id,
+                                       search_params=search_params)
+
+        except Exception as e:
+            logging.error(f"Error during similarity search: {str(e)}")
+            raise
+
+    async def astored_vector(self, collection_name, video_id):
+        """
+        Fetch the stored vector of a video's point.
+
+        :param collection_name: The name of the collection holding the point.
+        :param video_id: Video to look up.
+        :return: Embedding vector, with its sparse vector in hybrid mode (see ``_stored_vector``), or None
+            when no point exists for the video.
+        """
+        with stage("vector_lookup"):
+            points, _ = await self.qdrant_guard.call(
+                self.async_qdrant_client.scroll,
                 collection_name=collection_name,
-                query_vector=embedding,
-                limit=top_k,
-                with_payload=True
+                scroll_filter=Filter(
+                    must=[
+                        FieldCondition(
+                            key="video_id",
+                            match=MatchValue(value=str(video_id))
+                        )
+                    ]
+                ),
+                limit=1,
+                with_payload=False,
+                with_vectors=self._vector_selector(),
             )
-            
+        return self._stored_vector(points[0].vector) if points else None
+
+    async def agenerate_embeddings(self, texts):
+        """
+        Embed many query texts, serving cached ones and embedding the rest in one batch.
+
+        :param texts: List of texts to embed.
+        :return: List of embedding vectors, in the same order as ``texts``.
+        """
+        model_name = self.async_embedding_client.model_name
+        embeddings = await self.embedding_cache.aget_many(model_name, texts)
+        missing = [index for index, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            try:
+                with stage("embed"):
+                    computed = await self.embedding_guard.call_batch(
+                        len(missing), self.async_embedding_client.embed_batch, [texts[index] for index in missing]
+                    )
+            except Exception as e:
+                for index in missing:
+                    embeddings[index] = self._stale_embedding(model_name, texts[index], e)
+                return embeddings
+            for index, embedding in zip(missing, computed):
+                embeddings[index] = embedding
+            await self.embedding_cache.aset_many(model_name, [(texts[index], embeddings[index]) for index in missing])
+        return embeddings
+
+    async def astored_vectors(self, collection_name, video_ids):
+        """
+        Fetch the stored vectors of many videos with a single scroll.
+
+        :param collection_name: The name of the collection holding the points.
+        :param video_ids: Videos to look up.
+        :return: Dictionary of video_id (as string) to embedding vector (see ``_stored_vector``), for the videos
+            that have a point.
+        """
+        video_ids = list({str(video_id) for video_id in video_ids})
+        if not video_ids:
+            return {}
+        with stage("vector_lookup"):
+            points, _ = await self.qdrant_guard.call_batch(
+                len(video_ids), self.async_qdrant_client.scroll,
+                collection_name=collection_name,
+                scroll_filter=Filter(
+                    must=[
+                        FieldCondition(
+                            key="video_id",
+                            match=MatchAny(any=video_ids)
+                        )
+                    ]
+                ),
+                limit=len(video_ids),
+                with_payload=["video_id"],
+                with_vectors=self._vector_selector(),
+            )
+        return {str(point.payload["video_id"]): self._stored_vector(point.vector) for point in points}
+
+    async def asearch_batch(self, collection_name, searches, threshold, top_k, search_params=None):
+        """
+        Run many similarity searches on one collection in a single ``search_batch`` call, or a single
+        ``query_batch_points`` call holding the dense and sparse side of each search in hybrid mode.
+
+        :param collection_name: The name of the collection to search in.
+        :param searches: List of (query vector, input_video_id, user_handle) tuples, see ``query_vector``.
+        :param threshold: Minimum similarity score for results.
+        :param top_k: Number of top results to retrieve.
+        :param search_params: Optional list of per-search SearchTuning overrides, aligned with ``searches``.
+        :return: List of match lists, in the same order as ``searches``.
+        """
+        if not searches:
+            return []
+        if self.sparse_encoder is not None:
+            return await self._ahybrid_batch(collection_name, searches, threshold, top_k, search_params)
+        requests = []
+        for (embedding, input_video_id, user_handle), overrides in zip(searches, search_params or [None] * len(searches)):
+            kwargs = self._search_kwargs(collection_name, threshold, top_k, input_video_id, user_handle, overrides)
+            requests.append(SearchRequest(
+                vector=embedding,
+                filter=kwargs["query_filter"],
+                limit=kwargs["limit"],
+                score_threshold=kwargs["score_threshold"],
+                with_payload=kwargs["with_payload"],
+                params=kwargs["search_params"],
+            ))
+        with stage("search"):
+            batch_results = await self.qdrant_guard.call_batch(
+                len(requests), self.async_qdrant_client.search_batch, collection_name=collection_name, requests=requests
+            )
+        return await self._ahydrate_many(collection_name, [self._matches(collection_name, search_results) for search_results in batch_results])
+
+    async def _ahybrid_batch(self, collection_name, searches, threshold, top_k, search_params=None):
+        """
+        Hybrid variant of ``asearch_batch``, every request of every search going in one call.
+
+        :return: List of match lists, in the same order as ``searches``.
+        """
+        requests, spans = [], []
+        for (vector, input_video_id, user_handle), overrides in zip(searches, search_params or [None] * len(searches)):
+            search_requests = self._hybrid_requests(self.query_vector(vector), collection_name, threshold, top_k,
+                                                    input_video_id, user_handle, overrides)
+            spans.append((len(requests), len(search_requests)))
+            requests.extend(search_requests)
+        with stage("search"):
+            responses = await self.qdrant_guard.call_batch(
+                len(requests), self.async_qdrant_client.query_batch_points, collection_name=collection_name,
+                requests=requests
+            )
+        match_lists = [
+            self._fuse(collection_name, top_k, *[response.points for response in responses[start:start + count]])
+            for start, count in spans
+        ]
+        return await self._ahydrate_many(collection_name, match_lists)
+
+    async def _asearch(self, vector, collection_name, threshold, top_k, input_video_id=None, user_handle=None,
+                       search_params=None):
+        """
+        Search the collection with a query vector.
+
+        :param vector: Query vector, see ``query_vector``.
+        :param collection_name: The name of the collection to search in.
+        :param threshold: Minimum similarity score for results.
+        :param top_k: Number of top results to retrieve.
+        :return: List of matching payloads.
+        """
+        if self.sparse_encoder is not None:
+            results = await self._ahybrid_batch(collection_name, [(vector, input_video_id, user_handle)], threshold,
+                                                top_k, [search_params])
+            return results[0]
+        with stage("search"):
+            search_results = await self.qdrant_guard.call(
+                self.async_qdrant_client.search,
+                query_vector=vector,
+                **self._search_kwargs(collection_name, threshold, top_k, input_video_id, user_handle, search_params)
+            )
+
+        return await self._ahydrate(collection_name, self._matches(collection_name, search_results))
+
+    def _search_kwargs(self, collection_name, threshold, top_k, input_video_id=None, user_handle=None, search_params=None):
+        """
+        Build the search arguments that let Qdrant do the pruning.
+
+        The threshold becomes ``score_threshold`` and the queried video (or, without a video,
+        the queried user) is excluded with a ``must_not`` filter, so ``top_k`` results are
+        returned whenever enough matches exist. Only the payload fields configured for the
+        collection are transferred.
+
+        :param collection_name: The name of the collection to search in.
+        :param threshold: Minimum similarity score for results.
+        :param top_k: Number of top results to retrieve.
+        :param input_video_id: Video to exclude from the results.
+        :param user_handle: User to exclude from the results when no video is given.
+        :param search_params: Optional per-request SearchTuning overrides.
+        :return: Dictionary of keyword arguments for ``search``.
+        """
+        if input_video_id:
+            excluded = FieldCondition(key="video_id", match=MatchValue(value=str(input_video_id)))
+        elif user_handle:
+            excluded = FieldCondition(key="user_handle", match=MatchValue(value=user_handle))
+        else:
+            excluded = None
+
+        return {
+            "collection_name": collection_name,
+            "query_filter": Filter(must_not=[excluded]) if excluded else None,
+            "score_threshold": threshold,
+            "limit": top_k,
+            "with_payload": self._payload_selector(collection_name),
+            "search_params": self._search_params(collection_name, search_params),
+        }
+
+    def query_vector(self, embedding, query_text=None):
+        """
+        Pair a dense query vector with the sparse vector of its text in hybrid mode.
+
+        :param embedding: Dense query vector, or a stored vector from ``astored_vector(s)``, returned as is.
+        :param query_text: Text encoded as the sparse keyword query, if any.
+        :return: The embedding, or a dictionary of the named dense and sparse vectors in hybrid mode.
+        """
+        if self.sparse_encoder is None or isinstance(embedding, dict):
+            return embedding
+        sparse = self.sparse_encoder.encode_query(query_text) if query_text else None
+        return {DENSE_VECTOR: embedding, SPARSE_VECTOR: sparse}
+
+    def _hybrid_requests(self, vector, collection_name, threshold, top_k, input_video_id=None, user_handle=None,
+                         search_params=None):
+        """
+        Build the dense and sparse requests of one hybrid search.
+
+        Both carry the exclusion filter and fetch ``HYBRID_PREFETCH_FACTOR`` times ``top_k``
+        candidates. The threshold applies to the dense side, and ``_fuse`` only keeps candidates
+        found there, so keyword matches below the threshold are dropped too.
+
+        :param vector: Dictionary of the named dense and sparse query vectors, see ``query_vector``.
+        :param collection_name: The name of the collection to search in.
+        :param threshold: Minimum dense similarity score.
+        :param top_k: Number of top results to retrieve.
+        :param input_video_id: Video to exclude from the results.
+        :param user_handle: User to exclude from the results when no video is given.
+        :param search_params: Optional per-request SearchTuning overrides, applied to the dense request.
+        :return: List of QueryRequest, the dense one first and the sparse one when the query has terms.
+        """
+        kwargs = self._search_kwargs(collection_name, threshold, top_k, input_video_id, user_handle, search_params)
+        limit = top_k * self.hybrid_prefetch
+        requests = [QueryRequest(
+            query=[float(value) for value in vector[DENSE_VECTOR]],
+            using=DENSE_VECTOR,
+            filter=kwargs["query_filter"],
+            score_threshold=kwargs["score_threshold"],
+            params=kwargs["search_params"],
+            limit=limit,
+            with_payload=kwargs["with_payload"],
+        )]
+        sparse = vector.get(SPARSE_VECTOR)
+        if sparse is not None and sparse.indices:
+            requests.append(QueryRequest(query=sparse, using=SPARSE_VECTOR, filter=kwargs["query_filter"], limit=limit,
+                                         with_payload=False))
+        return requests
+
+    def _fuse(self, collection_name, top_k, dense_points, sparse_points=()):
+        """
+        Rank the dense candidates with Reciprocal Rank Fusion of their dense and sparse ranks.
+
+        Only dense candidates are kept, as they are the ones that passed the threshold.
+        ``similarity_score`` stays the dense similarity, comparable to ``Threshold`` as in
+        dense-only search, and the fused score is returned as ``hybrid_score``.
+
+        :param collection_name: The name of the collection searched.
+        :param top_k: Number of top results to keep.
+        :param dense_points: Scored points of the dense request.
+        :param sparse_points: Scored points of the sparse request.
+        :return: List of matching payloads with their similarity and hybrid scores.
+        """
+        fused = {}
+        for points in (dense_points, sparse_points):
+            for rank, point in enumerate(points, start=1):
+                fused[point.id] = fused.get(point.id, 0.0) + 1.0 / (RRF_K + rank)
+        kept = sorted(dense_points, key=lambda point: fused[point.id], reverse=True)[:top_k]
+        matches = self._matches(collection_name, kept)
+        for match, point in zip(matches, kept):
+            match['hybrid_score'] = fused[point.id]
+        return matches
+
+    def _vector_selector(self):
+        return [DENSE_VECTOR, SPARSE_VECTOR] if self.sparse_encoder is not None else True
+
+    def _stored_vector(self, vector):
+        """
+        Query vector of a stored point.
+
+        :param vector: Vector returned by Qdrant.
+        :return: The dense vector, or the dictionary of named dense and sparse vectors in hybrid mode.
+        """
+        if self.sparse_encoder is None:
+            return vector
+        return {DENSE_VECTOR: vector.get(DENSE_VECTOR), SPARSE_VECTOR: vector.get(SPARSE_VECTOR)}
+
+    def _search_params(self, collection_name, overrides=None):
+        """
+        Build the HNSW and quantization search parameters of a collection.
+
+        The collection's SearchTuning from the settings is merged with the per-request overrides,
+        so each product can pick its own recall/latency point on the same deployment.
+
+        :param collection_name: The name of the collection to search in.
+        :param overrides: Mapping of SearchTuning fields to override, None values are ignored.
+        :return: SearchParams, or None when everything is left to Qdrant's defaults.
+        """
+        tuning = self.settings.search_tuning(collection_name).merge(overrides)
+        quantization = None
+        if tuning.rescore is not None or tuning.oversampling is not None:
+            quantization = QuantizationSearchParams(rescore=tuning.rescore, oversampling=tuning.oversampling)
+        if tuning.hnsw_ef is None and not tuning.exact and not tuning.indexed_only and quantization is None:
+            return None
+        return SearchParams(
+            hnsw_ef=tuning.hnsw_ef,
+            exact=bool(tuning.exact),
+            quantization=quantization,
+            indexed_only=bool(tuning.indexed_only),
+        )
+
+    def _hydrate(self, collection_name, matches):
+        """
+        Complete compact matches with their MySQL rows, see ``_ahydrate_many``.
+
+        :param collection_name: The name of the collection searched.
+        :param matches: Matches returned by ``_matches``.
+        :return: Hydrated matches.
+        """
+        if self.hydrator is None or not matches:
+            return matches
+        with stage("hydrate"):
+            rows = self.hydrator.hydrate(self._mode(collection_name), [match['id'] for match in matches])
+        return [self._merge_row(collection_name, rows, match) for match in matches]
+
+    async def _ahydrate(self, collection_name, matches):
+        return (await self._ahydrate_many(collection_name, [matches]))[0]
+
+    async def _ahydrate_many(self, collection_name, match_lists):
+        """
+        Complete compact matches with their MySQL rows, in one lookup for every list.
+
+        Only hits that survived the server-side threshold, filter and ``top_k`` are looked up.
+        A hit whose row is gone keeps its compact payload.
+
+        :param collection_name: The name of the collection searched.
+        :param match_lists: Lists of matches returned by ``_matches``.
+        :return: Lists of hydrated matches, in the same order.
+        """
+        ids = [match['id'] for matches in match_lists for match in matches]
+        if self.hydrator is None or not ids:
+            return match_lists
+        with stage("hydrate"):
+            rows = await self.hydrator.ahydrate(self._mode(collection_name), ids)
+        return [[self._merge_row(collection_name, rows, match) for match in matches] for matches in match_lists]
+
+    def _merge_row(self, collection_name, rows, match):
+        """
+        Merge a match with its row, keeping only the configured payload fields.
+
+        :param collection_name: The name of the collection searched.
+        :param rows: Dictionary of id to row returned by the hydrator.
+        :param match: Compact match with its similarity score.
+        :return: Hydrated match.
+        """
+        merged = {**rows.get(match['id'], {}), **match}
+        fields = self._payload_fields(collection_name)
+        if fields:
+            return {k: v for k, v in merged.items() if k in fields or k in ('similarity_score', 'hybrid_score')}
+        return merged
+
+    def _mode(self, collection_name):
+        return 'profile' if collection_name == self.settings.profile_collection_name else 'content'
+
+    def _payload_fields(self, collection_name):
+        if collection_name == self.settings.content_collection_name and self.settings.content_payload_fields:
+            return list(self.settings.content_payload_fields)
+        if collection_name == self.settings.profile_collection_name and self.settings.profile_payload_fields:
+            return list(self.settings.profile_payload_fields)
+        return None
+
+    def _payload_selector(self, collection_name):
+        """
+        Payload fields returned for a collection.
+
+        Compact payloads are always returned whole, the configured fields are applied after hydration.
+
+        :param collection_name: The name of the collection to search in.
+        :return: List of field names, or True for the whole payload.
+        """
+        if self.hydrator is not None:
+            return True
+        return self._payload_fields(collection_name) or True
+
+    def _matches(self, collection_name, search_results):
+        """
+        Extract the payloads of the results returned by Qdrant, already filtered server side.
+
+        The change-detection hashes are dropped unless they are among the configured payload fields.
+
+        :param collection_name: The name of the collection searched.
+        :param search_results: Scored points returned by Qdrant.
+        :return: List of matching payloads with their similarity score.
+        """
+        with stage("post_filter"):
             # Log matches with scores
             for result in search_results:
                 match_id = result.payload.get('id', 'Unknown')
                 score = result.score
                 logging.info(f"Match ID: {match_id}, Score: {score}")
 
-            if input_video_id:
-                 # Filter results based on conditions and extract payloads
-                matches = [
-                    {**result.payload, 'similarity_score':result.score} for result in search_results
-                    if result.score >= threshold and result.payload.get('video_id') != str(input_video_id)
-                ]
-                            
-            else:
-                matches = [
-                    {**result.payload, 'similarity_score':result.score} for result in search_results
-                    if result.score >= threshold and result.payload.get('user_handle') != user_handle
-                ]
-                
-            return matches
-        
-        
-        except Exception as e:
-            logging.error(f"Error during similarity search: {str(e)}")
-            raise
-
+            hidden = set(HASH_FIELDS) - set(self._payload_fields(collection_name) or ())
+            return [
+                {**{k: v for k, v in result.payload.items() if k not in hidden}, 'similarity_score': result.score}
+                for result in search_results
+            ]
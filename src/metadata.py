@@ -1,58 +1,64 @@
-import mysql.connector
-import requests
 from datetime import datetime
-import ast
 import os
 import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import PointStruct,Filter, FieldCondition, MatchValue
-from sentence_transformers import SentenceTransformer
+from qdrant_client.http.models import PointStruct
+from src.db import get_database
+from src.embedding_client import get_embedding_client
+from src.embedding_memo import EmbeddingMemo
+from src.existence_index import ProfileExistenceIndex
+from src.settings import Settings
+from src.hydration import compact_payload
+from src.sparse_encoder import SparseEncoder, DENSE_VECTOR, SPARSE_VECTOR
+from src.pipeline import run_pipeline
+from src.metrics import stage, ROWS_INGESTED
 import logging
 
-#model = SentenceTransformer("nomic-ai/nomic-embed-text-v1", trust_remote_code=True)
-
 
 load_dotenv()
 
 class MetadataAgent:
-    def __init__(self):
+    def __init__(self, embedding_client=None, db=None, settings=None, qdrant_client=None, embedding_memo=None):
         """
         Initialize the MetadataAgent class.
+
+        The agent is meant to be long-lived: the application creates it once at startup and
+        shares it, together with its clients, across requests.
+
+        :param embedding_client: EmbeddingClient to use, defaults to the process-wide client.
+        :param db: Database pool to use, defaults to the process-wide pool.
+        :param settings: Parsed Settings, read from the environment when omitted.
+        :param qdrant_client: QdrantClient to use, created from ``settings`` when omitted.
+        :param embedding_memo: EmbeddingMemo of ingested vectors, opened at ``EMBEDDING_MEMO_PATH`` when set.
         """
-        self.qdrant_client = QdrantClient(url=os.getenv('QDRANT_HOST'), api_key=os.getenv('QDRANT_API_KEY'))
-        self.embedding_url = os.getenv('EMBEDDING_MODEL_URL')
-        self.embedding_model_name = os.getenv('EMBEDDING_MODEL_NAME')
+        self.settings = settings or Settings.from_env()
+        self.qdrant_client = qdrant_client or QdrantClient(**self.settings.qdrant_client_kwargs())
+        self.embedding_client = embedding_client or get_embedding_client()
+        self.db = db or get_database()
+        self.embedding_memo = embedding_memo or (EmbeddingMemo() if os.getenv('EMBEDDING_MEMO_PATH') else None)
+        self.sparse_encoder = SparseEncoder() if self.settings.hybrid_search else None
+        self.compact_payload = self.settings.compact_payload
+        ingest = self.settings.ingest
+        self.skip_unchanged = ingest.skip_unchanged
+        self.upsert_batch_size = ingest.upsert_batch_size
+        self.upsert_parallel = ingest.upsert_parallel
+        self.upsert_wait = ingest.upsert_wait
+        self.upsert_max_retries = ingest.upsert_max_retries
+        self.ingest_batch_size = ingest.ingest_batch_size
+        self.ingest_queue_size = ingest.ingest_queue_size
         
-    def fetch_data(self, query):
+    def fetch_data(self, query, params=None):
         """
         Fetch data from MySQL.
 
-        :param query: SQL query to execute.
+        :param query: SQL query to execute, with ``%s`` placeholders for values.
+        :param params: Sequence of values bound to the placeholders.
         :return: List of rows as dictionaries.
         """
-        # Establish connection with unpacked configuration
-        conn = mysql.connector.connect(
-            host=os.getenv("HOST"),
-            user=os.getenv("USERDB"),
-            password=os.getenv("PASSWORD"),
-            database=os.getenv("DATABASE")
-        )
-        cursor = conn.cursor()
-        cursor.execute(query)
-        columns = [desc[0] for desc in cursor.description]  # Get column names
-        data = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        if not data:
-            logging.info("No records found for the given query.")
-            return None
-        
-        # Convert tuples to dictionaries
-        data_dict = [dict(zip(columns, row)) for row in data]
-        
-        return data_dict
+        return self.db.fetch_all(query, params)
     
     def generate_embedding(self, text):
         """
@@ -61,15 +67,17 @@ class MetadataAgent:
         :param text: Text to embed.
         :return: List representing the embedding vector.
         """
-        # embed_text = [f'search_query: {text}']
-        # embedded_text = model.encode(embed_text)
-        
-        # embedded_text = embedded_text.flatten()
+        return self.embedding_client.embed(text)
 
-        embed_text = requests.get(self.embedding_url, params={"promt": text, "model_name":self.embedding_model_name})
-        embedded_text = ast.literal_eval(embed_text.content.decode("utf-8"))
-        
-        return embedded_text
+    def generate_embeddings(self, texts):
+        """
+        Generate embeddings for many texts using batched calls to the embedding model.
+
+        :param texts: List of texts to embed.
+        :return: List of embedding vectors, in the same order as ``texts``.
+        """
+        with stage("embed"):
+            return self.embedding_client.embed_batch(texts)
     
     def convert_timestamp(self, timestamp):
         """
@@ -90,106 +98,365 @@ class MetadataAgent:
         """
         Upsert data into Qdrant.
 
+        Points are collected for the whole request and flushed in chunks of ``UPSERT_BATCH_SIZE``.
+
         :param data: List of dictionaries containing the data.
+        :param mode: Determines the type of data (content or profile).
+        :return: List of per-chunk results, see ``upsert_points``.
         """
-        
-        for row in data:
-            logging.info(f"Processing video_id: {row['video_id']} for mode: {mode}")  # Log the ID
+        points = self._build_points(data, mode)
+        results = self._upsert_built_points(points, mode)
+        logging.info(f"Upsertion completed for all provided IDs in mode: {mode}")
+        return results
+
+    def ingest(self, data, mode, seen=None, reuse_unchanged=False, refresh_existing=False):
+        """
+        Embed and upsert one batch of rows, retrying failed chunks.
+
+        :param data: List of dictionaries containing the data.
+        :param mode: Determines the type of data (content or profile).
+        :param seen: Optional set of profile keys already handled by earlier batches of the same run.
+        :param reuse_unchanged: Reuse the stored vector of points whose embedded text did not change.
+        :param refresh_existing: Update stored profile points in place instead of skipping their key.
+        :return: List of upserted PointStruct.
+        """
+        points = self._build_points(data, mode, seen, reuse_unchanged, refresh_existing)
+        self._finalize_results(self._upsert_built_points(points, mode), mode)
+        return points
+
+    def _build_points(self, data, mode, seen=None, reuse_unchanged=False, refresh_existing=False):
+        """
+        Drop already stored profile rows, embed the remaining rows and build their points.
+
+        Every payload carries ``text_hash``, the hash of the model name and embedded text, and
+        ``row_hash``, the hash of the whole payload. Rows whose ``row_hash`` matches their stored
+        point are dropped (``UPSERT_SKIP_UNCHANGED``), and texts found in the embedding memo are
+        not sent to the embedding service again. With ``HYBRID_SEARCH`` each point also gets a
+        sparse vector of its embedded text next to the dense one. With ``COMPACT_PAYLOAD`` only the
+        identity, filter and hash fields are stored, the rest is hydrated from MySQL at search time.
 
+        :param data: List of dictionaries containing the data.
+        :param mode: Determines the type of data (content or profile).
+        :param seen: Optional set of profile keys already handled by earlier batches of the same run.
+        :param reuse_unchanged: Reuse the stored vector of points whose ``text_hash`` matches instead of re-embedding.
+        :param refresh_existing: Keep profile rows whose key exists when their own point is stored, so
+            edited rows are updated and ``row_hash`` decides whether they are written.
+        :return: List of PointStruct.
+        """
+        if mode == 'profile':
+            # Skip (video_id, topic_category) pairs that are already stored, without embedding them
+            existence_index = ProfileExistenceIndex(self.qdrant_client, self._collection_name(mode))
+            seen = seen if seen is not None else set()
+            seen |= existence_index.existing_keys(data)
+            stored_ids = set()
+            if refresh_existing:
+                candidates = [row['id'] for row in data if existence_index.key(row) in seen]
+                if candidates:
+                    stored_ids = {point.id for point in self.qdrant_client.retrieve(
+                        collection_name=self._collection_name(mode), ids=candidates, with_payload=False, with_vectors=False
+                    )}
+            new_rows = []
+            for row in data:
+                key = existence_index.key(row)
+                if key in seen and row['id'] not in stored_ids:
+                    logging.info(f"Already exist for Upserted video_id: {row['video_id']} for mode: {mode}") 
+                    continue
+                seen.add(key)
+                new_rows.append(row)
+            data = new_rows
+
+        model_name = getattr(self.embedding_client, "model_name", None)
+        payloads = []
+        for row in data:
             if 'video_posted_timestamp' in row:
                 row['video_posted_timestamp'] = self.convert_timestamp(row['video_posted_timestamp'])
+            # Prepare the payload
+            payload = {k: v for k, v in row.items()}
+            payload['text_hash'] = text_hash(model_name, self._embedding_text(row, mode))
+            payload['row_hash'] = row_hash(payload)
+            payloads.append(payload)
 
-            if mode == 'content':
-            # Generate embedding for the 'video_summary' column
-                embedding = self.generate_embedding(row['video_summary'])
-                collection_name = os.getenv("CONTENT_COLLECTION_NAME")
-                
-            elif mode == 'profile':
-                # Combine theme fields into a single string for embedding
-                themes = " ".join([
-                    row.get("topic_category", ""),
-                    row.get("relates_to", ""),
-                    row.get("purpose", ""),
-                    row.get("execution_method", ""),
-                ])
-                embedding = self.generate_embedding(themes)
-                collection_name = os.getenv("PROFILE_COLLECTION_NAME")
-
-                
-
-            if(mode == 'content' or(mode == 'profile' and self._isVideoCatExist(row)==False)):
-                # Prepare the payload
-                payload = {k: v for k, v in row.items()}
-
-                #Add the point to the list
-                point = PointStruct(
-                        id=row['id'],
-                        vector=embedding,
-                        payload=payload
-                )
+        stored = {}
+        if (reuse_unchanged or self.skip_unchanged) and data:
+            stored = self._stored_points(mode, [row['id'] for row in data], with_vectors=reuse_unchanged)
+        if self.skip_unchanged and stored:
+            # Rows identical to their stored point need neither an embedding nor an upsert
+            kept = [i for i, payload in enumerate(payloads)
+                    if stored.get(payload['id'], ({}, None))[0].get('row_hash') != payload['row_hash']]
+            if len(kept) < len(payloads):
+                logging.info(f"Skipping {len(payloads) - len(kept)} unchanged rows for mode: {mode}")
+            data = [data[i] for i in kept]
+            payloads = [payloads[i] for i in kept]
+
+        embeddings = [None] * len(data)
+        if reuse_unchanged:
+            for i, payload in enumerate(payloads):
+                stored_payload, vector = stored.get(payload['id'], ({}, None))
+                if stored_payload.get('text_hash') == payload['text_hash']:
+                    embeddings[i] = vector
+            logging.info(f"Reusing {sum(e is not None for e in embeddings)} unchanged vectors for mode: {mode}")
+
+        to_embed = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if self.embedding_memo is not None and to_embed:
+            memo = self.embedding_memo.get_many([payloads[i]['text_hash'] for i in to_embed])
+            for i in to_embed:
+                embeddings[i] = memo.get(payloads[i]['text_hash'])
+            to_embed = [i for i in to_embed if embeddings[i] is None]
+            logging.info(f"Embedding memo hits: {len(memo)} for mode: {mode}")
+
+        # Embed every remaining row of the batch in batched calls instead of one call per row
+        if to_embed:
+            new_embeddings = self.generate_embeddings([self._embedding_text(data[i], mode) for i in to_embed])
+            for i, embedding in zip(to_embed, new_embeddings):
+                embeddings[i] = embedding
+        if self.embedding_memo is not None and to_embed:
+            self.embedding_memo.set_many((payloads[i]['text_hash'], embeddings[i]) for i in to_embed)
+
+        points = []
+        for row, embedding, payload in zip(data, embeddings, payloads):
+            logging.info(f"Processing video_id: {row['video_id']} for mode: {mode}")  # Log the ID
+
+            #Add the point to the list
+            if self.sparse_encoder is not None:
+                embedding = self._hybrid_vector(embedding, self._embedding_text(row, mode))
+            if self.compact_payload:
+                payload = compact_payload(payload, mode)
+            points.append(PointStruct(
+                    id=row['id'],
+                    vector=embedding,
+                    payload=payload
+            ))
+        return points
+
+    def _stored_points(self, mode, ids, with_vectors=False):
+        """
+        Fetch the stored hashes, and optionally vectors, of points in one call.
+
+        :param mode: Determines the type of data (content or profile).
+        :param ids: Point ids.
+        :param with_vectors: Also fetch the stored vectors.
+        :return: Dictionary mapping point id to (payload with ``text_hash`` and ``row_hash``, dense vector).
+        """
+        if with_vectors and self.sparse_encoder is not None:
+            # Sparse vectors are cheap to recompute, only the dense one is worth reusing
+            with_vectors = [DENSE_VECTOR]
+        points = self.qdrant_client.retrieve(
+            collection_name=self._collection_name(mode),
+            ids=ids,
+            with_payload=["text_hash", "row_hash"],
+            with_vectors=with_vectors,
+        )
+        return {
+            point.id: (point.payload or {}, point.vector.get(DENSE_VECTOR) if isinstance(point.vector, dict) else point.vector)
+            for point in points
+        }
+
+    def _hybrid_vector(self, embedding, text):
+        """
+        Named vectors of a hybrid point.
+
+        :param embedding: Dense embedding of the text.
+        :param text: Embedded text, also encoded as a sparse vector.
+        :return: Dictionary of named vectors.
+        """
+        return {DENSE_VECTOR: embedding, SPARSE_VECTOR: self.sparse_encoder.encode(text)}
+
+    def _upsert_built_points(self, points, mode):
+        """
+        Upsert built points and remember the profile keys that were written.
+
+        :param points: List of PointStruct.
+        :param mode: Determines the type of data (content or profile).
+        :return: List of per-chunk results, see ``upsert_points``.
+        """
+        collection_name = self._collection_name(mode)
+        results = self.upsert_points(collection_name, points)
+        if mode == 'profile':
+            existence_index = ProfileExistenceIndex(self.qdrant_client, collection_name)
+            existence_index.add(
+                existence_index.key(point.payload)
+                for result in results if result["status"] == "ok"
+                for point in result["points"]
+            )
+        return results
+
+    def upsert_points(self, collection_name, points):
+        """
+        Upsert points into Qdrant in size-bounded chunks.
+
+        Chunks are flushed sequentially, or by ``UPSERT_PARALLEL`` threads when it is greater than one.
+        A failing chunk does not stop the others; its points are kept in the result so that only
+        that chunk has to be retried.
+
+        :param collection_name: Name of the Qdrant collection.
+        :param points: List of PointStruct to upsert.
+        :return: List of dictionaries with ``chunk``, ``ids``, ``status``, ``error`` and ``points`` keys.
+        """
+        chunks = [points[i:i + self.upsert_batch_size] for i in range(0, len(points), self.upsert_batch_size)]
+        if self.upsert_parallel > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=self.upsert_parallel) as executor:
+                return list(executor.map(lambda item: self._flush_chunk(collection_name, *item), enumerate(chunks)))
+        return [self._flush_chunk(collection_name, index, chunk) for index, chunk in enumerate(chunks)]
+
+    def _flush_chunk(self, collection_name, index, points):
+        """
+        Upsert one chunk of points and report the outcome.
 
-                # Upsert points into the Qdrant collection
+        :param collection_name: Name of the Qdrant collection.
+        :param index: Position of the chunk within the request.
+        :param points: List of PointStruct in the chunk.
+        :return: Result dictionary for the chunk.
+        """
+        ids = [point.id for point in points]
+        try:
+            with stage("upsert"):
                 self.qdrant_client.upsert(
                     collection_name=collection_name,
-                    points=[point]
+                    points=points,
+                    wait=self.upsert_wait
                 )
-            
-                logging.info(f"Upserted video_id: {row['video_id']} for mode: {mode}")  # Log the ID that was just upserted
-            else:
-                logging.info(f"Already exist for Upserted video_id: {row['video_id']} for mode: {mode}") 
-        logging.info(f"Upsertion completed for all provided IDs in mode: {mode}")
+            ROWS_INGESTED.labels(collection=collection_name).inc(len(points))
+            logging.info(f"Upserted chunk {index} with {len(points)} points into {collection_name}")
+            return {"chunk": index, "ids": ids, "status": "ok", "error": None, "points": points}
+        except Exception as e:
+            logging.error(f"Failed to upsert chunk {index} into {collection_name}: {str(e)}")
+            return {"chunk": index, "ids": ids, "status": "failed", "error": str(e), "points": points}
 
+    def retry_failed_chunks(self, collection_name, results):
+        """
+        Retry only the chunks that failed, keeping the results of successful ones.
+
+        :param collection_name: Name of the Qdrant collection.
+        :param results: Per-chunk results returned by ``upsert_points``.
+        :return: Updated list of per-chunk results.
+        """
+        retried = []
+        for result in results:
+            if result["status"] == "failed":
+                result = self._flush_chunk(collection_name, result["chunk"], result["points"])
+            retried.append(result)
+        return retried
+
+    def _collection_name(self, mode):
+        """
+        Resolve the Qdrant collection for a mode.
+
+        :param mode: Determines the type of data (content or profile).
+        :return: Collection name.
+        """
+        return self.settings.collection_name(mode)
+
+    def _embedding_text(self, row, mode):
+        """
+        Build the text that is embedded for a row.
+
+        :param row: Row dictionary fetched from MySQL.
+        :param mode: Determines the type of data (content or profile).
+        :return: Text to embed.
+        """
+        if mode == 'content':
+            # Generate embedding for the 'video_summary' column
+            return row['video_summary']
+
+        # Combine theme fields into a single string for embedding
+        return " ".join([
+            row.get("topic_category", ""),
+            row.get("relates_to", ""),
+            row.get("purpose", ""),
+            row.get("execution_method", ""),
+        ])
         
-    def process(self, query, mode):
+    def process(self, query, mode, params=None):
         """
         Complete process: fetch data, generate embeddings, and upsert into Vector Database.
 
         :param query: SQL query to fetch data.
         :param mode: Determines the type of data (content or profile).
+        :param params: Sequence of values bound to the query placeholders.
         """
         logging.info(f"Fetching data from MySQL for mode: {mode}")
-        data = self.fetch_data(query)
+        data = self.fetch_data(query, params)
         if data:
             logging.info(f"Fetched {len(data)} rows for mode: {mode}. Generating embeddings and upserting to Vector Database...")
-            self.upsertion(data, mode)
+            results = self.upsertion(data, mode)
+            self._finalize_results(results, mode)
             logging.info(f"Process completed successfully for mode: {mode}!")
             return True  # Data was processed successfully
         else:
             logging.info("No data fetched.")
             return False  # No data fetched
 
-    def _isVideoCatExist(self,row):
-        video_id=row['video_id']
-        topic_category=row['topic_category']
+    def process_stream(self, query, mode, params=None):
+        """
+        Streaming variant of ``process`` for large backfills.
 
-        logging.info(f"inside _isVideoCatExist _isVideoCatExist check for {row['video_id']}  and {row['topic_category']} ")
-        
-        themes = " ".join([
-            row.get("topic_category", ""),
-                        row.get("relates_to", ""),
-                        row.get("purpose", ""),
-                        row.get("execution_method", ""),
-                    ])
-
-        collection_name = os.getenv("PROFILE_COLLECTION_NAME")
-        query_filter = Filter(
-            must=[
-                FieldCondition(
-                    key="video_id",
-                    match=MatchValue(value=video_id)
-                ),
-                FieldCondition(
-                    key="topic_category",
-                    match=MatchValue(value=topic_category)
-                )
-            ]
-        )
+        Rows are read from an unbuffered cursor in batches of ``INGEST_BATCH_SIZE`` and flow through
+        overlapping fetch, embed and upsert stages with at most ``INGEST_QUEUE_SIZE`` batches
+        buffered between them, so memory stays flat and the DB read overlaps the other work.
 
-        results=self.qdrant_client.search(
-            collection_name=collection_name,
-            query_vector=self.generate_embedding(themes), 
-            query_filter=query_filter,
-            limit=10  
-        )
-        return len(results)>0
-    
\ No newline at end of file
+        :param query: SQL query to fetch data.
+        :param mode: Determines the type of data (content or profile).
+        :param params: Sequence of values bound to the query placeholders.
+        :return: True if any row was fetched, False otherwise.
+        """
+        logging.info(f"Streaming data from MySQL for mode: {mode}")
+        batches = self.db.stream_batches(query, params, self.ingest_batch_size)
+        fetched = []
+        seen = set()
+
+        def embed_stage(rows):
+            fetched.append(len(rows))
+            logging.info(f"Fetched batch of {len(rows)} rows for mode: {mode}")
+            return self._build_points(rows, mode, seen)
+
+        def upsert_stage(points):
+            # Only failed chunks are kept, with their points for the retry, so memory stays flat
+            return [result for result in self._upsert_built_points(points, mode) if result["status"] != "ok"]
+
+        outputs = run_pipeline(batches, [embed_stage, upsert_stage], queue_size=self.ingest_queue_size)
+        if not fetched:
+            logging.info("No data fetched.")
+            return False  # No data fetched
+
+        self._finalize_results([result for results in outputs for result in results], mode)
+        logging.info(f"Streamed {sum(fetched)} rows for mode: {mode}. Process completed successfully!")
+        return True  # Data was processed successfully
+
+    def _finalize_results(self, results, mode):
+        """
+        Retry failed chunks and raise if some points still could not be written.
+
+        :param results: Per-chunk results, see ``upsert_points``.
+        :param mode: Determines the type of data (content or profile).
+        """
+        collection_name = self._collection_name(mode)
+        for _ in range(self.upsert_max_retries):
+            if all(result["status"] == "ok" for result in results):
+                break
+            results = self.retry_failed_chunks(collection_name, results)
+
+        failed_ids = [point_id for result in results if result["status"] == "failed" for point_id in result["ids"]]
+        if failed_ids:
+            raise RuntimeError(f"Upsert failed for ids {failed_ids} in mode: {mode}")
+
+
+def text_hash(model_name, text):
+    """
+    Hash the text embedded for a row together with the model embedding it.
+
+    :param model_name: Name of the embedding model.
+    :param text: Embedded text.
+    :return: Hex digest.
+    """
+    return hashlib.sha256(f"{model_name}\n{text}".encode("utf-8")).hexdigest()
+
+
+def row_hash(payload):
+    """
+    Hash a whole point payload, to detect rows that did not change since their last upsert.
+
+    :param payload: Point payload, including its ``text_hash``.
+    :return: Hex digest.
+    """
+    body = json.dumps({k: v for k, v in payload.items() if k != 'row_hash'}, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
@@ -0,0 +1,69 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+try:
+    from opentelemetry import trace
+    _tracer = trace.get_tracer("limpopo")
+except ImportError:  # Optional dependency, spans are only emitted when OpenTelemetry is installed
+    _tracer = None
+
+# Sub-millisecond cache and filter work up to multi-second ingestion batches
+_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+STAGE_SECONDS = Histogram(
+    "limpopo_stage_seconds", "Time spent per processing stage", ["stage"], buckets=_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "limpopo_request_seconds", "HTTP request latency", ["method", "path", "status"], buckets=_BUCKETS
+)
+ROWS_INGESTED = Counter("limpopo_rows_ingested_total", "Points written to Qdrant", ["collection"])
+EMBEDDING_CALLS = Counter("limpopo_embedding_calls_total", "Calls to the embedding backend", ["kind"])
+EMBEDDED_TEXTS = Counter("limpopo_embedded_texts_total", "Texts sent to the embedding backend")
+EMBEDDING_CACHE = Counter("limpopo_embedding_cache_total", "Query embedding cache lookups", ["result"])
+DEPENDENCY_REJECTIONS = Counter(
+    "limpopo_dependency_rejections_total", "Calls rejected without reaching a dependency", ["dependency", "reason"]
+)
+DEGRADED_RESPONSES = Counter("limpopo_degraded_responses_total", "Responses served degraded", ["kind"])
+
+
+@contextmanager
+def stage(name):
+    """
+    Time a processing stage into ``limpopo_stage_seconds``, and trace it as a span when
+    OpenTelemetry is installed.
+
+    Works around both sync and async code, e.g. ``with stage("db"): await ...``.
+
+    :param name: Stage label: db, embed, vector_lookup, search, post_filter, hydrate or upsert.
+    """
+    start = time.perf_counter()
+    try:
+        if _tracer is not None:
+            with _tracer.start_as_current_span(f"limpopo.{name}"):
+                yield
+        else:
+            yield
+    finally:
+        STAGE_SECONDS.labels(stage=name).observe(time.perf_counter() - start)
+
+
+def count_embedding_call(kind, texts=1):
+    """
+    Count one call to the embedding backend.
+
+    :param kind: ``single``, ``batch`` or ``local``.
+    :param texts: Number of texts embedded by the call.
+    """
+    EMBEDDING_CALLS.labels(kind=kind).inc()
+    EMBEDDED_TEXTS.inc(texts)
+
+
+def latest():
+    """
+    Render every metric in the Prometheus text format.
+
+    :return: Tuple of (body, content type).
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
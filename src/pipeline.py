@@ -0,0 +1,92 @@
+import queue
+import logging
+import threading
+
+_DONE = object()
+
+
+def run_pipeline(source, stages, queue_size=2):
+    """
+    Run a source iterator and a chain of stages concurrently, connected by bounded queues.
+
+    The source and every stage run on their own thread, so reading, transforming and writing
+    overlap while at most ``queue_size`` items wait between two stages. The first error in any
+    thread stops the whole pipeline and is re-raised to the caller.
+
+    :param source: Iterable producing the input items, e.g. a generator of row batches.
+    :param stages: List of callables, each receiving the output of the previous one.
+    :param queue_size: Maximum number of items buffered between two stages.
+    :return: List of outputs of the last stage, in input order.
+    """
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+    stop = threading.Event()
+    errors = []
+    outputs = []
+
+    def put(target, item):
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(inbox):
+        while not stop.is_set():
+            try:
+                return inbox.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def fail(error):
+        logging.error(f"Pipeline stopped: {str(error)}")
+        errors.append(error)
+        stop.set()
+
+    def produce():
+        try:
+            for item in source:
+                if not put(queues[0], item):
+                    break
+        except BaseException as e:
+            fail(e)
+        finally:
+            # Release resources held by a suspended generator, e.g. a pooled DB connection
+            if hasattr(source, "close"):
+                source.close()
+            put(queues[0], _DONE)
+
+    def work(index, stage):
+        inbox = queues[index]
+        outbox = queues[index + 1] if index + 1 < len(stages) else None
+        try:
+            while True:
+                item = get(inbox)
+                if item is _DONE:
+                    break
+                result = stage(item)
+                if outbox is None:
+                    outputs.append(result)
+                elif not put(outbox, result):
+                    break
+        except BaseException as e:
+            fail(e)
+        finally:
+            if outbox is not None:
+                put(outbox, _DONE)
+
+    threads = [threading.Thread(target=produce, name="pipeline-source", daemon=True)]
+    threads += [
+        threading.Thread(target=work, args=(index, stage), name=f"pipeline-stage-{index}", daemon=True)
+        for index, stage in enumerate(stages)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    return outputs
@@ -0,0 +1,43 @@
+def content_rows_query(settings, condition, suffix="", columns=""):
+    """
+    Build the query selecting content rows to ingest.
+
+    :param settings: Parsed Settings holding the database and table names.
+    :param condition: SQL condition of the WHERE clause, with ``%s`` placeholders.
+    :param suffix: Optional ORDER BY / LIMIT clauses.
+    :param columns: Optional extra select expressions, prefixed with a comma.
+    :return: SQL query.
+    """
+    return f"""
+            SELECT id, video_id,video_summary, video_posted_timestamp, video_source, sub_category, risk_status,video_screenshot_url as picture {columns}
+            FROM {settings.database}.{settings.content_table}
+            WHERE {condition}
+            {suffix}
+        """
+
+
+def profile_rows_query(settings, condition, suffix="", columns=""):
+    """
+    Build the query selecting profile (topic) rows to ingest, joined with their bias and category.
+
+    :param settings: Parsed Settings holding the database and table names.
+    :param condition: SQL condition of the WHERE clause on the topic table ``a``, with ``%s`` placeholders.
+    :param suffix: Optional ORDER BY / LIMIT clauses.
+    :param columns: Optional extra select expressions, prefixed with a comma.
+    :return: SQL query.
+    """
+    return f"""
+            SELECT a.id, user_handle,a.video_id,
+					IFNULL(c.category_name, '') AS topic_category,
+                   IFNULL(a.relates_to, '') AS relates_to,
+                   IFNULL(a.purpose, '') AS purpose,
+                   IFNULL(a.execution_method, '') AS execution_method ,
+                   b.creator_photo_link as picture {columns}
+            FROM {settings.database}.{settings.topic_table} as a
+            join {settings.database_mkt}.{settings.bias_table} as b
+            join {settings.database_mkt}.{settings.category_table} as c
+            on a.video_id=b.video_id
+            and a.category_id=c.id
+            WHERE {condition}
+            {suffix}
+            """
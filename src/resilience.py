@@ -0,0 +1,322 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+
+import grpc
+import httpx
+import requests
+from dotenv import load_dotenv
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+
+from src.metrics import DEPENDENCY_REJECTIONS
+
+load_dotenv()
+
+# gRPC statuses of an unreachable or overloaded server, the gRPC side of a 5xx (QDRANT_PREFER_GRPC)
+GRPC_UNAVAILABLE_CODES = {
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+    grpc.StatusCode.INTERNAL,
+}
+
+
+def is_dependency_error(error):
+    """
+    Tell whether an exception means the dependency is unreachable or failing, as opposed to a bad request.
+
+    Covers the httpx (async embedding, Qdrant REST), requests (sync embedding) and gRPC (Qdrant)
+    clients.
+
+    :param error: Exception raised by a dependency call.
+    :return: True for connection errors, timeouts and 5xx responses.
+    """
+    if isinstance(error, (httpx.TransportError, ResponseHandlingException, ConnectionError, TimeoutError)):
+        return True
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, requests.exceptions.RetryError)):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code >= 500
+    if isinstance(error, UnexpectedResponse):
+        return error.status_code >= 500
+    if isinstance(error, grpc.RpcError) and callable(getattr(error, "code", None)):
+        return error.code() in GRPC_UNAVAILABLE_CODES
+    return False
+
+
+class DependencyUnavailable(Exception):
+    """
+    A dependency call was not attempted, or did not finish in time.
+    """
+    def __init__(self, dependency, reason, retry_after=None):
+        super().__init__(f"{dependency} unavailable: {reason}")
+        self.dependency = dependency
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        """
+        Stop calling a failing dependency for a while instead of piling up requests on it.
+
+        After ``failure_threshold`` consecutive failures the circuit opens and calls are rejected
+        for ``reset_timeout`` seconds. Then one trial call is let through: its success closes the
+        circuit, its failure opens it again.
+
+        :param name: Dependency name, also the prefix of its environment variables.
+        :param failure_threshold: Consecutive failures opening the circuit (``<NAME>_BREAKER_FAILURES``).
+        :param reset_timeout: Seconds the circuit stays open (``<NAME>_BREAKER_RESET``).
+        """
+        self.name = name
+        self.failure_threshold = int(failure_threshold or os.getenv(f'{name}_BREAKER_FAILURES', 5))
+        self.reset_timeout = float(reset_timeout or os.getenv(f'{name}_BREAKER_RESET', 30))
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half_open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self):
+        """
+        Check whether a call may go through, reserving the trial call of a half-open circuit.
+
+        :return: True if the call may be attempted.
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def retry_after(self):
+        with self._lock:
+            if self.opened_at is None:
+                return 0
+            return max(self.reset_timeout - (time.monotonic() - self.opened_at), 0)
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logging.info(f"Circuit of {self.name} closed")
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def release_trial(self):
+        """
+        Give back the trial call of a half-open circuit when it ended without an outcome, e.g. cancelled.
+        """
+        with self._lock:
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self._trial:
+                    logging.warning(f"Circuit of {self.name} opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+                self._trial = False
+
+
+class DependencyGuard:
+    def __init__(self, name, timeout=None, max_concurrency=None, queue_timeout=None, breaker=None,
+                 batch_item_timeout=None):
+        """
+        Timeout, bulkhead and circuit breaker around the calls to one dependency.
+
+        A slow dependency can then only hold ``max_concurrency`` calls for at most ``timeout``
+        seconds each, and further callers fail fast with DependencyUnavailable instead of queueing.
+        Connection errors and 5xx responses of the dependency are raised as DependencyUnavailable
+        too, other errors are re-raised unchanged and do not count against the circuit.
+
+        :param name: Dependency name, also the prefix of its environment variables.
+        :param timeout: Deadline of a call in seconds, retries included (``<NAME>_CALL_TIMEOUT``).
+        :param batch_item_timeout: Seconds added to the deadline per item of a ``call_batch`` (``<NAME>_BATCH_ITEM_TIMEOUT``).
+        :param max_concurrency: Calls in flight at once (``<NAME>_BULKHEAD_SIZE``).
+        :param queue_timeout: Seconds to wait for a free slot (``<NAME>_BULKHEAD_WAIT``).
+        :param breaker: CircuitBreaker, one is created for ``name`` when omitted.
+        """
+        self.name = name
+        self.timeout = float(timeout or os.getenv(f'{name}_CALL_TIMEOUT', 5))
+        self.max_concurrency = int(max_concurrency or os.getenv(f'{name}_BULKHEAD_SIZE', 32))
+        self.queue_timeout = float(queue_timeout if queue_timeout is not None else os.getenv(f'{name}_BULKHEAD_WAIT', 0.05))
+        self.batch_item_timeout = float(
+            batch_item_timeout if batch_item_timeout is not None else os.getenv(f'{name}_BATCH_ITEM_TIMEOUT', 0.05)
+        )
+        self.breaker = breaker or CircuitBreaker(name)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._async_slots = None
+
+    async def call(self, fn, *args, **kwargs):
+        """
+        Await ``fn(*args, **kwargs)`` under the guard.
+
+        :raise DependencyUnavailable: When the circuit is open, the bulkhead is full, or the call timed out or failed.
+        :return: Result of the call.
+        """
+        return await self._call(self.timeout, fn, *args, **kwargs)
+
+    async def call_batch(self, size, fn, *args, **kwargs):
+        """
+        Await a call handling ``size`` items, with a deadline growing with the batch so large
+        batches are not cut off, and do not open the circuit of single calls, at ``timeout``.
+
+        :param size: Number of items in the batch.
+        :raise DependencyUnavailable: As ``call``.
+        :return: Result of the call.
+        """
+        return await self._call(self.timeout + size * self.batch_item_timeout, fn, *args, **kwargs)
+
+    async def _call(self, deadline, fn, *args, **kwargs):
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_concurrency)
+        if self._async_slots.locked():
+            try:
+                await asyncio.wait_for(self._async_slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise self._reject("bulkhead_full")
+        else:
+            # A free slot is taken without suspending, outside wait_for which could swallow a cancellation
+            await self._async_slots.acquire()
+        if not self.breaker.allow():
+            self._async_slots.release()
+            raise self._reject("circuit_open")
+        try:
+            result = await asyncio.wait_for(fn(*args, **kwargs), deadline)
+        except asyncio.TimeoutError:
+            self.breaker.record_failure()
+            raise self._reject("timeout")
+        except Exception as e:
+            raise self._failed(e)
+        except BaseException:
+            # A cancelled call says nothing about the dependency, but must not keep the trial reserved
+            self.breaker.release_trial()
+            raise
+        finally:
+            self._async_slots.release()
+        self.breaker.record_success()
+        return result
+
+    def call_sync(self, fn, *args, **kwargs):
+        """
+        Blocking variant of ``call``, the deadline is left to the client's own timeout.
+
+        :raise DependencyUnavailable: When the circuit is open, the bulkhead is full or the call failed.
+        :return: Result of the call.
+        """
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise self._reject("bulkhead_full")
+        if not self.breaker.allow():
+            self._slots.release()
+            raise self._reject("circuit_open")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            raise self._failed(e)
+        except BaseException:
+            self.breaker.release_trial()
+            raise
+        finally:
+            self._slots.release()
+        self.breaker.record_success()
+        return result
+
+    def _failed(self, error):
+        """
+        Record a failed call and pick the exception to raise for it.
+
+        :param error: Exception raised by the call.
+        :return: DependencyUnavailable chained to ``error`` for dependency errors, else ``error`` itself.
+        """
+        if not is_dependency_error(error):
+            # A bad request says nothing about the dependency's health
+            self.breaker.release_trial()
+            return error
+        self.breaker.record_failure()
+        unavailable = self._reject("error")
+        unavailable.__cause__ = error
+        return unavailable
+
+    def _reject(self, reason):
+        DEPENDENCY_REJECTIONS.labels(dependency=self.name.lower(), reason=reason).inc()
+        logging.warning(f"{self.name} call rejected: {reason}")
+        return DependencyUnavailable(self.name.lower(), reason, retry_after=self.breaker.retry_after())
+
+
+class StaleResultCache:
+    def __init__(self, maxsize=None, ttl=None):
+        """
+        Last good response of each query, served when a dependency is unavailable.
+
+        :param maxsize: Maximum number of kept responses (``STALE_RESULT_CACHE_SIZE``, 0 disables it).
+        :param ttl: Seconds a response may still be served (``STALE_RESULT_TTL``).
+        """
+        self.maxsize = int(maxsize if maxsize is not None else os.getenv('STALE_RESULT_CACHE_SIZE', 10000))
+        self.ttl = float(ttl or os.getenv('STALE_RESULT_TTL', 600))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(*parts):
+        return json.dumps(parts, sort_keys=True, default=str)
+
+    def get(self, key):
+        """
+        Return the last good response of a query.
+
+        :param key: Query key, see ``key``.
+        :return: The kept response, or None when missing or too old.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] > self.ttl:
+                return None
+            return entry[0]
+
+    def set(self, key, value):
+        """
+        Keep the response of a query, evicting the least recently stored ones.
+
+        :param key: Query key, see ``key``.
+        :param value: JSON-serializable response.
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+_stale_result_cache = None
+_stale_result_cache_lock = threading.Lock()
+
+
+def get_stale_result_cache():
+    """
+    Return the process-wide StaleResultCache, creating it on first use.
+
+    :return: Shared StaleResultCache instance.
+    """
+    global _stale_result_cache
+    with _stale_result_cache_lock:
+        if _stale_result_cache is None:
+            _stale_result_cache = StaleResultCache()
+    return _stale_result_cache
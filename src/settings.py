@@ -0,0 +1,216 @@
+import os
+from dataclasses import dataclass, field, replace
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+
+
+@dataclass(frozen=True)
+class SearchTuning:
+    """
+    Search-time trade-offs between recall and latency, unset fields keep Qdrant's defaults.
+    """
+    hnsw_ef: Optional[int] = None
+    exact: Optional[bool] = None
+    rescore: Optional[bool] = None
+    oversampling: Optional[float] = None
+    indexed_only: Optional[bool] = None
+
+    @classmethod
+    def from_env(cls, prefix):
+        """
+        Read ``<prefix>SEARCH_*`` variables, each falling back to the unprefixed ``SEARCH_*`` one.
+
+        :param prefix: ``CONTENT_`` or ``PROFILE_``.
+        :return: SearchTuning instance.
+        """
+        def env(name):
+            return os.getenv(f"{prefix}SEARCH_{name}") or os.getenv(f"SEARCH_{name}")
+
+        return cls(
+            hnsw_ef=_optional(env('HNSW_EF'), int),
+            exact=_optional(env('EXACT'), _bool),
+            rescore=_optional(env('RESCORE'), _bool),
+            oversampling=_optional(env('OVERSAMPLING'), float),
+            indexed_only=_optional(env('INDEXED_ONLY'), _bool),
+        )
+
+    def merge(self, overrides=None):
+        """
+        Apply per-request overrides.
+
+        :param overrides: Mapping of field name to value, None values are ignored.
+        :return: New SearchTuning.
+        """
+        overrides = {k: v for k, v in (overrides or {}).items() if v is not None}
+        return replace(self, **overrides) if overrides else self
+
+
+@dataclass(frozen=True)
+class IngestTuning:
+    """
+    Batching, parallelism and change detection of ingestion.
+    """
+    upsert_batch_size: int = 64
+    upsert_parallel: int = 1
+    upsert_wait: bool = True
+    upsert_max_retries: int = 2
+    skip_unchanged: bool = True
+    ingest_batch_size: int = 500
+    ingest_queue_size: int = 2
+    save_parallel_modes: bool = True
+
+    @classmethod
+    def from_env(cls):
+        """
+        Read the ``UPSERT_*``, ``INGEST_*`` and ``SAVE_PARALLEL_MODES`` variables.
+
+        :return: IngestTuning instance.
+        """
+        return cls(
+            upsert_batch_size=int(os.getenv('UPSERT_BATCH_SIZE', 64)),
+            upsert_parallel=int(os.getenv('UPSERT_PARALLEL', 1)),
+            upsert_wait=_bool(os.getenv('UPSERT_WAIT', 'true')),
+            upsert_max_retries=int(os.getenv('UPSERT_MAX_RETRIES', 2)),
+            skip_unchanged=_bool(os.getenv('UPSERT_SKIP_UNCHANGED', 'true')),
+            ingest_batch_size=int(os.getenv('INGEST_BATCH_SIZE', 500)),
+            ingest_queue_size=int(os.getenv('INGEST_QUEUE_SIZE', 2)),
+            save_parallel_modes=_bool(os.getenv('SAVE_PARALLEL_MODES', 'true')),
+        )
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Typed application settings, parsed once from the environment at startup.
+    """
+    qdrant_host: Optional[str]
+    qdrant_api_key: Optional[str]
+    qdrant_prefer_grpc: bool
+    qdrant_grpc_port: int
+    qdrant_timeout: Optional[int]
+    content_collection_name: Optional[str]
+    profile_collection_name: Optional[str]
+    threshold: float
+    top_k: int
+    reuse_stored_vectors: bool
+    content_payload_fields: Optional[Tuple[str, ...]]
+    profile_payload_fields: Optional[Tuple[str, ...]]
+    database: Optional[str]
+    database_mkt: Optional[str]
+    content_table: Optional[str]
+    topic_table: Optional[str]
+    bias_table: Optional[str]
+    category_table: Optional[str]
+    content_search: SearchTuning = field(default_factory=SearchTuning)
+    profile_search: SearchTuning = field(default_factory=SearchTuning)
+    ingest: IngestTuning = field(default_factory=IngestTuning)
+    hybrid_search: bool = False
+    hybrid_prefetch_factor: int = 4
+    compact_payload: bool = False
+    collection_apply_config: bool = False
+    collection_bootstrap: bool = True
+    sync_enabled: bool = False
+    batch_max_queries: int = 256
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build the settings from environment variables, loading ``.env`` first.
+
+        :return: Settings instance.
+        """
+        load_dotenv()
+        timeout = os.getenv('QDRANT_TIMEOUT')
+        return cls(
+            qdrant_host=os.getenv('QDRANT_HOST'),
+            qdrant_api_key=os.getenv('QDRANT_API_KEY'),
+            qdrant_prefer_grpc=os.getenv('QDRANT_PREFER_GRPC', 'false').lower() == 'true',
+            qdrant_grpc_port=int(os.getenv('QDRANT_GRPC_PORT', 6334)),
+            qdrant_timeout=int(timeout) if timeout else None,
+            content_collection_name=os.getenv('CONTENT_COLLECTION_NAME'),
+            profile_collection_name=os.getenv('PROFILE_COLLECTION_NAME'),
+            threshold=float(os.getenv('Threshold', 0.5)),
+            top_k=int(os.getenv('Top_k', 5)),
+            reuse_stored_vectors=os.getenv('REUSE_STORED_VECTORS', 'true').lower() == 'true',
+            content_payload_fields=_csv(os.getenv('CONTENT_PAYLOAD_FIELDS')),
+            profile_payload_fields=_csv(os.getenv('PROFILE_PAYLOAD_FIELDS')),
+            database=os.getenv('DATABASE'),
+            database_mkt=os.getenv('DATABASE_MKT'),
+            content_table=os.getenv('CONTENT_TABLE'),
+            topic_table=os.getenv('TOPIC_TABLE'),
+            bias_table=os.getenv('BIAS_TABLE'),
+            category_table=os.getenv('CATEGORY_TABLE'),
+            content_search=SearchTuning.from_env('CONTENT_'),
+            profile_search=SearchTuning.from_env('PROFILE_'),
+            ingest=IngestTuning.from_env(),
+            hybrid_search=_bool(os.getenv('HYBRID_SEARCH', 'false')),
+            hybrid_prefetch_factor=int(os.getenv('HYBRID_PREFETCH_FACTOR', 4)),
+            compact_payload=_bool(os.getenv('COMPACT_PAYLOAD', 'false')),
+            collection_apply_config=_bool(os.getenv('COLLECTION_APPLY_CONFIG', 'false')),
+            collection_bootstrap=_bool(os.getenv('COLLECTION_BOOTSTRAP', 'true')),
+            sync_enabled=_bool(os.getenv('SYNC_ENABLED', 'false')),
+            batch_max_queries=int(os.getenv('BATCH_MAX_QUERIES', 256)),
+        )
+
+    def qdrant_client_kwargs(self):
+        """
+        Keyword arguments shared by QdrantClient and AsyncQdrantClient.
+
+        :return: Dictionary of client arguments.
+        """
+        return {
+            "url": self.qdrant_host,
+            "api_key": self.qdrant_api_key,
+            "prefer_grpc": self.qdrant_prefer_grpc,
+            "grpc_port": self.qdrant_grpc_port,
+            "timeout": self.qdrant_timeout,
+        }
+
+    def collection_name(self, mode):
+        """
+        Resolve the Qdrant collection for a mode.
+
+        :param mode: Determines the type of data (content or profile).
+        :return: Collection name.
+        """
+        if mode == 'content':
+            return self.content_collection_name
+        return self.profile_collection_name
+
+    def search_tuning(self, collection_name):
+        """
+        Resolve the search tuning of a collection.
+
+        :param collection_name: Name of the Qdrant collection.
+        :return: SearchTuning of the profile collection, or of the content one otherwise.
+        """
+        if collection_name == self.profile_collection_name:
+            return self.profile_search
+        return self.content_search
+
+
+def _optional(value, cast):
+    """
+    Cast an optional environment variable.
+
+    :param value: Raw value, may be None or empty.
+    :param cast: Conversion applied to a set value.
+    :return: Converted value, or None when unset.
+    """
+    return cast(value) if value else None
+
+
+def _bool(value):
+    return value.lower() == 'true'
+
+
+def _csv(value):
+    """
+    Parse a comma-separated environment variable.
+
+    :param value: Raw value, may be None or empty.
+    :return: Tuple of stripped items, or None when nothing is configured.
+    """
+    items = tuple(item.strip() for item in (value or "").split(",") if item.strip())
+    return items or None
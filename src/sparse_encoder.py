@@ -0,0 +1,79 @@
+import os
+import re
+import zlib
+from collections import Counter
+
+from dotenv import load_dotenv
+from qdrant_client.http.models import SparseVector
+
+load_dotenv()
+
+# Named vectors of hybrid collections
+DENSE_VECTOR = "dense"
+SPARSE_VECTOR = "sparse"
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+class SparseEncoder:
+    def __init__(self, k1=None, b=None, avg_len=None):
+        """
+        BM25-style sparse vectors for keyword matching.
+
+        Documents get the BM25 term-frequency part of the score, queries a weight of one per term.
+        The IDF part is left to Qdrant (``Modifier.IDF`` on the sparse vector), which keeps it up
+        to date as the collection grows without re-encoding stored points.
+
+        :param k1: Term frequency saturation (``SPARSE_BM25_K1``).
+        :param b: Document length normalization (``SPARSE_BM25_B``).
+        :param avg_len: Expected document length in tokens (``SPARSE_AVG_LEN``).
+        """
+        self.k1 = float(k1 if k1 is not None else os.getenv('SPARSE_BM25_K1', 1.2))
+        self.b = float(b if b is not None else os.getenv('SPARSE_BM25_B', 0.75))
+        self.avg_len = float(avg_len or os.getenv('SPARSE_AVG_LEN', 100))
+
+    @staticmethod
+    def tokens(text):
+        """
+        Split a text into lowercase word tokens.
+
+        :param text: Text to tokenize.
+        :return: List of tokens.
+        """
+        return _TOKEN.findall(str(text or "").lower())
+
+    @staticmethod
+    def index(token):
+        """
+        Stable sparse dimension of a token, so no vocabulary has to be stored or shared.
+
+        :param token: Token to hash.
+        :return: Unsigned 32-bit index.
+        """
+        return zlib.crc32(token.encode("utf-8"))
+
+    def encode(self, text):
+        """
+        Encode a document.
+
+        :param text: Text that is stored.
+        :return: SparseVector of BM25 term-frequency weights.
+        """
+        tokens = self.tokens(text)
+        counts = Counter(self.index(token) for token in tokens)
+        norm = self.k1 * (1 - self.b + self.b * len(tokens) / self.avg_len)
+        indices = sorted(counts)
+        return SparseVector(
+            indices=indices,
+            values=[counts[i] * (self.k1 + 1) / (counts[i] + norm) for i in indices],
+        )
+
+    def encode_query(self, text):
+        """
+        Encode a query.
+
+        :param text: Query text.
+        :return: SparseVector with a weight of one per distinct term.
+        """
+        indices = sorted({self.index(token) for token in self.tokens(text)})
+        return SparseVector(indices=indices, values=[1.0] * len(indices))
@@ -0,0 +1,229 @@
+import os
+import logging
+import threading
+
+from dotenv import load_dotenv
+from qdrant_client.http.models import PointStruct
+
+from src.queries import content_rows_query, profile_rows_query
+
+load_dotenv()
+
+# Table alias and row query of each mode, the point id being the row id
+_SOURCES = {
+    "content": ("", content_rows_query),
+    "profile": ("a.", profile_rows_query),
+}
+
+# Point of the checkpoint collection holding the marks of every mode
+_CHECKPOINT_POINT_ID = 1
+
+
+class SyncWorker:
+    def __init__(self, metadata_agent, settings=None, checkpoint_collection=None, lock_name=None, batch_size=None,
+                 interval=None, updated_columns=None, modes=("content", "profile")):
+        """
+        Incrementally copy new and changed MySQL rows into Qdrant.
+
+        Each mode keeps a high-water mark on the row ``id``, or on ``(updated column, id)`` when an
+        updated timestamp column is configured, so that edited rows are picked up again. Rows are
+        pulled in batches above the mark; rows whose embedded text is unchanged reuse their stored
+        vector, and the mark is checkpointed after every upserted batch.
+
+        The marks are kept in Qdrant, next to the points they describe, so they survive restarts
+        and are shared by every replica. Only the replica holding the MySQL named lock
+        ``lock_name`` syncs; the others retry to take it every round, and take over when the
+        leader's connection closes.
+
+        :param metadata_agent: MetadataAgent embedding and upserting the rows.
+        :param settings: Parsed Settings, defaults to the agent's.
+        :param checkpoint_collection: Qdrant collection holding the marks (``SYNC_CHECKPOINT_COLLECTION``).
+        :param lock_name: MySQL named lock electing the syncing replica (``SYNC_LOCK_NAME``).
+        :param batch_size: Rows pulled per query (``SYNC_BATCH_SIZE``).
+        :param interval: Seconds between two sync rounds of the background thread (``SYNC_INTERVAL``).
+        :param updated_columns: Mapping of mode to updated timestamp column, defaults to
+            ``SYNC_CONTENT_UPDATED_COLUMN`` and ``SYNC_PROFILE_UPDATED_COLUMN``.
+        :param modes: Modes to sync.
+        """
+        self.metadata_agent = metadata_agent
+        self.settings = settings or metadata_agent.settings
+        self.checkpoint_collection = checkpoint_collection or os.getenv('SYNC_CHECKPOINT_COLLECTION', 'sync_checkpoint')
+        self.lock_name = lock_name or os.getenv('SYNC_LOCK_NAME', 'limpopo_sync_worker')
+        self.batch_size = int(batch_size or os.getenv('SYNC_BATCH_SIZE', 500))
+        self.interval = float(interval or os.getenv('SYNC_INTERVAL', 60))
+        self.updated_columns = updated_columns if updated_columns is not None else {
+            "content": os.getenv('SYNC_CONTENT_UPDATED_COLUMN'),
+            "profile": os.getenv('SYNC_PROFILE_UPDATED_COLUMN'),
+        }
+        self.modes = modes
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_conn = None
+        self._checkpoint_ready = False
+
+    @property
+    def qdrant_client(self):
+        return self.metadata_agent.qdrant_client
+
+    def _ensure_checkpoint_collection(self):
+        """
+        Create the vectorless checkpoint collection on first use.
+        """
+        if self._checkpoint_ready:
+            return
+        if not self.qdrant_client.collection_exists(self.checkpoint_collection):
+            logging.info(f"Creating sync checkpoint collection: {self.checkpoint_collection}")
+            self.qdrant_client.create_collection(self.checkpoint_collection, vectors_config={})
+        self._checkpoint_ready = True
+
+    def load_checkpoint(self):
+        """
+        Read the high-water marks.
+
+        :return: Dictionary mapping mode to its mark, empty when no checkpoint exists yet.
+        """
+        self._ensure_checkpoint_collection()
+        points = self.qdrant_client.retrieve(self.checkpoint_collection, ids=[_CHECKPOINT_POINT_ID])
+        return dict(points[0].payload) if points else {}
+
+    def save_checkpoint(self, checkpoint):
+        """
+        Write the high-water marks, waiting for Qdrant to apply them.
+
+        :param checkpoint: Dictionary mapping mode to its mark.
+        """
+        self._ensure_checkpoint_collection()
+        self.qdrant_client.upsert(
+            self.checkpoint_collection,
+            points=[PointStruct(id=_CHECKPOINT_POINT_ID, vector={}, payload=checkpoint)],
+            wait=True,
+        )
+
+    def is_leader(self):
+        """
+        Check that this replica holds the sync lock, trying to take it when it does not.
+
+        A lock connection that no longer answers means MySQL released the lock, so it is dropped
+        and the lock taken again if still free.
+
+        :return: True when this replica should sync.
+        """
+        if self._lock_conn is not None:
+            try:
+                self._lock_conn.ping(reconnect=False)
+                return True
+            except Exception as e:
+                logging.warning(f"Lost sync lock connection: {str(e)}")
+                self._release_lock()
+        self._lock_conn = self.metadata_agent.db.acquire_lock(self.lock_name)
+        if self._lock_conn is not None:
+            logging.info(f"Acquired sync lock: {self.lock_name}")
+        return self._lock_conn is not None
+
+    def _release_lock(self):
+        if self._lock_conn is not None:
+            try:
+                self._lock_conn.close()
+            except Exception:
+                pass
+            self._lock_conn = None
+
+    def _batch_query(self, mode, mark):
+        """
+        Build the query and parameters of the next batch above a mark.
+
+        :param mode: Determines the type of data (content or profile).
+        :param mark: Last synced ``{"id", "updated"}``, or None to start from the beginning.
+        :return: Tuple of (query, params).
+        """
+        alias, rows_query = _SOURCES[mode]
+        updated_column = self.updated_columns.get(mode)
+        mark = mark or {}
+        if updated_column:
+            column = f"{alias}{updated_column}"
+            query = rows_query(
+                self.settings,
+                f"({column} > %s OR ({column} = %s AND {alias}id > %s))",
+                f"ORDER BY {column}, {alias}id LIMIT %s",
+                f", {column} AS sync_updated",
+            )
+            updated = mark.get("updated") or "1970-01-01 00:00:00"
+            return query, (updated, updated, mark.get("id", 0), self.batch_size)
+
+        query = rows_query(self.settings, f"{alias}id > %s", f"ORDER BY {alias}id LIMIT %s")
+        return query, (mark.get("id", 0), self.batch_size)
+
+    def sync_mode(self, mode, checkpoint):
+        """
+        Sync every row of a mode above its mark, batch by batch.
+
+        :param mode: Determines the type of data (content or profile).
+        :param checkpoint: Checkpoint dictionary, updated and saved after each batch.
+        :return: Number of rows synced.
+        """
+        synced = 0
+        seen = set()
+        while not self._stop.is_set():
+            query, params = self._batch_query(mode, checkpoint.get(mode))
+            rows = self.metadata_agent.fetch_data(query, params)
+            if not rows:
+                break
+
+            last = rows[-1]
+            mark = {"id": last["id"]}
+            if "sync_updated" in last:
+                mark["updated"] = str(last["sync_updated"])
+                for row in rows:
+                    row.pop("sync_updated")
+
+            # Edited profile rows keep their key, they update their own point rather than being skipped
+            self.metadata_agent.ingest(rows, mode, seen, reuse_unchanged=True, refresh_existing=True)
+            checkpoint[mode] = mark
+            self.save_checkpoint(checkpoint)
+            synced += len(rows)
+            logging.info(f"Synced {len(rows)} rows for mode: {mode} up to {mark}")
+            if len(rows) < self.batch_size:
+                break
+        return synced
+
+    def run_once(self):
+        """
+        Run one sync round over every mode, when this replica holds the sync lock.
+
+        :return: Dictionary mapping mode to the number of rows synced, empty on other replicas.
+        """
+        if not self.is_leader():
+            logging.debug(f"Sync lock {self.lock_name} is held by another replica, skipping round")
+            return {}
+        checkpoint = self.load_checkpoint()
+        return {mode: self.sync_mode(mode, checkpoint) for mode in self.modes}
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                # The mark only moves after a successful batch, the next round resumes from it
+                logging.error(f"Sync round failed: {str(e)}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """
+        Start syncing every ``interval`` seconds on a background thread.
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sync-worker", daemon=True)
+        self._thread.start()
+        logging.info(f"Sync worker started for modes: {self.modes}")
+
+    def stop(self, timeout=None):
+        """
+        Stop the background thread after its current batch and release the sync lock.
+
+        :param timeout: Seconds to wait for the thread to finish.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._release_lock()
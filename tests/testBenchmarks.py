@@ -0,0 +1,18 @@
+import json
+
+import os,sys
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_path)
+
+from benchmarks.run_benchmarks import run
+
+
+def test_benchmarks_produce_machine_readable_results():
+    results = run(rows=40, queries=5, dim=16, top_k=3)
+
+    assert json.loads(json.dumps(results)) == results
+    assert results["ingest"]["content"]["rows"] == 40
+    assert results["ingest"]["profile"]["rows_per_sec"] > 0
+    assert set(results["query"]) == {"count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "qps"}
+    assert results["query_content"]["stored_vector"]["count"] == 5
+    assert results["recall"] == {"k": 3, "recall_at_k": 1.0}
@@ -0,0 +1,84 @@
+import pytest
+from unittest.mock import MagicMock
+
+import os,sys
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_path)
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import (VectorParams, Distance, PayloadSchemaType, ScalarQuantization,
+                                       ScalarQuantizationConfig, ScalarType)
+from src.collection_manager import CollectionManager
+
+
+@pytest.fixture
+def settings():
+    settings = MagicMock(hybrid_search=False, collection_apply_config=False)
+    settings.collection_name.side_effect = lambda mode: {"content": "content", "profile": "profile"}[mode]
+    return settings
+
+
+def test_creates_missing_collections_with_indexes(settings):
+    qdrant_client = MagicMock()
+    qdrant_client.collection_exists.return_value = False
+    manager = CollectionManager(qdrant_client, settings, vector_size=768, hnsw_m=32, hnsw_ef_construct=200,
+                                quantization="scalar")
+
+    manager.ensure_collections()
+
+    create_kwargs = qdrant_client.create_collection.call_args_list[1].kwargs
+    assert create_kwargs["collection_name"] == "profile"
+    assert create_kwargs["vectors_config"] == VectorParams(size=768, distance=Distance.COSINE, on_disk=True)
+    assert (create_kwargs["hnsw_config"].m, create_kwargs["hnsw_config"].ef_construct) == (32, 200)
+    assert isinstance(create_kwargs["quantization_config"], ScalarQuantization)
+    indexed = [(call.kwargs["collection_name"], call.kwargs["field_name"])
+               for call in qdrant_client.create_payload_index.call_args_list]
+    assert indexed == [("content", "video_id"), ("profile", "video_id"),
+                       ("profile", "topic_category"), ("profile", "user_handle")]
+    assert all(call.kwargs["field_schema"] == PayloadSchemaType.KEYWORD
+               for call in qdrant_client.create_payload_index.call_args_list)
+
+
+def test_existing_collection_is_validated(settings):
+    qdrant_client = QdrantClient(":memory:")
+    qdrant_client.create_collection("content", vectors_config=VectorParams(size=4, distance=Distance.COSINE))
+
+    CollectionManager(qdrant_client, settings, vector_size=4).ensure_collection("content", ("video_id",))
+
+    with pytest.raises(ValueError, match="size 4"):
+        CollectionManager(qdrant_client, settings, vector_size=768).ensure_collection("content")
+
+
+def test_config_changes_are_only_applied_on_opt_in(settings):
+    qdrant_client = MagicMock()
+    qdrant_client.collection_exists.return_value = True
+    info = qdrant_client.get_collection.return_value
+    info.config.params.vectors = VectorParams(size=4, distance=Distance.COSINE)
+    info.config.hnsw_config = MagicMock(m=16, ef_construct=100)
+    info.config.quantization_config = ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8))
+
+    # The defaults differ from the stored collection, which is left untouched
+    CollectionManager(qdrant_client, settings, vector_size=4, hnsw_m=32, quantization="none").ensure_collection("content")
+    qdrant_client.update_collection.assert_not_called()
+
+    CollectionManager(qdrant_client, settings, vector_size=4, hnsw_m=32, quantization="scalar",
+                      apply_config=True).ensure_collection("content")
+    update_kwargs = qdrant_client.update_collection.call_args.kwargs
+    assert update_kwargs["hnsw_config"].m == 32
+    assert update_kwargs["quantization_config"] is None
+
+
+def test_hybrid_collections_use_named_dense_and_idf_sparse_vectors(settings):
+    from qdrant_client.http.models import Modifier
+
+    qdrant_client = QdrantClient(":memory:")
+    hybrid = CollectionManager(qdrant_client, settings, vector_size=4, hybrid=True)
+    hybrid.ensure_collection("content")
+
+    params = qdrant_client.get_collection("content").config.params
+    assert params.vectors["dense"].size == 4
+    assert params.sparse_vectors["sparse"].modifier == Modifier.IDF
+    hybrid.ensure_collection("content")
+
+    with pytest.raises(ValueError, match="HYBRID_SEARCH=true"):
+        CollectionManager(qdrant_client, settings, vector_size=4, hybrid=False).ensure_collection("content")
@@ -0,0 +1,133 @@
+import pytest
+from unittest.mock import patch, MagicMock
+
+import os,sys
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_path)
+
+from src.db import Database, placeholders
+
+
+def mock_connection(rows=None):
+    conn = MagicMock()
+    conn.in_transaction = False
+    cursor = conn.cursor.return_value
+    cursor.description = [("video_id",), ("video_summary",)]
+    cursor.fetchall.return_value = rows if rows is not None else [("7001", "summary")]
+    return conn
+
+
+@patch("src.db.mysql.connector.connect")
+def test_fetch_all_reuses_pooled_connection(mock_connect):
+    mock_connect.side_effect = lambda **kwargs: mock_connection()
+    db = Database(pool_size=2)
+
+    assert db.fetch_all("SELECT video_id, video_summary FROM t WHERE video_id = %s", ("7001",)) == [
+        {"video_id": "7001", "video_summary": "summary"}
+    ]
+    db.fetch_all("SELECT video_id, video_summary FROM t WHERE video_id = %s", ("7002",))
+
+    assert mock_connect.call_count == 1
+    cursor = db._idle.queue[0][0].cursor.return_value
+    cursor.execute.assert_called_with("SELECT video_id, video_summary FROM t WHERE video_id = %s", ("7002",))
+
+
+@patch("src.db.mysql.connector.connect")
+def test_fetch_all_returns_none_without_rows(mock_connect):
+    mock_connect.side_effect = lambda **kwargs: mock_connection(rows=[])
+    assert Database().fetch_all("SELECT 1") is None
+
+
+@patch("src.db.mysql.connector.connect")
+def test_stale_and_unhealthy_connections_are_replaced(mock_connect):
+    mock_connect.side_effect = lambda **kwargs: mock_connection()
+
+    db = Database(recycle=0.000001)
+    db.fetch_all("SELECT 1")
+    db.fetch_all("SELECT 1")
+    assert mock_connect.call_count == 2
+
+    mock_connect.reset_mock()
+    db = Database(health_check_interval=0.000001)
+    db.fetch_all("SELECT 1")
+    db._idle.queue[0][0].ping.side_effect = Exception("MySQL server has gone away")
+    db.fetch_all("SELECT 1")
+    assert mock_connect.call_count == 2
+
+
+@patch("src.db.mysql.connector.connect")
+def test_connection_is_discarded_on_error(mock_connect):
+    conn = mock_connection()
+    conn.cursor.return_value.execute.side_effect = Exception("syntax error")
+    mock_connect.return_value = conn
+    db = Database()
+
+    with pytest.raises(Exception, match="syntax error"):
+        db.fetch_all("SELEC 1")
+    assert db._idle.empty()
+    conn.close.assert_called_once()
+
+
+class FakePreparedCursor:
+    """Prepares again whenever the operation is not the object last executed, as mysql-connector does."""
+    description = [("video_id",)]
+
+    def __init__(self):
+        self.prepares = 0
+        self._executed = None
+        self.close = MagicMock()
+
+    def execute(self, operation, params=None):
+        if operation is not self._executed:
+            self.prepares += 1
+            self._executed = operation
+
+    def fetchall(self):
+        return [("7001",)]
+
+
+@patch("src.db.mysql.connector.connect")
+def test_fetch_all_reuses_prepared_statements(mock_connect):
+    conn = mock_connection()
+    conn.cursor.side_effect = lambda **kwargs: FakePreparedCursor()
+    mock_connect.return_value = conn
+    db = Database(pool_size=1, statement_cache_size=1)
+    table = "t"
+
+    # Equal queries built as distinct string objects, as the f-string callers do
+    first_query = f"SELECT video_id FROM {table} WHERE video_id = %s"
+    second_query = f"SELECT video_id FROM {table} WHERE video_id = %s"
+    assert first_query == second_query and first_query is not second_query
+    db.fetch_all(first_query, ("7001",))
+    db.fetch_all(second_query, ("7002",))
+
+    assert conn.cursor.call_count == 1
+    assert conn.cursor.call_args.kwargs == {"prepared": True}
+    first, _ = db._statements[conn][first_query]
+    assert first.prepares == 1
+
+    # Beyond the cache size the least recently used statement is closed
+    db.fetch_all("SELECT video_id FROM t WHERE id = %s", (1,))
+    assert conn.cursor.call_count == 2
+    first.close.assert_called_once()
+
+
+def test_placeholders():
+    assert placeholders([1, 2, 3]) == "%s,%s,%s"
+
+
+@patch("src.db.mysql.connector.connect")
+def test_acquire_lock_holds_a_dedicated_connection(mock_connect):
+    held, refused = mock_connection(), mock_connection()
+    held.cursor.return_value.fetchone.return_value = (1,)
+    refused.cursor.return_value.fetchone.return_value = (0,)
+    mock_connect.side_effect = [held, refused]
+    db = Database()
+
+    assert db.acquire_lock("sync") is held
+    held.cursor.return_value.execute.assert_called_with("SELECT GET_LOCK(%s, 0)", ("sync",))
+    held.close.assert_not_called()
+
+    assert db.acquire_lock("sync") is None
+    refused.close.assert_called_once()
+    assert db._idle.empty()
@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+
+import os,sys
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_path)
+
+from src.embedding_cache import EmbeddingCache
+from src.mega_similarity import MegaSimilarityAgent
+
+
+def test_cache_normalizes_text_and_counts_hits():
+    cache = EmbeddingCache(maxsize=10, ttl=60)
+    cache.set("nomic", "Politics  Racism ", [0.1, 0.2])
+
+    assert cache.get("nomic", " Politics Racism") == [0.1, 0.2]
+    assert cache.get("other-model", "Politics Racism") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_cache_evicts_least_recently_used():
+    cache = EmbeddingCache(maxsize=2, ttl=60)
+    cache.set("nomic", "a", [1.0])
+    cache.set("nomic", "b", [2.0])
+    cache.get("nomic", "a")
+    cache.set("nomic", "c", [3.0])
+
+    assert cache.get("nomic", "b") is None
+    assert cache.get("nomic", "a") == [1.0]
+    assert cache.get("nomic", "c") == [3.0]
+
+
+def test_cache_expires_entries():
+    cache = EmbeddingCache(maxsize=2, ttl=60)
+    with patch("src.embedding_cache.time.monotonic", return_value=1000.0):
+        cache.set("nomic", "a", [1.0])
+    with patch("src.embedding_cache.time.monotonic", return_value=1061.0):
+        assert cache.get("nomic", "a") is None
+
+
+def test_cache_falls_back_to_shared_backend():
+    backend = MagicMock()
+    backend.get.return_value = [0.5]
+    cache = EmbeddingCache(maxsize=2, ttl=60, backend=backend)
+
+    assert cache.get("nomic", "shared text") == [0.5]
+    assert cache.stats()["backend_hits"] == 1
+
+    backend.get.side_effect = Exception("redis down")
+    assert cache.get("nomic", "unknown text") is None
+
+
+def test_async_lookups_use_one_backend_round_trip():
+    backend = MagicMock()
+    backend.aget_many = AsyncMock(side_effect=lambda keys: [[0.5]] + [None] * (len(keys) - 1))
+    backend.aset_many = AsyncMock()
+    cache = EmbeddingCache(maxsize=10, ttl=60, backend=backend)
+    cache.set("nomic", "local", [0.1])
+
+    async def run():
+        vectors = await cache.aget_many("nomic", ["local", "shared", "new"])
+        await cache.aset_many("nomic", [("new", [0.9])])
+        return vectors
+
+    assert asyncio.run(run()) == [[0.1], [0.5], None]
+    backend.aget_many.assert_awaited_once()
+    assert len(backend.aget_many.call_args.args[0]) == 2
+    backend.aset_many.assert_awaited_once()
+    backend.get.assert_not_called()
+    assert cache.get("nomic", "new") == [0.9]
+    assert cache.stats()["backend_hits"] == 1
+
+
+def test_agent_reuses_cached_query_embedding():
+    embedding_client = MagicMock(model_name="nomic")
+    embedding_client.embed.return_value = [0.1, 0.2]
+    agent = MegaSimilarityAgent(embedding_client=embedding_client, settings=MagicMock(),
+                                qdrant_client=MagicMock(), embedding_cache=EmbeddingCache(maxsize=10, ttl=60))
+
+    assert agent.generate_embedding("summary") == [0.1, 0.2]
+    assert agent.generate_embedding("summary") == [0.1, 0.2]
+    embedding_client.embed.assert_called_once_with("summary")
@@ -0,0 +1,156 @@
+import pytest
+from unittest.mock import MagicMock
+
+import os,sys
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_path)
+
+from src.embedding_client import EmbeddingClient
+
+
+def mock_response(content=None):
+    response = MagicMock()
+    response.content = content
+    response.raise_for_status.return_value = None
+    return response
+
+
+def test_embed_single_text():
+    client = EmbeddingClient(url="http://embed/embedPromt", model_name="nomic", concurrency=2)
+    client.session = MagicMock()
+    client.session.get.return_value = mock_response(content=b"[0.1, 0.2, 0.3]")
+
+    assert client.embed("hello") == [0.1, 0.2, 0.3]
+    client.session.get.assert_called_once_with(
+        "http://embed/embedPromt",
+        params={"promt": "hello", "model_name": "nomic"},
+        timeout=client.timeout,
+    )
+
+
+def test_embed_batch_uses_batch_endpoint_in_chunks():
+    client = EmbeddingClient(url="http://embed/embedPromt", batch_url="http://embed/embedBatch",
+                             model_name="nomic", batch_size=2, concurrency=2)
+    client.session = MagicMock()
+    client.session.post.side_effect = lambda url, json, timeout: mock_response(
+        content=str([[float(len(text))] for text in json["promts"]]).encode("utf-8")
+    )
+
+    vectors = client.embed_batch(["a", "bb", "ccc"])
+
+    assert vectors == [[1.0], [2.0], [3.0]]
+    assert client.session.post.call_count == 2
+    client.session.get.assert_not_called()
+
+
+def test_embed_batch_without_batch_endpoint_keeps_order():
+    client = EmbeddingClient(url="http://embed/embedPromt", model_name="nomic", concurrency=4)
+    client.session = MagicMock()
+    client.session.get.side_effect = lambda url, params, timeout: mock_response(
+        content=str([float(len(params["promt"]))]).encode("utf-8")
+    )
+
+    assert client.embed_batch(["a", "bb", "ccc", "dddd"]) == [[1.0], [2.0], [3.0], [4.0]]
+    assert client.embed_batch([]) == []
+
+
+def test_embed_batch_rejects_mismatched_response():
+    client = EmbeddingClient(url="http://embed/embedPromt", batch_url="http://embed/embedBatch", model_name="nomic")
+    client.session = MagicMock()
+    client.session.post.return_value = mock_response(content=b"[[0.1]]")
+
+    with pytest.raises(ValueError):
+        client.embed_batch(["a", "b"])
+
+
+def test_decode_vector_formats():
+    import numpy as np
+    from src.embedding_client import decode_vector, decode_vectors
+
+    raw = np.array([0.25, -1.5, 3.0], dtype="<f4")
+
+    assert decode_vector(b"[0.25, -1.5, 3.0]") == [0.25, -1.5, 3.0]
+    np.testing.assert_array_equal(decode_vector(b"[0.25, -1.5, 3.0]", "json"), raw)
+    np.testing.assert_array_equal(decode_vector(raw.tobytes(), "f32"), raw)
+    assert decode_vectors(np.stack([raw, raw]).tobytes(), 2, "f32").shape == (2, 3)
+
+    # Batch bodies are Python literals too, which JSON cannot always parse
+    assert decode_vectors(b"[[0.25, -1.5], (3.0, 1e-05)]", 2) == [[0.25, -1.5], (3.0, 1e-05)]
+
+
+def test_f32_client_requests_binary_response():
+    client = EmbeddingClient(url="http://embed/embedPromt", model_name="nomic", response_format="f32")
+    assert client.session.headers["Accept"] == "application/octet-stream"
+
+    with pytest.raises(ValueError):
+        EmbeddingClient(url="http://embed/embedPromt", response_format="xml")
+
+
+def test_concurrent_single_embeds_are_coalesced_into_batch_calls():
+    import threading
+    client = EmbeddingClient(url="http://embed/embedPromt", batch_url="http://embed/embedBatch", model_name="nomic",
+                             batch_size=8, coalesce_max_batch=8, coalesce_window_ms=50)
+    client.session = MagicMock()
+    client.session.post.side_effect = lambda url, json, timeout: mock_response(
+        content=str([[float(len(text))] for text in json["promts"]]).encode("utf-8")
+    )
+    results = {}
+
+    def embed(text):
+        results[text] = client.embed(text)
+
+    threads = [threading.Thread(target=embed, args=(text,)) for text in ["a", "bb", "ccc", "dddd"]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    client.close()
+
+    assert results == {"a": [1.0], "bb": [2.0], "ccc": [3.0], "dddd": [4.0]}
+    assert client.session.post.call_count < 4
+    client.session.get.assert_not_called()
+
+
+def test_async_embeds_are_coalesced_up_to_max_batch():
+    import asyncio
+    from unittest.mock import AsyncMock
+    from src.embedding_client import AsyncEmbeddingClient
+
+    async def run():
+        client = AsyncEmbeddingClient(url="http://embed/embedPromt", batch_url="http://embed/embedBatch",
+                                      model_name="nomic", coalesce_max_batch=2, coalesce_window_ms=1000)
+        client.client = MagicMock()
+        client.client.request = AsyncMock(side_effect=lambda method, url, json: MagicMock(
+            status_code=200, content=str([[float(len(text))] for text in json["promts"]]).encode("utf-8")
+        ))
+        vectors = await asyncio.gather(*(client.embed(text) for text in ["a", "bb", "ccc", "dddd"]))
+        return vectors, client.client.request
+
+    vectors, request = asyncio.run(run())
+
+    # A full batch is sent without waiting for the window
+    assert vectors == [[1.0], [2.0], [3.0], [4.0]]
+    assert request.await_count == 2
+
+
+def test_async_embed_batch_without_batch_endpoint_is_bounded():
+    import asyncio
+    from src.embedding_client import AsyncEmbeddingClient
+    in_flight = {"now": 0, "peak": 0}
+
+    async def request(method, url, params):
+        in_flight["now"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        await asyncio.sleep(0.01)
+        in_flight["now"] -= 1
+        return MagicMock(status_code=200, content=str([float(len(params["promt"]))]).encode("utf-8"))
+
+    async def run():
+        client = AsyncEmbeddingClient(url="http://embed/embedPromt", model_name="nomic", concurrency=2,
+                                      coalesce_window_ms=0)
+        client.client = MagicMock()
+        client.client.request = request
+        return await client.embed_batch(["a" * n for n in range(1, 7)])
+
+    assert asyncio.run(run()) == [[float(n)] for n in range(1, 7)]
+    assert in_flight["peak"] == 2
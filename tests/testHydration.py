@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime
+from unittest.mock import MagicMock, AsyncMock
+
+import os,sys
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_path)
+
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.http.models import VectorParams, Distance
+from src.embedding_cache import EmbeddingCache
+from src.hydration import PayloadHydrator
+from src.mega_similarity import MegaSimilarityAgent
+from src.metadata import MetadataAgent
+from src.settings import SearchTuning, IngestTuning
+
+rows = [
+    {"id": 1, "video_id": "7001", "video_summary": "first", "picture": "https://example.com/1.jpg",
+     "video_posted_timestamp": datetime(2024, 1, 1)},
+    {"id": 2, "video_id": "7002", "video_summary": "second", "picture": "https://example.com/2.jpg",
+     "video_posted_timestamp": datetime(2024, 1, 2)},
+]
+
+
+def make_settings():
+    settings = MagicMock(content_collection_name="content", profile_collection_name="profile",
+                         content_payload_fields=None, profile_payload_fields=None,
+                         ingest=IngestTuning(), hybrid_search=False, compact_payload=False)
+    settings.collection_name.side_effect = lambda mode: mode
+    settings.search_tuning.return_value = SearchTuning()
+    return settings
+
+
+def test_hydrator_fetches_only_uncached_rows_until_they_expire():
+    db = MagicMock()
+    db.fetch_all.side_effect = lambda query, params: [row for row in rows if row["id"] in params]
+    hydrator = PayloadHydrator(make_settings(), db=db, ttl=60)
+
+    assert set(hydrator.hydrate("content", [1])) == {1}
+    hydrated = hydrator.hydrate("content", [1, 2, 3])
+
+    assert set(hydrated) == {1, 2}
+    assert hydrated[2]["video_posted_timestamp"] == "2024-01-02 00:00:00"
+    assert [call.args[1] for call in db.fetch_all.call_args_list] == [[1], [2, 3]]
+    assert "id IN (%s,%s)" in db.fetch_all.call_args_list[1].args[0]
+
+    hydrator.ttl = -1
+    hydrator._rows.clear()
+    hydrator.hydrate("content", [1])
+    hydrator.hydrate("content", [1])
+    assert db.fetch_all.call_count == 4
+
+
+def test_compact_points_are_hydrated_in_one_lookup():
+    settings = make_settings()
+    settings.compact_payload = True
+    embedding_client = MagicMock(model_name="nomic")
+    embedding_client.embed_batch.side_effect = lambda texts: [[1.0, 0.0], [0.9, 0.1]][:len(texts)]
+
+    qdrant_client = QdrantClient(":memory:")
+    qdrant_client.create_collection("content", vectors_config=VectorParams(size=2, distance=Distance.COSINE))
+    metadata_agent = MetadataAgent(embedding_client=embedding_client, db=MagicMock(), settings=settings,
+                                   qdrant_client=qdrant_client)
+    metadata_agent.upsertion([dict(row) for row in rows], mode="content")
+
+    stored = qdrant_client.retrieve("content", [1])[0].payload
+    assert set(stored) == {"id", "video_id", "text_hash", "row_hash"}
+
+    async_db = MagicMock()
+    async_db.fetch_all = AsyncMock(side_effect=lambda query, params: [row for row in rows if row["id"] in params])
+
+    async def run():
+        async_qdrant_client = AsyncQdrantClient(":memory:")
+        await async_qdrant_client.create_collection("content", vectors_config=VectorParams(size=2, distance=Distance.COSINE))
+        await async_qdrant_client.upsert("content", points=qdrant_client.retrieve("content", [1, 2], with_vectors=True))
+        agent = MegaSimilarityAgent(embedding_client=embedding_client, async_qdrant_client=async_qdrant_client,
+                                    settings=settings, qdrant_client=qdrant_client,
+                                    embedding_cache=EmbeddingCache(maxsize=0),
+                                    hydrator=PayloadHydrator(settings, async_db=async_db))
+        return await agent.asearch_batch("content", [([1.0, 0.0], 7001, None), ([0.0, 1.0], 7002, None)],
+                                         threshold=0.0, top_k=1)
+
+    matches = asyncio.run(run())
+
+    assert [[match["video_summary"] for match in result] for result in matches] == [["second"], ["first"]]
+    assert matches[0][0]["picture"] == "https://example.com/2.jpg"
+    async_db.fetch_all.assert_awaited_once()
@@ -0,0 +1,83 @@
+import time
+import threading
+import pytest
+from unittest.mock import MagicMock
+
+import os,sys
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_path)
+
+from src.jobs import JobManager
+
+
+def wait_for(job_manager, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = job_manager.status(job_id)
+        if status["status"] in ("completed", "failed"):
+            return status
+        time.sleep(0.01)
+    raise TimeoutError(job_id)
+
+
+def test_failed_batch_is_retried_row_by_row():
+    calls = []
+
+    def work(ids):
+        calls.append(list(ids))
+        if 3 in ids:
+            raise ValueError("bad row")
+
+    job_manager = JobManager(concurrency=1, batch_size=2, row_retries=2)
+    status = wait_for(job_manager, job_manager.submit([1, 2, 3, 4, 5], work)["job_id"])
+
+    assert status["status"] == "completed"
+    assert (status["processed"], status["failed"]) == (4, 1)
+    assert status["failures"] == {3: "bad row"}
+    assert calls == [[1, 2], [3, 4], [3], [3], [4], [5]]
+    assert status["throughput"] > 0
+    job_manager.close()
+
+
+def test_unknown_job_has_no_status():
+    job_manager = JobManager(concurrency=1)
+
+    assert job_manager.status("missing") is None
+    job_manager.close()
+
+
+def test_queued_jobs_are_cancelled_on_close():
+    started = threading.Event()
+    release = threading.Event()
+
+    def work(ids):
+        started.set()
+        release.wait(5)
+
+    job_manager = JobManager(concurrency=1, batch_size=10)
+    running = job_manager.submit([1], work)["job_id"]
+    started.wait(5)
+    queued = job_manager.submit([2], work)["job_id"]
+    job_manager.close()
+    release.set()
+
+    assert job_manager.status(queued)["status"] == "cancelled"
+    assert wait_for(job_manager, running)["status"] == "completed"
+
+
+def test_status_is_shared_through_the_store():
+    saved = {}
+    store = MagicMock()
+    store.save.side_effect = lambda job: saved.__setitem__(job["job_id"], job)
+    store.get.side_effect = saved.get
+
+    job_manager = JobManager(concurrency=1, store=store)
+    job_id = job_manager.submit([1, 2], lambda ids: None)["job_id"]
+    wait_for(job_manager, job_id)
+    job_manager.close()
+
+    # Another replica only knows the job through the store
+    other_replica = JobManager(concurrency=1, store=store)
+    status = other_replica.status(job_id)
+    assert (status["status"], status["processed"]) == ("completed", 2)
+    other_replica.close()
@@ -0,0 +1,88 @@
+import pytest
+import threading
+from unittest.mock import patch, MagicMock
+
+import os,sys
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_path)
+
+import numpy as np
+from src.local_embedding import LocalEmbeddingBackend
+
+
+@pytest.fixture
+def local_backend():
+    with patch("src.local_embedding.SentenceTransformer") as MockSentenceTransformer:
+        model = MockSentenceTransformer.return_value
+        model.encode.side_effect = lambda texts, batch_size: np.array([[float(len(text))] for text in texts], dtype=np.float32)
+        backend = LocalEmbeddingBackend(model_name="nomic-ai/nomic-embed-text-v1", prefix="search_query: ", batch_size=8,
+                                        max_wait_ms=50)
+        yield backend, model
+
+
+def test_local_backend_prefixes_task_and_encodes(local_backend):
+    backend, model = local_backend
+
+    assert backend.embed("abc")[0] == len("search_query: abc")
+    assert model.encode.call_args.args[0] == ["search_query: abc"]
+
+
+def test_local_backend_keeps_model_tags_out_of_the_prefix():
+    with patch("src.local_embedding.SentenceTransformer") as MockSentenceTransformer, \
+            patch.dict(os.environ, {"LOCAL_EMBEDDING_PREFIX": ""}):
+        backend = LocalEmbeddingBackend(model_name="nomic-embed-text:latest")
+
+    assert backend.prefix == ""
+    assert backend.model_name == "nomic-embed-text:latest"
+    assert MockSentenceTransformer.call_args.args[0] == "nomic-embed-text:latest"
+
+
+def test_local_backend_batches_concurrent_requests(local_backend):
+    backend, model = local_backend
+    results = {}
+
+    def embed(text):
+        results[text] = backend.embed(text)
+
+    threads = [threading.Thread(target=embed, args=(text,)) for text in ["a", "bb", "ccc", "dddd"]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert model.encode.call_count < 4
+    assert {text: vector[0] for text, vector in results.items()} == {
+        text: len(f"search_query: {text}") for text in ["a", "bb", "ccc", "dddd"]
+    }
+
+
+def test_local_backend_propagates_encode_errors(local_backend):
+    backend, model = local_backend
+    model.encode.side_effect = RuntimeError("out of memory")
+
+    with pytest.raises(RuntimeError):
+        backend.embed_batch(["a", "b"])
+
+
+def test_backend_selection(local_backend):
+    from src.embedding_client import create_embedding_client, EmbeddingClient
+
+    with patch.dict(os.environ, {"EMBEDDING_BACKEND": "remote"}):
+        assert isinstance(create_embedding_client(), EmbeddingClient)
+    with patch.dict(os.environ, {"EMBEDDING_BACKEND": "gpu"}), pytest.raises(ValueError):
+        create_embedding_client()
+
+
+def test_onnx_backend_requires_recent_sentence_transformers():
+    with patch("src.local_embedding.SentenceTransformer") as MockSentenceTransformer, \
+            patch("src.local_embedding.sentence_transformers.__version__", "2.6.1"):
+        LocalEmbeddingBackend(model_name="nomic-ai/nomic-embed-text-v1", onnx=False)
+        assert "backend" not in MockSentenceTransformer.call_args.kwargs
+        with pytest.raises(ImportError):
+            LocalEmbeddingBackend(model_name="nomic-ai/nomic-embed-text-v1", onnx=True)
+
+    with patch("src.local_embedding.SentenceTransformer") as MockSentenceTransformer, \
+            patch("src.local_embedding.sentence_transformers.__version__", "3.3.1"):
+        LocalEmbeddingBackend(model_name="nomic-ai/nomic-embed-text-v1", onnx=True, onnx_file="onnx/model_quantized.onnx")
+        assert MockSentenceTransformer.call_args.kwargs["backend"] == "onnx"
+        assert MockSentenceTransformer.call_args.kwargs["model_kwargs"] == {"file_name": "onnx/model_quantized.onnx"}
@@ -0,0 +1,175 @@
+import pytest
+from unittest.mock import MagicMock
+
+import os,sys
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_path)
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import VectorParams, Distance, PointStruct
+from src.embedding_cache import EmbeddingCache
+from src.mega_similarity import MegaSimilarityAgent
+from src.settings import SearchTuning, IngestTuning
+
+mock_points = [
+    PointStruct(id=1, vector=[1.0, 0.0], payload={"id": 1, "video_id": "7001", "video_summary": "a", "risk_status": "low"}),
+    PointStruct(id=2, vector=[0.9, 0.1], payload={"id": 2, "video_id": "7002", "video_summary": "b", "risk_status": "low"}),
+    PointStruct(id=3, vector=[0.8, 0.2], payload={"id": 3, "video_id": "7003", "video_summary": "c", "risk_status": "high"}),
+    PointStruct(id=4, vector=[0.0, 1.0], payload={"id": 4, "video_id": "7004", "video_summary": "d", "risk_status": "low"}),
+]
+
+
+@pytest.fixture
+def similarity_agent():
+    qdrant_client = QdrantClient(":memory:")
+    qdrant_client.create_collection("content", vectors_config=VectorParams(size=2, distance=Distance.COSINE))
+    qdrant_client.upsert("content", points=mock_points)
+
+    embedding_client = MagicMock(model_name="nomic")
+    embedding_client.embed.return_value = [1.0, 0.0]
+    settings = MagicMock(content_collection_name="content", profile_collection_name="profile",
+                         content_payload_fields=("id", "video_id"), profile_payload_fields=None,
+                         hybrid_search=False)
+    settings.search_tuning.return_value = SearchTuning()
+    return MegaSimilarityAgent(embedding_client=embedding_client, settings=settings,
+                               qdrant_client=qdrant_client, embedding_cache=EmbeddingCache(maxsize=0))
+
+
+def test_query_excludes_input_video_and_applies_threshold_server_side(similarity_agent):
+    matches = similarity_agent.query("summary", "content", threshold=0.5, top_k=2, input_video_id=7001)
+
+    assert [match["video_id"] for match in matches] == ["7002", "7003"]
+    assert all(match["similarity_score"] >= 0.5 for match in matches)
+
+
+def test_query_returns_only_configured_payload_fields(similarity_agent):
+    matches = similarity_agent.query("summary", "content", threshold=0.0, top_k=1)
+
+    assert set(matches[0]) == {"id", "video_id", "similarity_score"}
+
+
+def test_query_hides_change_detection_hashes(similarity_agent):
+    similarity_agent.qdrant_client.set_payload("content", {"text_hash": "t", "row_hash": "r"}, points=[1])
+
+    similarity_agent.settings.content_payload_fields = None
+    assert not {"text_hash", "row_hash"} & set(similarity_agent.query("summary", "content", threshold=0.0, top_k=1)[0])
+
+    similarity_agent.settings.content_payload_fields = ("id", "row_hash")
+    assert set(similarity_agent.query("summary", "content", threshold=0.0, top_k=1)[0]) == {"id", "row_hash", "similarity_score"}
+
+
+def test_search_kwargs_exclude_user_without_video(similarity_agent):
+    kwargs = similarity_agent._search_kwargs("profile", 0.5, 5, user_handle="melayubersatu1")
+
+    assert kwargs["score_threshold"] == 0.5
+    assert kwargs["with_payload"] is True
+    assert kwargs["query_filter"].must_not[0].key == "user_handle"
+
+
+def test_search_batch_and_stored_vectors_in_single_calls(similarity_agent):
+    import asyncio
+    from qdrant_client import AsyncQdrantClient
+
+    async def run():
+        async_qdrant_client = AsyncQdrantClient(":memory:")
+        await async_qdrant_client.create_collection("content", vectors_config=VectorParams(size=2, distance=Distance.COSINE))
+        await async_qdrant_client.upsert("content", points=mock_points)
+        similarity_agent._async_qdrant_client = async_qdrant_client
+
+        stored = await similarity_agent.astored_vectors("content", [7001, 7004, 9999])
+        matches = await similarity_agent.asearch_batch(
+            "content", [(stored["7001"], 7001, None), (stored["7004"], 7004, None)], threshold=0.5, top_k=1
+        )
+        return stored, matches
+
+    stored, matches = asyncio.run(run())
+
+    assert set(stored) == {"7001", "7004"}
+    assert [[match["video_id"] for match in result] for result in matches] == [["7002"], []]
+
+
+def test_search_params_merge_settings_and_request_overrides(similarity_agent):
+    assert similarity_agent._search_params("content") is None
+
+    similarity_agent.settings.search_tuning.return_value = SearchTuning(hnsw_ef=64, oversampling=2.0)
+    params = similarity_agent._search_params("content", {"exact": True, "rescore": True, "hnsw_ef": None})
+
+    assert (params.hnsw_ef, params.exact, params.indexed_only) == (64, True, False)
+    assert (params.quantization.rescore, params.quantization.oversampling) == (True, 2.0)
+
+    # Exact search on the in-memory collection returns the same matches
+    matches = similarity_agent.query("summary", "content", threshold=0.5, top_k=2, input_video_id=7001,
+                                     search_params={"exact": True})
+    assert [match["video_id"] for match in matches] == ["7002", "7003"]
+
+
+def test_hybrid_query_fuses_keyword_matches():
+    from src.collection_manager import CollectionManager
+    from src.metadata import MetadataAgent
+
+    dense = {"cats and dogs": [1.0, 0.0], "stock market news": [0.9, 0.1], "zebra migration": [0.0, 1.0]}
+    embedding_client = MagicMock(model_name="nomic")
+    embedding_client.embed_batch.side_effect = lambda texts: [dense[text] for text in texts]
+    embedding_client.embed.return_value = [1.0, 0.0]
+    settings = MagicMock(content_collection_name="content", profile_collection_name="profile",
+                         content_payload_fields=None, profile_payload_fields=None,
+                         ingest=IngestTuning(), hybrid_search=True, hybrid_prefetch_factor=4, compact_payload=False)
+    settings.collection_name.side_effect = lambda mode: mode
+    settings.search_tuning.return_value = SearchTuning()
+
+    qdrant_client = QdrantClient(":memory:")
+    CollectionManager(qdrant_client, settings, vector_size=2).ensure_collection("content")
+    metadata_agent = MetadataAgent(embedding_client=embedding_client, db=MagicMock(), settings=settings,
+                                   qdrant_client=qdrant_client)
+    metadata_agent.upsertion([{"id": i, "video_id": str(7000 + i), "video_summary": text}
+                              for i, text in enumerate(dense, start=1)], mode="content")
+    similarity_agent = MegaSimilarityAgent(embedding_client=embedding_client, settings=settings,
+                                           qdrant_client=qdrant_client, embedding_cache=EmbeddingCache(maxsize=0))
+
+    # Dense-only search would rank "cats and dogs" first, the keyword match wins after fusion
+    matches = similarity_agent.query("Zebra", "content", threshold=0.0, top_k=1)
+    assert [match["video_summary"] for match in matches] == ["zebra migration"]
+    # The dense similarity is kept, the fused score comes separately
+    assert matches[0]["similarity_score"] == pytest.approx(0.0, abs=1e-6)
+    assert matches[0]["hybrid_score"] > 0
+
+    # Keyword matches below the threshold are not returned
+    matches = similarity_agent.query("Zebra", "content", threshold=0.5, top_k=3)
+    assert "zebra migration" not in [match["video_summary"] for match in matches]
+    assert all(match["similarity_score"] >= 0.5 for match in matches)
+
+    stored = qdrant_client.retrieve("content", [3], with_vectors=True)[0].vector
+    assert set(stored) == {"dense", "sparse"}
+
+    # Stored-vector and batch searches are fused with the stored sparse vector too
+    import asyncio
+    from qdrant_client import AsyncQdrantClient
+    from qdrant_client.http.models import PointStruct as Point
+
+    async def run():
+        async_qdrant_client = AsyncQdrantClient(":memory:")
+        await async_qdrant_client.create_collection(
+            "content", vectors_config=qdrant_client.get_collection("content").config.params.vectors,
+            sparse_vectors_config=qdrant_client.get_collection("content").config.params.sparse_vectors
+        )
+        points = qdrant_client.scroll("content", with_vectors=True, limit=10)[0]
+        await async_qdrant_client.upsert("content", points=[
+            Point(id=point.id, vector=point.vector, payload=point.payload) for point in points
+        ])
+        similarity_agent._async_qdrant_client = async_qdrant_client
+
+        by_video = await similarity_agent.aquery_by_video_id(7001, "content", threshold=0.0, top_k=2)
+        stored = await similarity_agent.astored_vectors("content", [7001])
+        batch = await similarity_agent.asearch_batch("content", [
+            (stored["7001"], 7001, None),
+            (similarity_agent.query_vector([1.0, 0.0], "zebra"), None, None),
+        ], threshold=0.0, top_k=1)
+        return by_video, batch
+
+    by_video, batch = asyncio.run(run())
+
+    assert [match["video_summary"] for match in by_video] == ["stock market news", "zebra migration"]
+    assert all("hybrid_score" in match for match in by_video)
+    assert [[match["video_summary"] for match in matches] for matches in batch] == [
+        ["stock market news"], ["zebra migration"]
+    ]
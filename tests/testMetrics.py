@@ -0,0 +1,42 @@
+from fastapi.testclient import TestClient
+import os,sys
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_path)
+
+from main import app
+from src.metrics import STAGE_SECONDS, stage
+
+client = TestClient(app)
+
+
+def sample_count(stage_name):
+    for metric in STAGE_SECONDS.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_count") and sample.labels.get("stage") == stage_name:
+                return sample.value
+    return 0
+
+
+def test_stage_is_observed_even_when_it_raises():
+    before = sample_count("test_stage")
+    with stage("test_stage"):
+        pass
+    try:
+        with stage("test_stage"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    assert sample_count("test_stage") == before + 2
+
+
+def test_metrics_endpoint_exposes_stages_and_requests():
+    with stage("test_stage"):
+        pass
+    client.get("/")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'limpopo_stage_seconds_count{stage="test_stage"}' in response.text
+    assert 'limpopo_request_seconds_count{method="GET",path="/",status="200"}' in response.text
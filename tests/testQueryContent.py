@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
 import os,sys
 root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -80,3 +80,56 @@ def test_query_content_video_not_found():
 
 #         assert response.status_code == 500
 #         assert response.json() == {"detail": "Profile similarity query error: Database error"}
+
+
+def test_query_content_async_path():
+    mock_async_db = MagicMock()
+    mock_async_db.fetch_all = AsyncMock(return_value=[{"video_summary": "summary of the video"}])
+    mock_similarity_agent_instance = MagicMock()
+    mock_similarity_agent_instance.aquery = AsyncMock(return_value=mock_similarity_results)
+    mock_settings = MagicMock(threshold=0.5, top_k=5, content_collection_name="content", reuse_stored_vectors=False)
+
+    app.dependency_overrides[main.get_async_database] = lambda: mock_async_db
+    app.dependency_overrides[main.get_mega_similarity_agent] = lambda: mock_similarity_agent_instance
+    app.dependency_overrides[main.get_settings] = lambda: mock_settings
+    try:
+        response = client.post("/query_content", json={"video_id": 7348693858496122120, "user_handle": "melayubersatu1", "searchType": "video"})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert response.json() == {"matches": mock_similarity_results}
+    assert mock_async_db.fetch_all.await_args.args[1] == (7348693858496122120,)
+    assert mock_similarity_agent_instance.aquery.await_args.kwargs["query_text"] == "summary of the video"
+    assert mock_similarity_agent_instance.aquery.await_args.kwargs["collection_name"] == "content"
+
+
+def test_query_content_reuses_stored_vector():
+    mock_async_db = MagicMock()
+    mock_async_db.fetch_all = AsyncMock()
+    mock_similarity_agent_instance = MagicMock()
+    mock_similarity_agent_instance.aquery_by_video_id = AsyncMock(return_value=mock_similarity_results)
+    mock_similarity_agent_instance.aquery = AsyncMock()
+    mock_settings = MagicMock(threshold=0.5, top_k=5, content_collection_name="content", reuse_stored_vectors=True)
+
+    app.dependency_overrides[main.get_async_database] = lambda: mock_async_db
+    app.dependency_overrides[main.get_mega_similarity_agent] = lambda: mock_similarity_agent_instance
+    app.dependency_overrides[main.get_settings] = lambda: mock_settings
+    try:
+        response = client.post("/query_content", json={"video_id": 7348693858496122120, "user_handle": "melayubersatu1", "searchType": "video"})
+
+        assert response.status_code == 200
+        assert response.json() == {"matches": mock_similarity_results}
+        mock_async_db.fetch_all.assert_not_awaited()
+        mock_similarity_agent_instance.aquery.assert_not_awaited()
+
+        # Missing point: fall back to MySQL and embedding
+        mock_similarity_agent_instance.aquery_by_video_id.return_value = None
+        mock_async_db.fetch_all.return_value = [{"video_summary": "summary of the video"}]
+        mock_similarity_agent_instance.aquery.return_value = []
+        response = client.post("/query_content", json={"video_id": 7348693858496122120, "user_handle": "melayubersatu1", "searchType": "video"})
+
+        assert response.json() == {"matches": []}
+        mock_similarity_agent_instance.aquery.assert_awaited_once()
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,75 @@
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+
+import os,sys
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_path)
+
+import main
+from main import app
+
+from fastapi.testclient import TestClient
+
+client = TestClient(app)
+
+mock_request_payload = {
+    "queries": [
+        {"video_id": 7001, "user_handle": "melayubersatu1", "searchType": "video"},
+        {"video_id": 7002, "user_handle": "melayubersatu1", "searchType": "video"},
+        {"video_id": 7003, "user_handle": "beritapertiwi", "searchType": "profile"},
+        {"video_id": 7004, "user_handle": "unknown_user", "searchType": "profile"},
+    ]
+}
+
+
+@pytest.fixture
+def overrides():
+    async_db = MagicMock()
+    async_db.fetch_all = AsyncMock(side_effect=[
+        [{"video_id": "7002", "video_summary": "summary 7002"}],
+        [{"user_handle": "beritapertiwi", "topic_category": "Politics", "relates_to": "Racism",
+          "purpose": "Discrimination", "execution_method": "Speech"}],
+    ])
+    agent = MagicMock()
+    agent.astored_vectors = AsyncMock(return_value={"7001": [1.0, 0.0]})
+    agent.agenerate_embeddings = AsyncMock(side_effect=lambda texts: [[0.5, 0.5] for _ in texts])
+    agent.asearch_batch = AsyncMock(side_effect=lambda collection_name, searches, threshold, top_k, search_params: [
+        [{"collection": collection_name, "excluded_video_id": str(video_id)}] for _, video_id, _ in searches
+    ])
+    settings = MagicMock(threshold=0.5, top_k=5, reuse_stored_vectors=True, batch_max_queries=4,
+                         content_collection_name="content", profile_collection_name="profile")
+
+    app.dependency_overrides[main.get_async_database] = lambda: async_db
+    app.dependency_overrides[main.get_mega_similarity_agent] = lambda: agent
+    app.dependency_overrides[main.get_settings] = lambda: settings
+    yield async_db, agent
+    app.dependency_overrides.clear()
+
+
+def test_query_content_batch(overrides):
+    async_db, agent = overrides
+
+    response = client.post("/query_content/batch", json=mock_request_payload)
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["matches"] for result in results[:3]] == [
+        [{"collection": "content", "excluded_video_id": "7001"}],
+        [{"collection": "content", "excluded_video_id": "7002"}],
+        [{"collection": "profile", "excluded_video_id": "7003"}],
+    ]
+    assert results[3]["error"] == "User Name unknown_user not found in the profile table."
+
+    # One SQL query per search type, one embedding batch, one search_batch per collection
+    assert async_db.fetch_all.await_count == 2
+    assert async_db.fetch_all.await_args_list[0].args[1] == [7002]
+    agent.agenerate_embeddings.assert_awaited_once_with(["summary 7002", "Politics Racism Discrimination Speech"])
+    assert agent.asearch_batch.await_count == 2
+
+
+def test_query_content_batch_rejects_oversized_batches(overrides):
+    query = {"video_id": 7001, "user_handle": "melayubersatu1", "searchType": "video"}
+
+    response = client.post("/query_content/batch", json={"queries": [query] * 5})
+
+    assert response.status_code == 422
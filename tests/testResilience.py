@@ -0,0 +1,179 @@
+import asyncio
+import grpc
+import httpx
+import pytest
+import requests
+from unittest.mock import patch, MagicMock, AsyncMock
+
+import os,sys
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_path)
+
+from fastapi.testclient import TestClient
+
+import main
+from main import app
+from src.embedding_cache import EmbeddingCache
+from src.mega_similarity import MegaSimilarityAgent
+from src.resilience import CircuitBreaker, DependencyGuard, DependencyUnavailable, StaleResultCache, is_dependency_error
+
+client = TestClient(app)
+
+
+def test_breaker_opens_then_lets_one_trial_call_through():
+    breaker = CircuitBreaker("TEST", failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    with patch("src.resilience.time.monotonic", return_value=breaker.opened_at + 31):
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_guard_times_out_rejects_when_full_and_fails_fast_when_open():
+    guard = DependencyGuard("TEST", timeout=0.05, max_concurrency=1, queue_timeout=0.01,
+                            breaker=CircuitBreaker("TEST", failure_threshold=1, reset_timeout=30))
+
+    async def run():
+        slow = asyncio.create_task(guard.call(asyncio.sleep, 1))
+        await asyncio.sleep(0)
+        with pytest.raises(DependencyUnavailable) as full:
+            await guard.call(asyncio.sleep, 0)
+        with pytest.raises(DependencyUnavailable) as timeout:
+            await slow
+        with pytest.raises(DependencyUnavailable) as open_:
+            await guard.call(asyncio.sleep, 0)
+        return full.value.reason, timeout.value.reason, open_.value.reason
+
+    assert asyncio.run(run()) == ("bulkhead_full", "timeout", "circuit_open")
+
+
+def test_cancelled_trial_call_does_not_keep_the_circuit_open():
+    breaker = CircuitBreaker("TEST", failure_threshold=1, reset_timeout=0.01)
+    guard = DependencyGuard("TEST", timeout=5, breaker=breaker)
+    breaker.record_failure()
+
+    async def run():
+        await asyncio.sleep(0.02)
+        trial = asyncio.create_task(guard.call(asyncio.sleep, 1))
+        await asyncio.sleep(0.01)
+        assert breaker.state == "half_open"
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        return await guard.call(asyncio.sleep, 0, result="ok")
+
+    assert asyncio.run(run()) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_guard_maps_dependency_errors_and_scales_batch_deadline():
+    guard = DependencyGuard("TEST", timeout=0.02, batch_item_timeout=0.01,
+                            breaker=CircuitBreaker("TEST", failure_threshold=1, reset_timeout=30))
+
+    async def fail(error):
+        raise error
+
+    async def run():
+        # A batch of 10 items gets 0.02 + 10 * 0.01 seconds
+        assert await guard.call_batch(10, asyncio.sleep, 0.05, result="ok") == "ok"
+        with pytest.raises(ValueError):
+            await guard.call(fail, ValueError("bad request"))
+        assert guard.breaker.state == "closed"
+        with pytest.raises(DependencyUnavailable) as error:
+            await guard.call(fail, httpx.ConnectError("refused"))
+        return error.value.reason
+
+    assert asyncio.run(run()) == "error"
+    assert guard.breaker.state == "open"
+
+
+class FakeRpcError(grpc.RpcError):
+    def __init__(self, status):
+        self.status = status
+
+    def code(self):
+        return self.status
+
+
+def http_error(status_code):
+    return requests.HTTPError(response=MagicMock(status_code=status_code))
+
+
+@pytest.mark.parametrize("error, expected", [
+    (FakeRpcError(grpc.StatusCode.UNAVAILABLE), True),
+    (FakeRpcError(grpc.StatusCode.DEADLINE_EXCEEDED), True),
+    (FakeRpcError(grpc.StatusCode.INVALID_ARGUMENT), False),
+    (requests.ConnectionError("refused"), True),
+    (requests.Timeout("read timeout"), True),
+    (http_error(503), True),
+    (http_error(400), False),
+    (httpx.ConnectError("refused"), True),
+    (ValueError("bad request"), False),
+])
+def test_dependency_errors_are_classified(error, expected):
+    assert is_dependency_error(error) is expected
+
+
+def test_sync_guard_trips_on_requests_errors():
+    guard = DependencyGuard("TEST", breaker=CircuitBreaker("TEST", failure_threshold=1, reset_timeout=30))
+
+    def fail():
+        raise requests.ConnectionError("refused")
+
+    with pytest.raises(DependencyUnavailable):
+        guard.call_sync(fail)
+    assert guard.breaker.state == "open"
+
+
+def test_agent_serves_expired_cached_embedding_when_embedding_fails():
+    embedding_client = MagicMock(model_name="nomic")
+    embedding_client.embed.side_effect = ConnectionError("embedding down")
+    cache = EmbeddingCache(maxsize=10, ttl=60)
+    with patch("src.embedding_cache.time.monotonic", return_value=0.0):
+        cache.set("nomic", "summary", [0.1, 0.2])
+    agent = MegaSimilarityAgent(embedding_client=embedding_client, settings=MagicMock(),
+                                qdrant_client=MagicMock(), embedding_cache=cache)
+
+    assert cache.get("nomic", "summary") is None
+    assert agent.generate_embedding("summary") == [0.1, 0.2]
+    with pytest.raises(DependencyUnavailable) as error:
+        agent.generate_embedding("never embedded")
+    assert isinstance(error.value.__cause__, ConnectionError)
+
+
+def test_batch_query_serves_stale_result_then_fails_fast():
+    agent = MagicMock()
+    agent.astored_vectors = AsyncMock(side_effect=lambda collection_name, video_ids: {
+        str(video_id): [1.0, 0.0] for video_id in video_ids
+    })
+    agent.asearch_batch = AsyncMock(return_value=[[{"video_id": "7002"}]])
+    agent.agenerate_embeddings = AsyncMock(return_value=[])
+    settings = MagicMock(threshold=0.5, top_k=5, reuse_stored_vectors=True, batch_max_queries=256,
+                         content_collection_name="content", profile_collection_name="profile")
+    app.dependency_overrides[main.get_mega_similarity_agent] = lambda: agent
+    app.dependency_overrides[main.get_settings] = lambda: settings
+    app.dependency_overrides[main.get_async_database] = lambda: MagicMock()
+    stale_results = StaleResultCache(maxsize=10, ttl=60)
+    app.dependency_overrides[main.get_stale_result_cache] = lambda: stale_results
+    payload = {"queries": [{"video_id": 7001, "user_handle": "melayubersatu1", "searchType": "video"}]}
+    try:
+        fresh = client.post("/query_content/batch", json=payload)
+        assert fresh.status_code == 200
+
+        agent.asearch_batch.side_effect = DependencyUnavailable("qdrant", "circuit_open", retry_after=12.5)
+        stale = client.post("/query_content/batch", json=payload)
+        assert stale.status_code == 200
+        assert stale.json() == fresh.json()
+        assert stale.headers["Warning"] == '110 - "Response is Stale"'
+
+        payload["queries"][0]["video_id"] = 7002
+        unavailable = client.post("/query_content/batch", json=payload)
+        assert unavailable.status_code == 503
+        assert unavailable.headers["Retry-After"] == "13"
+    finally:
+        app.dependency_overrides.clear()
@@ -1,12 +1,13 @@
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 import os,sys
 root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(root_path)
 
 from main import app  # Assuming your FastAPI app is in a file named main.py
 from src.metadata import MetadataAgent  # Import the MetadataAgent class
+from src.settings import IngestTuning
 
 # Create a test client for the FastAPI app
 client = TestClient(app)
@@ -73,3 +74,75 @@ def test_save_collection_exception(mock_metadata_agent):
     assert response.status_code == 500
     response_data = response.json()
     assert "Database error" in response_data["detail"]
+
+
+def test_lifespan_creates_and_closes_shared_agents():
+    with patch("main.Database") as MockDatabase, patch("main.AsyncDatabase") as MockAsyncDatabase:
+        MockAsyncDatabase.return_value.close = AsyncMock()
+        with TestClient(app) as lifespan_client:
+            metadata_agent = app.state.metadata_agent
+            assert lifespan_client.get("/").status_code == 200
+            assert app.state.mega_similarity_agent.qdrant_client is metadata_agent.qdrant_client
+            assert metadata_agent.db is MockDatabase.return_value
+
+        MockDatabase.return_value.close.assert_called_once()
+        MockAsyncDatabase.return_value.close.assert_awaited_once()
+
+
+def test_save_collection_background_job():
+    import time
+    import main
+    from src.jobs import JobManager
+
+    agent = MagicMock()
+    agent.process.return_value = True
+    job_manager = JobManager(concurrency=1)
+    app.dependency_overrides[main.get_metadata_agent] = lambda: agent
+    app.dependency_overrides[main.get_settings] = lambda: MagicMock()
+    app.dependency_overrides[main.get_job_manager] = lambda: job_manager
+    try:
+        response = client.post("/save_collection", json={"video_ids": [1, 2, 3], "background": True})
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+
+        for _ in range(100):
+            status = client.get(f"/save_collection/jobs/{job_id}").json()
+            if status["status"] == "completed":
+                break
+            time.sleep(0.01)
+        assert (status["status"], status["processed"], status["failed"]) == ("completed", 3, 0)
+        assert client.get("/save_collection/jobs/missing").status_code == 404
+    finally:
+        app.dependency_overrides.clear()
+        job_manager.close()
+
+
+def test_save_video_ids_runs_content_and_profile_concurrently():
+    import threading
+    import main
+
+    # Each mode waits for the other one to start, which only succeeds when both run at once
+    barrier = threading.Barrier(2, timeout=5)
+    agent = MagicMock()
+
+    def process(query, mode, params=None):
+        barrier.wait()
+        return mode == "content"
+
+    agent.process.side_effect = process
+    content_data, profile_data = main.save_video_ids([1, 2], agent, MagicMock(ingest=IngestTuning()))
+
+    assert (content_data, profile_data) == (True, False)
+    assert sorted(call.kwargs["mode"] for call in agent.process.call_args_list) == ["content", "profile"]
+
+
+def test_save_video_ids_runs_modes_in_order_when_parallel_modes_disabled():
+    import threading
+    import main
+
+    agent = MagicMock()
+    agent.process.side_effect = lambda query, mode, params=None: threading.current_thread().name
+    settings = MagicMock(ingest=IngestTuning(save_parallel_modes=False))
+
+    assert main.save_video_ids([1, 2], agent, settings) == (threading.current_thread().name,) * 2
+    assert [call.kwargs["mode"] for call in agent.process.call_args_list] == ["content", "profile"]
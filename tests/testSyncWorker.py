@@ -0,0 +1,138 @@
+import pytest
+from unittest.mock import MagicMock
+
+import os,sys
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_path)
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import VectorParams, Distance
+from src.metadata import MetadataAgent
+from src.settings import IngestTuning
+from src.sync_worker import SyncWorker
+
+mock_content_rows = [
+    {"id": i, "video_id": str(7000 + i), "video_summary": f"summary {i}"} for i in range(1, 6)
+]
+
+
+class FakeContentTable:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def fetch_data(self, query, params):
+        self.queries.append((query, params))
+        last_id, limit = params
+        return [dict(row) for row in self.rows if row["id"] > last_id][:limit]
+
+
+@pytest.fixture
+def sync_worker():
+    qdrant_client = QdrantClient(":memory:")
+    qdrant_client.create_collection("content", vectors_config=VectorParams(size=2, distance=Distance.COSINE))
+    embedding_client = MagicMock(model_name="nomic")
+    embedding_client.embed_batch.side_effect = lambda texts: [[1.0, float(len(text))] for text in texts]
+    settings = MagicMock(database="db", content_table="content_table",
+                         ingest=IngestTuning(), hybrid_search=False, compact_payload=False)
+    settings.collection_name.return_value = "content"
+    agent = MetadataAgent(embedding_client=embedding_client, db=MagicMock(), settings=settings, qdrant_client=qdrant_client)
+    table = FakeContentTable(list(mock_content_rows))
+    agent.fetch_data = table.fetch_data
+    worker = SyncWorker(agent, checkpoint_collection="sync_checkpoint", batch_size=2,
+                        updated_columns={}, modes=("content",))
+    return worker, table, agent
+
+
+def test_sync_pulls_batches_above_checkpoint(sync_worker):
+    worker, table, agent = sync_worker
+
+    assert worker.run_once() == {"content": 5}
+    assert worker.load_checkpoint() == {"content": {"id": 5}}
+    assert [params for _, params in table.queries] == [(0, 2), (2, 2), (4, 2)]
+    assert agent.qdrant_client.count("content").count == 5
+
+    # Only rows above the mark are pulled on the next round
+    table.rows.append({"id": 6, "video_id": "7006", "video_summary": "summary 6"})
+    assert worker.run_once() == {"content": 1}
+    assert worker.load_checkpoint() == {"content": {"id": 6}}
+
+
+def test_checkpoint_survives_restarts(sync_worker):
+    worker, table, agent = sync_worker
+    worker.run_once()
+
+    # A new worker, as after a restart or on the other replica, resumes from the shared mark
+    restarted = SyncWorker(agent, checkpoint_collection="sync_checkpoint", batch_size=2, updated_columns={},
+                           modes=("content",))
+    assert restarted.load_checkpoint() == {"content": {"id": 5}}
+    assert restarted.run_once() == {"content": 0}
+
+
+def test_only_the_lock_holder_syncs(sync_worker):
+    worker, table, agent = sync_worker
+    agent.db.acquire_lock.return_value = None
+
+    assert worker.run_once() == {}
+    assert table.queries == []
+
+    # The lock is taken once the leader releases it, and kept while its connection answers
+    lock_conn = MagicMock()
+    agent.db.acquire_lock.return_value = lock_conn
+    assert worker.run_once() == {"content": 5}
+    worker.run_once()
+    agent.db.acquire_lock.assert_called_with("limpopo_sync_worker")
+    assert agent.db.acquire_lock.call_count == 2
+
+    # A dead lock connection is dropped and the lock competed for again
+    lock_conn.ping.side_effect = Exception("MySQL server has gone away")
+    agent.db.acquire_lock.return_value = None
+    assert worker.run_once() == {}
+    lock_conn.close.assert_called_once()
+
+
+def test_sync_reuses_vectors_of_unchanged_text(sync_worker):
+    worker, table, agent = sync_worker
+    worker.run_once()
+    agent.embedding_client.embed_batch.reset_mock()
+
+    # A changed row is synced again, but only its edited text is re-embedded
+    worker.save_checkpoint({})
+    table.rows[0] = {**table.rows[0], "video_summary": "edited"}
+    worker.run_once()
+
+    embedded = [text for call in agent.embedding_client.embed_batch.call_args_list for text in call.args[0]]
+    assert embedded == ["edited"]
+    point = agent.qdrant_client.retrieve("content", ids=[1])[0]
+    assert point.payload["video_summary"] == "edited"
+
+
+def test_batch_query_with_updated_column(sync_worker):
+    worker, _, _ = sync_worker
+    worker.updated_columns = {"profile": "updated_at"}
+
+    query, params = worker._batch_query("profile", {"id": 10, "updated": "2024-01-01 00:00:00"})
+
+    assert "(a.updated_at > %s OR (a.updated_at = %s AND a.id > %s))" in query
+    assert "ORDER BY a.updated_at, a.id LIMIT %s" in query
+    assert params == ("2024-01-01 00:00:00", "2024-01-01 00:00:00", 10, 2)
+
+
+def test_sync_updates_edited_profile_rows():
+    qdrant_client = QdrantClient(":memory:")
+    qdrant_client.create_collection("profile_sync", vectors_config=VectorParams(size=2, distance=Distance.COSINE))
+    embedding_client = MagicMock(model_name="nomic")
+    embedding_client.embed_batch.side_effect = lambda texts: [[1.0, float(len(text))] for text in texts]
+    settings = MagicMock(ingest=IngestTuning(), hybrid_search=False, compact_payload=False)
+    settings.collection_name.return_value = "profile_sync"
+    agent = MetadataAgent(embedding_client=embedding_client, db=MagicMock(), settings=settings, qdrant_client=qdrant_client)
+    row = {"id": 1, "video_id": "7001", "topic_category": "food", "relates_to": "cooking", "purpose": "teach"}
+    agent.ingest([dict(row)], "profile")
+
+    # The edited row keeps its (video_id, topic_category) key but still updates its own point
+    agent.ingest([{**row, "purpose": "entertain"}], "profile", refresh_existing=True)
+    assert qdrant_client.retrieve("profile_sync", ids=[1])[0].payload["purpose"] == "entertain"
+
+    # Another row with a stored key is still skipped
+    agent.ingest([{**row, "id": 2}], "profile", refresh_existing=True)
+    assert qdrant_client.count("profile_sync").count == 1
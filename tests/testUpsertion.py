@@ -0,0 +1,158 @@
+import pytest
+from unittest.mock import MagicMock
+
+import os,sys
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_path)
+
+from dataclasses import replace
+from src.metadata import MetadataAgent
+from src.settings import Settings, IngestTuning
+
+mock_content_rows = [
+    {"id": i, "video_id": str(7000 + i), "video_summary": f"summary {i}"} for i in range(5)
+]
+
+
+@pytest.fixture
+def metadata_agent():
+    embedding_client = MagicMock()
+    embedding_client.embed_batch.side_effect = lambda texts: [[0.1, 0.2] for _ in texts]
+    settings = replace(Settings.from_env(), content_collection_name="content", profile_collection_name="profile")
+    agent = MetadataAgent(embedding_client=embedding_client, settings=settings, qdrant_client=MagicMock())
+    agent.upsert_batch_size = 2
+    return agent
+
+
+def test_upsertion_flushes_in_chunks(metadata_agent):
+    results = metadata_agent.upsertion([dict(row) for row in mock_content_rows], mode='content')
+
+    assert [result["ids"] for result in results] == [[0, 1], [2, 3], [4]]
+    assert all(result["status"] == "ok" for result in results)
+    assert metadata_agent.qdrant_client.upsert.call_count == 3
+    metadata_agent.embedding_client.embed_batch.assert_called_once()
+
+
+def test_process_retries_only_failed_chunks(metadata_agent):
+    metadata_agent.fetch_data = MagicMock(return_value=[dict(row) for row in mock_content_rows])
+    metadata_agent.qdrant_client.upsert.side_effect = [None, Exception("timeout"), None, None]
+
+    assert metadata_agent.process("SELECT 1", mode='content') is True
+
+    retried_ids = [call.kwargs["points"] for call in metadata_agent.qdrant_client.upsert.call_args_list][-1]
+    assert [point.id for point in retried_ids] == [2, 3]
+
+
+def test_process_raises_when_chunk_keeps_failing(metadata_agent):
+    metadata_agent.fetch_data = MagicMock(return_value=[dict(row) for row in mock_content_rows[:2]])
+    metadata_agent.qdrant_client.upsert.side_effect = Exception("down")
+
+    with pytest.raises(RuntimeError, match=r"\[0, 1\]"):
+        metadata_agent.process("SELECT 1", mode='content')
+
+
+def test_profile_upsertion_skips_existing_keys_without_embedding(metadata_agent):
+    from src import existence_index
+    existence_index._known_keys.clear()
+    stored_point = MagicMock(payload={"video_id": "7001", "topic_category": "Politics"})
+    metadata_agent.qdrant_client.scroll.return_value = ([stored_point], None)
+    rows = [
+        {"id": 1, "video_id": "7001", "topic_category": "Politics", "relates_to": "", "purpose": "", "execution_method": ""},
+        {"id": 2, "video_id": "7001", "topic_category": "Religion", "relates_to": "", "purpose": "", "execution_method": ""},
+        {"id": 3, "video_id": "7001", "topic_category": "Religion", "relates_to": "", "purpose": "", "execution_method": ""},
+    ]
+
+    results = metadata_agent.upsertion([dict(row) for row in rows], mode='profile')
+
+    assert [point_id for result in results for point_id in result["ids"]] == [2]
+    metadata_agent.embedding_client.embed_batch.assert_called_once_with(["Religion   "])
+    metadata_agent.qdrant_client.search.assert_not_called()
+
+    # Keys are now cached, so re-ingesting the same rows needs no scroll and no upsert
+    metadata_agent.qdrant_client.reset_mock()
+    assert metadata_agent.upsertion([dict(row) for row in rows], mode='profile') == []
+    metadata_agent.qdrant_client.scroll.assert_not_called()
+
+
+def test_process_stream_upserts_every_batch(metadata_agent):
+    closed = []
+
+    def batches(query, params, batch_size):
+        try:
+            for start in range(0, len(mock_content_rows), 2):
+                yield [dict(row) for row in mock_content_rows[start:start + 2]]
+        finally:
+            closed.append(True)
+
+    metadata_agent.db = MagicMock()
+    metadata_agent.db.stream_batches.side_effect = batches
+
+    assert metadata_agent.process_stream("SELECT 1", mode='content', params=[1]) is True
+
+    upserted = [point.id for call in metadata_agent.qdrant_client.upsert.call_args_list for point in call.kwargs["points"]]
+    assert upserted == [0, 1, 2, 3, 4]
+    assert metadata_agent.embedding_client.embed_batch.call_count == 3
+    assert closed == [True]
+
+
+def test_process_stream_without_rows(metadata_agent):
+    metadata_agent.db = MagicMock()
+    metadata_agent.db.stream_batches.return_value = iter([])
+
+    assert metadata_agent.process_stream("SELECT 1", mode='content') is False
+
+
+def test_process_stream_propagates_stage_errors(metadata_agent):
+    metadata_agent.db = MagicMock()
+    metadata_agent.db.stream_batches.return_value = iter([[dict(row)] for row in mock_content_rows])
+    metadata_agent.embedding_client.embed_batch.side_effect = Exception("embedding service down")
+
+    with pytest.raises(Exception, match="embedding service down"):
+        metadata_agent.process_stream("SELECT 1", mode='content')
+
+
+def test_reingest_skips_unchanged_rows_and_memoized_texts(tmp_path):
+    from qdrant_client import QdrantClient
+    from qdrant_client.http.models import VectorParams, Distance
+    from src.embedding_memo import EmbeddingMemo
+
+    qdrant_client = QdrantClient(":memory:")
+    qdrant_client.create_collection("content", vectors_config=VectorParams(size=2, distance=Distance.COSINE))
+    embedding_client = MagicMock(model_name="nomic")
+    embedding_client.embed_batch.side_effect = lambda texts: [[1.0, float(len(text))] for text in texts]
+    settings = MagicMock(ingest=IngestTuning(), hybrid_search=False, compact_payload=False)
+    settings.collection_name.return_value = "content"
+    memo = EmbeddingMemo(str(tmp_path / "memo.sqlite3"))
+    agent = MetadataAgent(embedding_client=embedding_client, db=MagicMock(), settings=settings,
+                          qdrant_client=qdrant_client, embedding_memo=memo)
+
+    agent.upsertion([dict(row) for row in mock_content_rows], mode='content')
+    embedding_client.embed_batch.reset_mock()
+
+    # Identical rows are neither embedded nor upserted again
+    assert agent.upsertion([dict(row) for row in mock_content_rows], mode='content') == []
+    embedding_client.embed_batch.assert_not_called()
+
+    # A payload-only change is upserted with the memoized vector
+    changed = [{**mock_content_rows[0], "risk_status": "high"}]
+    results = agent.upsertion(changed, mode='content')
+    assert [point_id for result in results for point_id in result["ids"]] == [0]
+    embedding_client.embed_batch.assert_not_called()
+    assert qdrant_client.retrieve("content", ids=[0])[0].payload["risk_status"] == "high"
+    memo.close()
+
+
+def test_process_stream_keeps_only_failed_chunks(metadata_agent):
+    metadata_agent.db = MagicMock()
+    metadata_agent.db.stream_batches.return_value = iter([[dict(row) for row in mock_content_rows[:2]],
+                                                          [dict(row) for row in mock_content_rows[2:]]])
+    metadata_agent.qdrant_client.upsert.side_effect = [None, Exception("timeout"), None, None]
+    finalized = []
+    finalize = metadata_agent._finalize_results
+    metadata_agent._finalize_results = lambda results, mode: (finalized.extend(results), finalize(results, mode))
+
+    assert metadata_agent.process_stream("SELECT 1", mode='content') is True
+
+    # Successful chunks, and their vectors, are not held until the end of the stream
+    assert [(result["ids"], result["status"]) for result in finalized] == [([2, 3], "failed")]
+    assert metadata_agent.qdrant_client.upsert.call_args_list[-1].kwargs["points"][0].id == 2